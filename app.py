@@ -1,10 +1,44 @@
 # Secondary Account Finance Render Hosted Flask app with Supabase integration
+import base64
+import contextvars
+import copy
+import fcntl
+import functools
+import glob
+import gzip
+import hashlib
+import hmac
+import csv
+import io
+import json
+import mimetypes
 import os
-from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, render_template, redirect, flash, url_for # type: ignore
+import queue
+import re
+import select
+import tempfile
+import threading
+import time
+import urllib.parse
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from flask import Flask, request, jsonify, render_template, redirect, flash, url_for, g, session, make_response, send_from_directory # type: ignore
+from flask import before_render_template, template_rendered, stream_template, has_request_context
+import click
+from jinja2 import nodes, Undefined
+from jinja2.ext import Extension
+from markupsafe import Markup
 import psycopg2 # type: ignore
 from psycopg2.extras import RealDictCursor
 from supabase import create_client, Client
+from postgrest.exceptions import APIError
+from postgrest.utils import SyncClient
+import httpx
 import logging
 
 # Configure logging
@@ -23,165 +57,2085 @@ DATABASE_URL = os.environ.get('DATABASE_URL')  # Direct PostgreSQL connection
 # Initialize Supabase client
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# Request tracing: every Supabase call, direct SQL query and template render of a traced
+# request is timed and reported in a Server-Timing header and one JSON log line.
+# off: never; header: only requests sent with "X-Trace: 1" and the admin token (the trace reveals
+# query timings and table names, so anonymous clients cannot ask for it); on: every request
+# ("X-Trace: 0" opts out)
+REQUEST_TRACING = os.environ.get('REQUEST_TRACING', 'off').lower()
+TRACE_HEADER = 'X-Trace'
+
+class RequestTrace:
+    """Spans (kind, name, duration and details) recorded during one request, from any thread"""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, kind, name, seconds, **details):
+        with self._lock:
+            self.spans.append({'kind': kind, 'name': name, 'ms': round(seconds * 1000, 2), **details})
+
+    def totals(self):
+        """Count and summed milliseconds per span kind"""
+        totals = {}
+        with self._lock:
+            for span in self.spans:
+                count, ms = totals.get(span['kind'], (0, 0.0))
+                totals[span['kind']] = (count + 1, ms + span['ms'])
+        return totals
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self):
+        # Spans of one kind can overlap (QueryBatch), so their sum may exceed the total
+        entries = [f'{kind};dur={ms:.1f};desc="{count} calls"' for kind, (count, ms) in self.totals().items()]
+        entries.append(f'total;dur={self.elapsed_ms():.1f}')
+        return ', '.join(entries)
+
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+@contextmanager
+def traced(kind, name, **details):
+    """
+    Time the block as a span of the current request's trace (a no-op when the request is not traced)
+    The yielded dict can be filled with details known only at the end, e.g. rows returned.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield details
+        return
+    started = time.perf_counter()
+    try:
+        yield details
+    finally:
+        trace.add(kind, name, time.perf_counter() - started, **details)
+
+def _wants_trace():
+    toggle = request.headers.get(TRACE_HEADER)
+    if REQUEST_TRACING == 'on':
+        return toggle != '0'
+    return REQUEST_TRACING == 'header' and toggle == '1' and is_admin_request()
+
+@app.before_request
+def start_request_trace():
+    if REQUEST_TRACING != 'off' and _wants_trace():
+        g.trace_token = _current_trace.set(RequestTrace())
+
+@app.after_request
+def finish_request_trace(response):
+    trace = _current_trace.get()
+    if trace is not None:
+        # A streamed page renders after its headers are sent: Server-Timing stops at the
+        # first byte, while the log line waits for the end of the stream
+        response.headers['Server-Timing'] = trace.server_timing()
+        method, path = request.method, request.full_path.rstrip('?')
+
+        def log_trace():
+            logger.info(json.dumps({
+                'event': 'request_trace',
+                'method': method,
+                'path': path,
+                'status': final_status(response),
+                'total_ms': round(trace.elapsed_ms(), 2),
+                'spans': trace.spans
+            }, default=str))
+
+        if response.is_streamed:
+            response.call_on_close(log_trace)
+        else:
+            log_trace()
+    return response
+
+@app.teardown_request
+def clear_request_trace(exc=None):
+    token = g.pop('trace_token', None)
+    if token is not None:
+        _current_trace.reset(token)
+
+@before_render_template.connect_via(app)
+def _trace_render_started(sender, template, context, **extra):
+    if _current_trace.get() is not None:
+        g.render_started = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def _trace_render_finished(sender, template, context, **extra):
+    trace = _current_trace.get()
+    started = g.pop('render_started', None)
+    if trace is not None and started is not None:
+        trace.add('render', template.name, time.perf_counter() - started)
+
+# Prometheus metrics, served by /metrics when prometheus-client is installed. With several
+# gunicorn workers PROMETHEUS_MULTIPROC_DIR names an empty writable directory (gunicorn.conf.py
+# creates one if unset): each worker writes its samples there and /metrics aggregates all of them.
+PROMETHEUS_MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+class AppMetrics:
+    """
+    Route, query, cache and pool metrics; every method is a no-op without prometheus-client
+    Labels are route rules, table/function names and statement verbs, never raw URLs or values.
+    """
+    def __init__(self):
+        try:
+            import prometheus_client
+        except ImportError:
+            self.prometheus = None
+            logger.info("prometheus-client is not installed; /metrics is disabled")
+            return
+        self.prometheus = prometheus_client
+        self.request_seconds = prometheus_client.Histogram(
+            'http_request_duration_seconds', 'Request latency by route',
+            ['method', 'route', 'status'])
+        self.supabase_seconds = prometheus_client.Histogram(
+            'supabase_query_duration_seconds', 'Supabase REST call latency by table or function',
+            ['target', 'method'])
+        self.supabase_errors = prometheus_client.Counter(
+            'supabase_errors_total', 'Failed Supabase REST calls by table or function',
+            ['target', 'status'])
+        self.db_seconds = prometheus_client.Histogram(
+            'db_query_duration_seconds', 'Direct PostgreSQL statement latency by verb',
+            ['statement'])
+        self.cache_requests = prometheus_client.Counter(
+            'cache_requests_total', 'Cache lookups by cache and result (hit, miss, error)',
+            ['cache', 'result'])
+        self.db_pool_connections = prometheus_client.Gauge(
+            'db_pool_connections', 'Direct PostgreSQL pool connections by state',
+            ['state'], multiprocess_mode='livesum')
+
+    @property
+    def enabled(self):
+        return self.prometheus is not None
+
+    def observe_request(self, method, route, status, seconds):
+        if self.enabled:
+            self.request_seconds.labels(method, route, str(status)).observe(seconds)
+
+    def observe_supabase(self, target, method, status, seconds):
+        if self.enabled:
+            self.supabase_seconds.labels(target, method).observe(seconds)
+            if status is None or status >= 400:
+                self.supabase_errors.labels(target, str(status or 'error')).inc()
+
+    def observe_db(self, statement, seconds):
+        if self.enabled:
+            self.db_seconds.labels(statement).observe(seconds)
+
+    def cache_result(self, cache, result):
+        if self.enabled:
+            self.cache_requests.labels(cache, result).inc()
+
+    def set_db_pool(self, stats):
+        if self.enabled:
+            self.db_pool_connections.labels('in_use').set(stats['size'] - stats['idle'])
+            self.db_pool_connections.labels('idle').set(stats['idle'])
+
+    def render(self):
+        """Return (body, content type) in the Prometheus text format"""
+        registry = self.prometheus.REGISTRY
+        if PROMETHEUS_MULTIPROC_DIR:
+            from prometheus_client import multiprocess
+            registry = self.prometheus.CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        return self.prometheus.generate_latest(registry), self.prometheus.CONTENT_TYPE_LATEST
+
+metrics = AppMetrics()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        observe = functools.partial(metrics.observe_request, request.method, route)
+        # Streamed pages are timed to their last chunk (and count as errors if it fails),
+        # /events streams only to their opening
+        if response.is_streamed and response.mimetype != 'text/event-stream':
+            response.call_on_close(lambda: observe(final_status(response), time.perf_counter() - started))
+        else:
+            observe(response.status_code, time.perf_counter() - started)
+    return response
+
+class TracedSyncClient(SyncClient):
+    """
+    PostgREST session recording each call (table or function, filters, rows, bytes) in the
+    request trace and its latency in the Supabase metrics
+    """
+    def send(self, request, *args, **kwargs):
+        path = request.url.path.rsplit('/rest/v1/', 1)[-1]
+        started = time.perf_counter()
+        status = None
+        try:
+            with traced('supabase', f'{request.method} /{path}', params=str(request.url.params)) as details:
+                response = super().send(request, *args, **kwargs)
+                status = details['status'] = response.status_code
+                details['bytes'] = len(response.content)
+                # PostgREST reports the rows returned as "first-last/total" in Content-Range
+                content_range = response.headers.get('content-range', '')
+                first, _, last = content_range.partition('/')[0].partition('-')
+                if first.isdigit() and last.isdigit():
+                    details['rows'] = int(last) - int(first) + 1
+                return response
+        finally:
+            metrics.observe_supabase(path, request.method, status, time.perf_counter() - started)
+
+# HTTP session shared by every Supabase REST call (per worker process)
+SUPABASE_HTTP2 = os.environ.get('SUPABASE_HTTP2', 'true').lower() in ('1', 'true', 'yes')
+SUPABASE_MAX_CONNECTIONS = int(os.environ.get('SUPABASE_MAX_CONNECTIONS', 20))
+SUPABASE_MAX_KEEPALIVE = int(os.environ.get('SUPABASE_MAX_KEEPALIVE', 10))  # Idle connections kept open
+SUPABASE_KEEPALIVE_EXPIRY = float(os.environ.get('SUPABASE_KEEPALIVE_EXPIRY', 60))  # Seconds an idle connection is kept
+SUPABASE_TIMEOUT = float(os.environ.get('SUPABASE_TIMEOUT', 10))  # Seconds to read a response
+SUPABASE_CONNECT_TIMEOUT = float(os.environ.get('SUPABASE_CONNECT_TIMEOUT', 5))
+
+class HttpConnectionMetrics:
+    """
+    Count requests, new connections and TLS handshakes on an httpx client from httpcore trace events
+    Requests minus connections opened is the number of requests that reused a kept-alive connection.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {'requests': 0, 'connections_opened': 0, 'tls_handshakes': 0, 'http2_requests': 0}
+
+    def _incr(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def on_request(self, request):
+        """httpx request event hook"""
+        self._incr('requests')
+        request.extensions['trace'] = self.trace
+
+    def trace(self, event_name, info):
+        if event_name == 'connection.connect_tcp.complete':
+            self._incr('connections_opened')
+        elif event_name == 'connection.start_tls.complete':
+            self._incr('tls_handshakes')
+        elif event_name == 'http2.send_request_headers.started':
+            self._incr('http2_requests')
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        requests = counts['requests']
+        counts['reused'] = max(requests - counts['connections_opened'], 0)
+        counts['reuse_ratio'] = round(counts['reused'] / requests, 3) if requests else None
+        return counts
+
+supabase_http_metrics = HttpConnectionMetrics()
+
+def configure_supabase_session(client):
+    """
+    Replace the Supabase REST session with one pooled keep-alive httpx client
+    Every table() and rpc() call goes through client.postgrest.session, so all of them share
+    its connections: a TLS handshake happens once per connection, not once per query.
+    """
+    http2 = SUPABASE_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("SUPABASE_HTTP2 is set but the 'h2' package is missing (pip install httpx[http2]); using HTTP/1.1")
+            http2 = False
+
+    old_session = client.postgrest.session
+    client.postgrest.session = TracedSyncClient(
+        base_url=old_session.base_url,
+        headers=old_session.headers,
+        http2=http2,
+        timeout=httpx.Timeout(SUPABASE_TIMEOUT, connect=SUPABASE_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=SUPABASE_MAX_CONNECTIONS,
+                            max_keepalive_connections=SUPABASE_MAX_KEEPALIVE,
+                            keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY),
+        event_hooks={'request': [supabase_http_metrics.on_request]}
+    )
+    old_session.close()
+
+configure_supabase_session(supabase)
+
+# Functions PostgREST reported as missing (migrations not applied yet), by name, with when.
+# Until MISSING_FUNCTION_RETRY seconds have passed, calls fail as missing without a round trip.
+MISSING_FUNCTION_RETRY = float(os.environ.get('MISSING_FUNCTION_RETRY', 300))
+_missing_functions = {}
+
+def is_missing_function_error(e):
+    """
+    True if the RPC failed because the function is not deployed: PostgREST's PGRST202, or
+    Postgres' undefined_function (42883) when an older signature of it is
+    """
+    return getattr(e, 'code', None) in ('PGRST202', '42883')
+
+def call_function(name, params):
+    """
+    Call a database function over PostgREST and return its decoded result
+    postgrest-py 0.10 validates every response as a list of rows, which rejects the JSONB objects
+    and scalars our functions return, so the response is read directly. Errors raise APIError as
+    .execute() does.
+    """
+    missing_since = _missing_functions.get(name)
+    if missing_since is not None and time.monotonic() - missing_since < MISSING_FUNCTION_RETRY:
+        raise APIError({'code': 'PGRST202', 'message': f"Function {name} was not found (checked in the last "
+                                                       f"{MISSING_FUNCTION_RETRY:.0f}s)"})
+    builder = supabase.rpc(name, params)
+    response = builder.session.request(builder.http_method, builder.path, json=builder.json,
+                                       params=builder.params, headers=builder.headers)
+    try:
+        body = response.json() if response.content else None
+    except ValueError:
+        raise APIError({'message': response.text, 'code': str(response.status_code)})
+    if not response.is_success:
+        error = APIError(body if isinstance(body, dict) else {'message': str(body), 'code': str(response.status_code)})
+        if is_missing_function_error(error):
+            logger.warning(f"Database function {name} is not deployed; using the fallback for "
+                           f"{MISSING_FUNCTION_RETRY:.0f}s before checking again")
+            _missing_functions[name] = time.monotonic()
+        raise error
+    _missing_functions.pop(name, None)
+    return body
+
+# Connection pool settings for the direct PostgreSQL connection (per worker process)
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', 1))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 5))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5))  # Seconds to wait for a free connection
+DB_POOL_MAX_LIFETIME = float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800))  # Seconds before a connection is recycled
+DB_POOL_HEALTH_CHECK = os.environ.get('DB_POOL_HEALTH_CHECK', 'true').lower() in ('1', 'true', 'yes')
+DB_SSLMODE = os.environ.get('DB_SSLMODE', 'require')  # Supabase requires SSL; 'disable' for a local Postgres
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time"""
+
+class PostgresConnectionPool:
+    """
+    Thread-safe pool of direct PostgreSQL connections
+    Connections are health-checked when borrowed and recycled after max_lifetime seconds
+    """
+    def __init__(self, dsn, min_size=1, max_size=5, timeout=5.0, max_lifetime=1800.0,
+                 health_check=True, **connect_kwargs):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check = health_check
+        self.connect_kwargs = connect_kwargs
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._born = {}  # id(conn) -> creation time, used for max_lifetime
+        self._size = 0  # Open connections, idle and borrowed
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, **self.connect_kwargs)
+        self._born[id(conn)] = time.monotonic()
+        return conn
+
+    def prefill(self):
+        """Open min_size connections up front so the first requests skip the handshake"""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append(conn)
+                self._cond.notify()
+
+    def _expired(self, conn):
+        born = self._born.get(id(conn), 0)
+        return self.max_lifetime > 0 and time.monotonic() - born > self.max_lifetime
+
+    def _is_usable(self, conn):
+        if conn.closed or self._expired(conn):
+            return False
+        if not self.health_check:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        self._born.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def getconn(self):
+        """
+        Borrow a connection, opening a new one if the pool is below max_size
+        Raises PoolTimeout if none is free within the checkout timeout
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = None
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn = self._idle.pop()
+                else:
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+
+            # Health check runs outside the lock so other threads are not blocked on the network
+            if self._is_usable(conn):
+                return conn
+            logger.info("Discarding stale pooled database connection")
+            self._discard(conn)
+
+    def putconn(self, conn, discard=False):
+        """Return a borrowed connection, rolling back any open transaction"""
+        if discard or conn.closed or self._expired(conn):
+            self._discard(conn)
+            return
+        try:
+            if conn.status != psycopg2.extensions.STATUS_READY:
+                conn.rollback()
+        except psycopg2.Error:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def closeall(self):
+        """Close every idle connection (borrowed ones are closed when returned)"""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            return {'size': self._size, 'idle': len(self._idle), 'max_size': self.max_size}
+
+class TracedCursor(RealDictCursor):
+    """Dict cursor recording each statement in the request trace"""
+    def execute(self, query, vars=None):
+        statement = ' '.join((query if isinstance(query, str) else str(query)).split())
+        started = time.perf_counter()
+        try:
+            with traced('db', statement[:80]) as details:
+                result = super().execute(query, vars)
+                details['rows'] = self.rowcount
+                return result
+        finally:
+            metrics.observe_db(statement.split(' ', 1)[0].upper(), time.perf_counter() - started)
+
+_db_pool = None
+_db_pool_pid = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool():
+    """
+    Return this process's connection pool, creating it on first use
+    The pool is keyed on the process id so gunicorn workers never share sockets inherited across fork
+    """
+    global _db_pool, _db_pool_pid
+
+    # Parse the DATABASE_URL if it's in URL format
+    database_url = DATABASE_URL
+
+    # Handle different URL formats
+    if database_url and database_url.startswith('postgresql://'):
+        # Supabase URLs sometimes use postgresql:// which needs to be postgres://
+        database_url = database_url.replace('postgresql://', 'postgres://', 1)
+
+    if not database_url:
+        logger.error("DATABASE_URL environment variable not set")
+        return None
+
+    pid = os.getpid()
+    with _db_pool_lock:
+        if _db_pool is None or _db_pool_pid != pid:
+            # A pool inherited from the parent is abandoned, not closed: closing would
+            # terminate the parent's sessions on the shared sockets
+            _db_pool = PostgresConnectionPool(
+                database_url,
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                timeout=DB_POOL_TIMEOUT,
+                max_lifetime=DB_POOL_MAX_LIFETIME,
+                health_check=DB_POOL_HEALTH_CHECK,
+                cursor_factory=TracedCursor,
+                sslmode=DB_SSLMODE
+            )
+            _db_pool_pid = pid
+            try:
+                _db_pool.prefill()
+            except Exception as e:
+                logger.error(f"Database pool prefill failed: {e}")
+        return _db_pool
+
 # Database connection function
+@contextmanager
 def get_db_connection():
     """
-    Create a direct PostgreSQL connection to Supabase
+    Borrow a pooled direct PostgreSQL connection to Supabase
     This is useful for complex queries or when you need direct SQL access
+    Yields None if the database is not configured or unreachable
     """
+    pool = get_db_pool()
+    if pool is None:
+        yield None
+        return
+
     try:
-        # Parse the DATABASE_URL if it's in URL format
-        database_url = DATABASE_URL
-        
-        # Handle different URL formats
-        if database_url and database_url.startswith('postgresql://'):
-            # Supabase URLs sometimes use postgresql:// which needs to be postgres://
-            database_url = database_url.replace('postgresql://', 'postgres://', 1)
-        
-        if not database_url:
-            logger.error("DATABASE_URL environment variable not set")
-            return None
-            
-        conn = psycopg2.connect(
-            database_url,
-            cursor_factory=RealDictCursor,
-            sslmode='require'  # Supabase requires SSL
-        )
-        return conn
+        conn = pool.getconn()
+    except PoolTimeout as e:
+        logger.error(f"Database pool exhausted: {e}")
+        yield None
+        return
     except psycopg2.OperationalError as e:
         logger.error(f"Database operational error: {e}")
-        return None
+        yield None
+        return
     except Exception as e:
         logger.error(f"Database connection error: {e}")
+        yield None
+        return
+
+    metrics.set_db_pool(pool.stats())
+    broken = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        pool.putconn(conn, discard=broken)
+        metrics.set_db_pool(pool.stats())
+
+# Concurrent execution of independent Supabase reads. Defaults to one thread per gunicorn
+# request thread so concurrent page views do not queue behind each other's queries.
+QUERY_BATCH_WORKERS = int(os.environ.get('QUERY_BATCH_WORKERS', os.environ.get('GUNICORN_THREADS', 16)))
+QUERY_TIMEOUT = float(os.environ.get('QUERY_TIMEOUT', 10))  # Seconds per query in a batch
+
+_query_executor = None
+_query_executor_pid = None
+_query_executor_lock = threading.Lock()
+
+def get_query_executor():
+    """
+    Return this process's thread pool for batched queries
+    Threads do not survive fork, so each gunicorn worker gets its own pool
+    """
+    global _query_executor, _query_executor_pid
+    pid = os.getpid()
+    with _query_executor_lock:
+        if _query_executor is None or _query_executor_pid != pid:
+            _query_executor = ThreadPoolExecutor(max_workers=QUERY_BATCH_WORKERS,
+                                                 thread_name_prefix='supabase-query')
+            _query_executor_pid = pid
+        return _query_executor
+
+class BatchResult(dict):
+    """Query results keyed by name; failed or timed out queries hold their default and are listed in errors"""
+    def __init__(self, results, errors):
+        super().__init__(results)
+        self.errors = errors
+
+    def ok(self, name):
+        return name not in self.errors
+
+class _BatchTask:
+    """One query of a QueryBatch: when its pool thread picked it up, and whether the batch gave up on it"""
+    def __init__(self, query):
+        self.query = query
+        self.started = threading.Event()
+        self.started_at = None
+        self.abandoned = False
+        self._lock = threading.Lock()
+
+    def abandon(self):
+        """Give up on the task; returns False if a pool thread has already started it"""
+        with self._lock:
+            self.abandoned = True
+            return not self.started.is_set()
+
+    def __call__(self):
+        with self._lock:
+            # A task the batch gave up on while it was still queued is not started at all
+            if self.abandoned:
+                return None
+            self.started_at = time.monotonic()
+            self.started.set()
+        return QueryBatch._execute(self.query)
+
+class QueryBatch:
+    """
+    Run a route's independent reads concurrently so the route waits for the
+    slowest query instead of the sum of all of them
+
+        batch = QueryBatch()
+        batch.add('accounts', supabase.table('accounts').select(columns('account')).eq('id', 1))
+        batch.add('goals', supabase.table('savings_goals').select(columns('savings_goal')), default=[])
+        results = batch.run()
+
+    A query is either an unexecuted Supabase request builder (its .data is
+    returned) or a zero-argument callable (its return value is used).
+
+    A query's timeout runs from when a pool thread starts it, so time spent
+    queued behind other requests' queries is not charged to it; a query still
+    queued after its timeout is dropped without running. A thread cannot be
+    interrupted, so a timed out query that already started runs on in the
+    background (Supabase requests stop at SUPABASE_TIMEOUT) and its result is
+    discarded.
+    """
+    # Timed out queries still running in a pool thread, across all batches of this process
+    _abandoned_running = 0
+    _abandoned_lock = threading.Lock()
+
+    def __init__(self, timeout=None):
+        self.timeout = QUERY_TIMEOUT if timeout is None else timeout
+        self._queries = {}
+
+    def add(self, name, query, default=None, timeout=None):
+        self._queries[name] = (query, default, self.timeout if timeout is None else timeout)
+        return self
+
+    @staticmethod
+    def _execute(query):
+        if hasattr(query, 'execute'):
+            return query.execute().data
+        return query()
+
+    @classmethod
+    def abandoned_running(cls):
+        """Number of timed out queries whose threads have not finished yet"""
+        return cls._abandoned_running
+
+    @classmethod
+    def _abandon(cls, name, future):
+        with cls._abandoned_lock:
+            cls._abandoned_running += 1
+        def finished(_):
+            with cls._abandoned_lock:
+                cls._abandoned_running -= 1
+            logger.info(f"Timed out query '{name}' finished in the background; result discarded")
+        future.add_done_callback(finished)
+
+    def run(self):
+        executor = get_query_executor()
+        submitted = time.monotonic()
+        tasks, futures = {}, {}
+        for name, (query, _, _) in self._queries.items():
+            tasks[name] = _BatchTask(query)
+            # Queries run in pool threads; copying the context keeps them in this request's trace
+            futures[name] = executor.submit(contextvars.copy_context().run, tasks[name])
+
+        results, errors = {}, {}
+        for name, future in futures.items():
+            task = tasks[name]
+            _, default, timeout = self._queries[name]
+            try:
+                # Wait for a free pool thread for at most the query's own timeout
+                if not task.started.wait(max(0, submitted + timeout - time.monotonic())):
+                    if task.abandon():
+                        future.cancel()
+                        logger.warning(f"Query '{name}' was not started within {timeout}s; the query pool is busy")
+                        errors[name] = f"not started within {timeout}s"
+                        results[name] = default
+                        continue
+                value = future.result(timeout=max(0, task.started_at + timeout - time.monotonic()))
+                results[name] = default if value is None else value
+            except FutureTimeoutError:
+                task.abandon()
+                self._abandon(name, future)
+                logger.warning(f"Query '{name}' timed out after {timeout}s")
+                errors[name] = f"timed out after {timeout}s"
+                results[name] = default
+            except Exception as e:
+                logger.warning(f"Query '{name}' failed: {e}")
+                errors[name] = str(e)
+                results[name] = default
+        return BatchResult(results, errors)
+
+# Cache for rows that are read on nearly every page but change only on explicit writes.
+# CACHE_BACKEND=local keeps it per worker; redis or filesystem share it between workers.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'local')
+CACHE_URL = os.environ.get('CACHE_URL', os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
+CACHE_DIR = os.environ.get('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'finance-app-cache'))
+CACHE_PREFIX = os.environ.get('CACHE_PREFIX', 'finance')
+CACHE_TTL = float(os.environ.get('CACHE_TTL', 60))  # Seconds
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 256))  # Local backend only
+CACHE_SWEEP_INTERVAL = float(os.environ.get('CACHE_SWEEP_INTERVAL', 300))  # Seconds; filesystem backend only
+RECENT_RECONCILED_MONTHS = 6  # Rows shown on the "Previous Month Activity" card
+
+class LocalCacheBackend:
+    """
+    Thread-safe in-process backend with a per-entry TTL and an LRU size bound
+    Only invalidates the worker that made the write; use it for a single worker
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at or None, bytes)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def incr(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            value = int(entry[1]) + 1 if entry else 1
+            self._entries[key] = (None, str(value).encode())
+            self._entries.move_to_end(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class FileCacheBackend:
+    """
+    Filesystem backend shared by every worker on the host
+    Writes are atomic renames and counters are updated under an exclusive file lock. Each file
+    starts with its expiry time; expired entries (including ones superseded by a version bump)
+    are swept by the first write after every sweep_interval seconds.
+    """
+    TMP_PREFIX = '.tmp-'
+
+    def __init__(self, directory, sweep_interval=300):
+        self.directory = directory
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    @staticmethod
+    def _read(path):
+        """Return (expires_at or None, value) of a cache file"""
+        with open(path, 'rb') as f:
+            header, _, value = f.read().partition(b'\n')
+        return (float(header) if header else None), value
+
+    def get(self, key):
+        try:
+            expires_at, value = self._read(self._path(key))
+        except (FileNotFoundError, ValueError):
+            return None
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=self.TMP_PREFIX)
+        with os.fdopen(fd, 'wb') as f:
+            f.write((repr(expires_at) if expires_at else '').encode() + b'\n' + value)
+        os.replace(tmp_path, self._path(key))
+        if time.monotonic() >= self._next_sweep:
+            self._next_sweep = time.monotonic() + self.sweep_interval
+            self.sweep()
+
+    def incr(self, key):
+        # One lock file for the directory: counters change only on writes
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            current = self.get(key)
+            value = int(current) + 1 if current else 1
+            self.set(key, str(value).encode())
+            return value
+
+    def sweep(self):
+        """Delete expired entries and temporary files left by interrupted writes; returns the count"""
+        removed, now = 0, time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.startswith(self.TMP_PREFIX):
+                    expired = os.path.getmtime(path) < now - 60
+                elif name.startswith('.'):
+                    continue
+                else:
+                    expires_at, _ = self._read(path)
+                    expired = expires_at is not None and expires_at <= now
+                if expired:
+                    os.remove(path)
+                    removed += 1
+            except (FileNotFoundError, ValueError):
+                continue
+        return removed
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+
+class RedisCacheBackend:
+    """
+    Redis (or any Redis-compatible server) backend shared by every worker and host
+    Pass client= to use an existing client such as fakeredis.FakeRedis()
+    """
+    def __init__(self, url=None, client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package (pip install redis)")
+            client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self.client = client
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl=None):
+        # Milliseconds: a sub-second ttl would round down to 'never expires' in seconds
+        self.client.set(key, value, px=max(1, int(ttl * 1000)) if ttl else None)
+
+    def incr(self, key):
+        return self.client.incr(key)
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{CACHE_PREFIX}:*"):
+            self.client.delete(key)
+
+def make_cache_backend(name=None):
+    """Build the backend selected by CACHE_BACKEND"""
+    name = (name or CACHE_BACKEND).lower()
+    if name == 'redis':
+        return RedisCacheBackend(CACHE_URL)
+    if name == 'filesystem':
+        return FileCacheBackend(CACHE_DIR, sweep_interval=CACHE_SWEEP_INTERVAL)
+    if name == 'local':
+        return LocalCacheBackend(max_entries=CACHE_MAX_ENTRIES)
+    raise ValueError(f"Unknown CACHE_BACKEND '{name}'. Expected local, redis or filesystem")
+
+class VersionedCache:
+    """
+    Cache whose keys embed a version number per namespace (e.g. 'account:1', 'month:2025-06')
+    Writes bump the namespace version instead of deleting keys, so every worker
+    sharing the backend stops reading the old entries at once; they then expire via TTL.
+    Values are stored as JSON, never pickled: anyone able to write to a shared Redis or cache
+    directory could otherwise run code in the app. Backend errors are logged and treated as
+    misses so a cache outage never breaks a page.
+    pin, if given, returns an extra key part for the current read (or None): entries loaded
+    under one pin are never returned under another, whatever the namespace versions say.
+    """
+    def __init__(self, backend, ttl=60.0, prefix='finance', pin=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.prefix = prefix
+        self.pin = pin
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _version_key(self, namespace):
+        return f"{self.prefix}:ver:{namespace}"
+
+    def version(self, namespace):
+        value = self.backend.get(self._version_key(namespace))
+        return int(value) if value else 0
+
+    def get_or_load(self, namespace, key, loader, ttl=None):
+        """Return the cached value, calling loader() and caching its result on a miss"""
+        try:
+            cache_key = f"{self.prefix}:{namespace}:v{self.version(namespace)}:{key}"
+            pin = self.pin() if self.pin else None
+            if pin is not None:
+                cache_key += f":@{pin}"
+            cached = self.backend.get(cache_key)
+        except Exception as e:
+            self.errors += 1
+            metrics.cache_result('query', 'error')
+            logger.warning(f"Cache read failed for {namespace}/{key}: {e}")
+            return loader()
+
+        if cached is not None:
+            try:
+                value = json.loads(cached)
+            except ValueError:
+                # e.g. an entry written by an older release; reloading overwrites it
+                self.errors += 1
+                logger.warning(f"Discarding unreadable cache entry {namespace}/{key}")
+            else:
+                self.hits += 1
+                metrics.cache_result('query', 'hit')
+                return value
+
+        self.misses += 1
+        metrics.cache_result('query', 'miss')
+        value = loader()
+        try:
+            self.backend.set(cache_key, json.dumps(value).encode(), self.ttl if ttl is None else ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache write failed for {namespace}/{key}: {e}")
+        return value
+
+    def bump(self, *namespaces):
+        """Invalidate everything cached under the given namespaces"""
+        for namespace in namespaces:
+            try:
+                self.backend.incr(self._version_key(namespace))
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Cache invalidation failed for {namespace}, entries may be stale for {self.ttl}s: {e}")
+
+    def stats(self):
+        return {'backend': type(self.backend).__name__, 'hits': self.hits,
+                'misses': self.misses, 'errors': self.errors}
+
+def page_data_pin():
+    """
+    Digest of the data version a conditional page's ETag is built from (see conditional_page)
+    The page's cached reads are keyed on it, so its body is loaded under the same version as
+    its ETag even when a write made in another worker has not bumped this worker's cache.
+    """
+    if not has_request_context() or g.get('data_version') is None:
         return None
+    return hashlib.sha1(json.dumps(g.data_version, sort_keys=True, default=str).encode()).hexdigest()[:16]
 
-@app.route('/')
-def index():
+query_cache = VersionedCache(make_cache_backend(), ttl=CACHE_TTL, prefix=CACHE_PREFIX, pin=page_data_pin)
+
+# Upper bound on how long a rendered fragment is kept. Fragment keys are never invalidated
+# (a new data version makes a new key), so every one must expire.
+FRAGMENT_CACHE_TTL = float(os.environ.get('FRAGMENT_CACHE_TTL', 3600))
+
+class FragmentCacheExtension(Extension):
     """
-    Main dashboard showing account overview, reconciliation state, and recent activity
+    Jinja tag caching a rendered block in the shared cache backend
+
+        {% cache timeout, 'name', key_part, ... %} ... {% endcache %}
+
+    timeout is in seconds and capped at FRAGMENT_CACHE_TTL (None means the cap). The key
+    parts must identify everything the block renders. If any key part is None or undefined
+    the block is rendered without caching. Cache the data behind a block first: a fragment
+    only saves the rendering.
     """
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render_cached', [nodes.List(args)]),
+                               [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, args, caller):
+        cache = self.environment.fragment_cache
+        timeout, parts = min(args[0] or FRAGMENT_CACHE_TTL, FRAGMENT_CACHE_TTL), args[1:]
+        if cache is None or not parts or any(p is None or isinstance(p, Undefined) for p in parts):
+            return caller()
+
+        digest = hashlib.sha1(json.dumps([APP_VERSION] + parts, default=str).encode()).hexdigest()
+        key = f"{cache.prefix}:fragment:{digest}"
+        try:
+            cached = cache.backend.get(key)
+        except Exception as e:
+            metrics.cache_result('fragment', 'error')
+            logger.warning(f"Fragment cache read failed: {e}")
+            return caller()
+        if cached is not None:
+            cache.hits += 1
+            metrics.cache_result('fragment', 'hit')
+            return Markup(cached.decode())
+
+        cache.misses += 1
+        metrics.cache_result('fragment', 'miss')
+        html = caller()
+        try:
+            cache.backend.set(key, str(html).encode(), timeout)
+        except Exception as e:
+            logger.warning(f"Fragment cache write failed: {e}")
+        return html
+
+app.jinja_env.add_extension(FragmentCacheExtension)
+app.jinja_env.fragment_cache = query_cache
+
+@app.context_processor
+def inject_data_version():
+    """Expose the data version fetched by conditional_page to templates for fragment cache keys"""
+    return {'data_version': g.get('data_version')}
+
+# Columns each table is read with. Views select only these instead of '*', the snapshot
+# functions build rows from the same lists (migrations/012_projected_snapshots.sql), and
+# `flask templates check-fields` fails if a template uses a field missing here.
+PROJECTIONS = {
+    'account': ('id', 'balance', 'cash_box', 'primary_account', 'start_month'),
+    'transaction': ('id', 'transaction_date', 'type', 'amount', 'description', 'payment_method'),
+    'reconciled_month': ('month', 'is_reconciled', 'reconciled_at', 'starting_balance', 'starting_cash',
+                         'closing_balance', 'closing_cash'),
+    'savings_goal': ('id', 'name', 'current_amount', 'target_amount'),
+}
+
+def columns(projection):
+    """Select list for a projection, e.g. supabase.table('accounts').select(columns('account'))"""
+    return ', '.join(PROJECTIONS[projection])
+
+# Template variable -> (projection, fields the view adds to the rows itself)
+TEMPLATE_FIELDS = {
+    'overview.html': {
+        'accounts': ('account', ()),
+        'transactions': ('transaction', ()),
+        'reconciled_data': ('reconciled_month', ('formatted_month',)),
+        'reconciled_months': ('reconciled_month', ('formatted_month', 'month_short')),
+    },
+    'monthly_activity.html': {
+        'accounts': ('account', ('cash_in', 'cash_out', 'income', 'expenses')),
+        'transactions': ('transaction', ()),
+        'reconciled_data': ('reconciled_month', ('formatted_month',)),
+        'reconciled_months': ('reconciled_month', ('formatted_month', 'month_short')),
+    },
+    'transactions_table.html': {
+        'accounts': ('account', ('month',)),
+        'transactions': ('transaction', ()),
+        'goals': ('savings_goal', ()),
+    },
+    'accountsetup.html': {
+        'accounts': ('account', ()),
+    },
+}
+
+def template_field_errors(template_name, variables):
+    """
+    Return (line, variable, field) for every field a template reads that its projection lacks
+    Follows loop variables ({% for t in transactions %}) and aliases ({% set latest = transactions[0] %}).
+    """
+    source = app.jinja_loader.get_source(app.jinja_env, template_name)[0]
+    ast = app.jinja_env.parse(source)
+
+    def variable_of(expr):
+        # transactions, transactions[0] and transactions|first all name rows of 'transactions'
+        while (isinstance(expr, nodes.Filter) and expr.name in ('first', 'last')) or \
+                (isinstance(expr, nodes.Getitem) and isinstance(expr.arg, nodes.Const) and isinstance(expr.arg.value, int)):
+            expr = expr.node
+        return aliases.get(expr.name) if isinstance(expr, nodes.Name) else None
+
+    aliases = {name: name for name in variables}
+    bindings = [(n.target, n.iter) for n in ast.find_all(nodes.For)]
+    bindings += [(n.target, n.node) for n in ast.find_all(nodes.Assign)]
+    for target, expr in bindings:
+        if isinstance(target, nodes.Name) and variable_of(expr):
+            aliases[target.name] = variable_of(expr)
+
+    errors = []
+    for node in ast.find_all((nodes.Getattr, nodes.Getitem)):
+        if not isinstance(node.node, nodes.Name) or node.node.name not in aliases:
+            continue
+        if isinstance(node, nodes.Getattr):
+            field_name = node.attr
+        elif isinstance(node.arg, nodes.Const) and isinstance(node.arg.value, str):
+            field_name = node.arg.value
+        else:
+            continue
+        variable = aliases[node.node.name]
+        projection, computed = variables[variable]
+        if field_name not in PROJECTIONS[projection] and field_name not in computed:
+            errors.append((node.lineno, variable, field_name))
+    return errors
+
+# Response compression. HTML and JSON bodies of at least COMPRESSION_MIN_SIZE bytes are
+# compressed with brotli (when installed and accepted) or gzip; streamed pages are compressed
+# chunk by chunk, each flushed so it still reaches the browser as soon as it is rendered.
+RESPONSE_COMPRESSION = os.environ.get('RESPONSE_COMPRESSION', 'true').lower() in ('1', 'true', 'yes')
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))  # Bytes
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))  # 1-9
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))  # 0-11; pages are compressed per request
+# text/event-stream is left out: /events must not wait on a compressor's buffer
+COMPRESSIBLE_MIMETYPES = ('text/html', 'text/plain', 'text/css', 'application/json', 'application/javascript',
+                          'image/svg+xml')
+
+# Streamed pages send their first chunks (head, header and balance cards) while the rest,
+# such as a long transaction table, is still being rendered.
+STREAM_TEMPLATES = os.environ.get('STREAM_TEMPLATES', 'true').lower() in ('1', 'true', 'yes')
+STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 8192))  # Characters buffered before each send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # gzip only
+
+def _chunked(pieces, size, response):
+    buffer, buffered = [], 0
     try:
-        # Fetch account data for user_id = 1
-        account_response = supabase.table('accounts').select('*').eq('id', 1).execute()
-        accounts = account_response.data[0] if account_response.data else None
-        
-        # Fetch recent transactions
-        transactions_response = supabase.table('transactions').select('*').order('created_at', desc=True).limit(5).execute()
-        transactions = transactions_response.data or []
-
-        # First try to fetch oldest unreconciled month, if none exist get the latest reconciled month
-        recon_response = supabase.table('reconciled_months')\
-            .select('*')\
-            .eq('is_reconciled', False)\
-            .order('month')\
-            .limit(1)\
+        for piece in pieces:
+            buffer.append(piece)
+            buffered += len(piece)
+            if buffered >= size:
+                yield ''.join(buffer)
+                buffer, buffered = [], 0
+        if buffer:
+            yield ''.join(buffer)
+    except Exception as e:
+        # The 200 and the first chunks are already sent, so the page can only be cut short:
+        # record the failure for the metrics and trace hooks and let the server drop the connection
+        logger.error(f"Streamed page failed after its first chunk: {e}")
+        response.stream_error = e
+        raise
+    finally:
+        # A client that goes away mid-page closes this generator; end the render with it
+        pieces.close()
+
+def _resume(first, chunks):
+    try:
+        if first is not None:
+            yield first
+        yield from chunks
+    finally:
+        chunks.close()
+
+def final_status(response):
+    """Status to record for a response: a streamed page that failed after its headers counts as a 500"""
+    return 500 if getattr(response, 'stream_error', None) is not None else response.status_code
+
+def render_page(template_name, **context):
+    """
+    render_template, or with STREAM_TEMPLATES a response streamed in STREAM_CHUNK_SIZE chunks
+    Views pass fully loaded data, so only rendering happens while streaming. The first chunk
+    is rendered before returning, so errors near the top of the template still reach the view;
+    a later error cuts the page short and is recorded as a 500 (see final_status).
+    """
+    if not STREAM_TEMPLATES:
+        return render_template(template_name, **context)
+    response = app.response_class(mimetype='text/html')
+    chunks = _chunked(stream_template(template_name, **context), STREAM_CHUNK_SIZE, response)
+    response.response = _resume(next(chunks, None), chunks)
+    # Proxies such as nginx would otherwise hold the chunks back until the page is complete
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def _compress_chunks(source, chunks, encoding):
+    try:
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+            for chunk in chunks:
+                yield compressor.process(chunk) + compressor.flush()
+            yield compressor.finish()
+        else:
+            compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+            for chunk in chunks:
+                yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            yield compressor.flush()
+    finally:
+        if hasattr(source, 'close'):
+            source.close()
+
+@app.after_request
+def compress_response(response):
+    if not RESPONSE_COMPRESSION or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.direct_passthrough or 'Content-Encoding' in response.headers or \
+            response.status_code < 200 or response.status_code in (204, 206, 304) or \
+            'no-transform' in response.headers.get('Cache-Control', ''):
+        return response
+    encoding = request.accept_encodings.best_match(['br', 'gzip'] if brotli else ['gzip'])
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        source = response.response
+        response.response = _compress_chunks(source, response.iter_encoded(), encoding)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESSION_MIN_SIZE:
+            return response
+        if encoding == 'br':
+            response.set_data(brotli.compress(data, quality=COMPRESSION_BROTLI_QUALITY))
+        else:
+            response.set_data(gzip.compress(data, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0))
+    response.headers['Content-Encoding'] = encoding
+    # The compressed body is a different byte sequence, so a strong validator would be wrong
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+# Static assets. `flask assets build` purges the vendor stylesheets down to the classes the
+# templates use, fingerprints every file into static/dist/ and pre-compresses the text ones;
+# templates link them through asset_url()/asset_stylesheets(). Without a build the pages fall
+# back to the CDN stylesheets and the unprocessed files in static/.
+ASSET_DIST_DIR = os.path.join(app.static_folder, 'dist')
+ASSET_MANIFEST = os.path.join(ASSET_DIST_DIR, 'manifest.json')
+ASSET_MAX_AGE = 365 * 24 * 3600  # Fingerprinted files never change
+ASSET_CONTENT = ('templates/*.html', 'static/js/*.js')  # Scanned for the class names in use
+
+# Bundled, in this order, into one app.css
+ASSET_STYLESHEETS = (
+    'https://cdn.jsdelivr.net/npm/tailwindcss@2.2.19/dist/tailwind.min.css',
+    'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css',
+)
+ASSET_SCRIPTS = ('js/live_updates.js',)
+# Image -> largest width in pixels it is shown at (twice the CSS size, for high-density screens)
+ASSET_IMAGES = {
+    'KrumbleKornerLogo.png': 224,
+    'ChocolateChipCookie.png': 64,
+}
+ASSET_COMPRESSIBLE = ('.css', '.js', '.svg')
+
+_asset_manifest = {'mtime': None, 'files': {}}
+
+def load_asset_manifest():
+    """Logical name -> fingerprinted file in static/dist/, re-read when a build replaces it"""
+    try:
+        mtime = os.path.getmtime(ASSET_MANIFEST)
+    except OSError:
+        return {}
+    if mtime != _asset_manifest['mtime']:
+        with open(ASSET_MANIFEST) as f:
+            _asset_manifest['files'] = json.load(f)
+        _asset_manifest['mtime'] = mtime
+    return _asset_manifest['files']
+
+@app.template_global()
+def asset_url(name):
+    """URL of a static file, e.g. asset_url('js/live_updates.js'); the fingerprinted copy once built"""
+    built = load_asset_manifest().get(name)
+    if built:
+        return url_for('static_asset', filename=built)
+    return url_for('static', filename=name)
+
+@app.template_global()
+def asset_stylesheets():
+    """Stylesheet URLs for a page: the purged app.css bundle, or the CDN originals if not built"""
+    built = load_asset_manifest().get('app.css')
+    if built:
+        return [url_for('static_asset', filename=built)]
+    return list(ASSET_STYLESHEETS)
+
+@app.route('/static/dist/<path:filename>')
+def static_asset(filename):
+    """
+    Serve a fingerprinted asset with far-future caching, using its pre-compressed
+    .br or .gz copy when the client accepts that encoding
+    """
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if encoding in request.accept_encodings and os.path.isfile(os.path.join(ASSET_DIST_DIR, filename + suffix)):
+            response = send_from_directory(ASSET_DIST_DIR, filename + suffix, mimetype=mimetype,
+                                           max_age=ASSET_MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(ASSET_DIST_DIR, filename, mimetype=mimetype, max_age=ASSET_MAX_AGE)
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+def parse_css(css):
+    """
+    Split a stylesheet into its top-level (prelude, body) pairs
+    Statements such as @import have body None; comments are dropped except /*! license */ ones.
+    """
+    rules, start, depth, i = [], 0, 0, 0
+    while i < len(css):
+        char = css[i]
+        if css.startswith('/*', i):
+            end = css.find('*/', i + 2)
+            end = len(css) if end < 0 else end + 2
+            if depth == 0:
+                if css.startswith('/*!', i):
+                    rules.append((css[i:end], None))
+                start = end
+            i = end
+            continue
+        if char in '"\'':
+            end = i + 1
+            while end < len(css) and css[end] != char:
+                end += 2 if css[end] == '\\' else 1
+            i = end + 1
+            continue
+        if char == '{':
+            if depth == 0:
+                prelude, body_start = css[start:i].strip(), i + 1
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                rules.append((prelude, css[body_start:i]))
+                start = i + 1
+        elif char == ';' and depth == 0:
+            if css[start:i].strip():
+                rules.append((css[start:i].strip(), None))
+            start = i + 1
+        i += 1
+    return rules
+
+def _css_rule(prelude, body):
+    if body is None:
+        return prelude if prelude.startswith('/*') else prelude + ';'
+    return f"{prelude}{{{body}}}"
+
+def _split_selectors(prelude):
+    selectors, depth, start = [], 0, 0
+    for i, char in enumerate(prelude):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(prelude[start:i].strip())
+            start = i + 1
+    selectors.append(prelude[start:].strip())
+    return selectors
+
+CSS_CLASS_RE = re.compile(r'\.((?:\\.|[\w-])+)')
+CSS_NOT_RE = re.compile(r':not\([^)]*\)')
+# Tailwind's default extractor (anything between quotes, angle brackets and whitespace),
+# also splitting at Jinja's braces: class="{% if x %}fa-check{% else %}fa-clock{% endif %}"
+CONTENT_TOKEN_RE = re.compile(r'[^<>"\'`\s{}]*[^<>"\'`\s{}:]')
+
+def _selector_classes(selector):
+    # Classes inside :not() exclude elements, so they need not be in use
+    return {re.sub(r'\\(.)', r'\1', name) for name in CSS_CLASS_RE.findall(CSS_NOT_RE.sub('', selector))}
+
+def purge_css(css, used_classes):
+    """
+    Drop the selectors of a stylesheet that need a class no template uses, and the
+    rules left without selectors. Element rules and other at-rules are kept.
+    """
+    out = []
+    for prelude, body in parse_css(css):
+        if body is None or (prelude.startswith('@') and not prelude.startswith(('@media', '@supports'))):
+            out.append(_css_rule(prelude, body))
+        elif prelude.startswith('@'):
+            inner = purge_css(body, used_classes)
+            if inner:
+                out.append(_css_rule(prelude, inner))
+        else:
+            selectors = [s for s in _split_selectors(prelude) if _selector_classes(s) <= used_classes]
+            if selectors:
+                out.append(_css_rule(','.join(selectors), body))
+    return ''.join(out)
+
+def _declarations(body):
+    return {name.strip().lower(): value.strip() for name, _, value in
+            (d.partition(':') for d in body.split(';')) if value}
+
+def _font_faces_in_use(css):
+    """(family, weight) pairs the class rules of a purged stylesheet render text with"""
+    in_use = set()
+    for prelude, body in parse_css(css):
+        if body is None:
+            continue
+        if prelude.startswith(('@media', '@supports')):
+            in_use |= _font_faces_in_use(body)
+        elif not prelude.startswith('@') and CSS_CLASS_RE.search(prelude):
+            declarations = _declarations(body)
+            families = re.findall(r'"([^"]+)"', declarations.get('font-family', ''))
+            weights = re.findall(r'\d{3}', declarations.get('font-weight', '')) or [None]
+            in_use |= {(family, weight) for family in families for weight in weights}
+    return in_use
+
+def prune_at_rules(css):
+    """
+    Drop the @keyframes no rule animates with and the @font-face rules no class renders
+    with, keeping only the woff2 source of the remaining fonts
+    Returns the stylesheet and the font URLs it still references.
+    """
+    in_use = _font_faces_in_use(css)
+    families = {family for family, _ in in_use}
+    out, fonts = [], []
+    for prelude, body in parse_css(css):
+        keyframes = re.match(r'@(?:-webkit-)?keyframes\s+(\S+)', prelude)
+        if keyframes and not re.search(rf'animation[\w-]*:[^;}}]*\b{re.escape(keyframes.group(1))}\b', css):
+            continue
+        if prelude == '@font-face':
+            declarations = _declarations(body)
+            family = declarations.get('font-family', '').strip('"\'')
+            weight = declarations.get('font-weight')
+            if family not in families or ((family, weight) not in in_use and (family, None) not in in_use):
+                continue
+            woff2 = re.search(r'url\(([^)]+\.woff2)\)', declarations.get('src', ''))
+            if woff2:
+                fonts.append(woff2.group(1).strip('"\''))
+                body = re.sub(r'src:[^;]*', f'src:url({woff2.group(1)}) format("woff2")', body)
+        out.append(_css_rule(prelude, body))
+    return ''.join(out), list(dict.fromkeys(fonts))
+
+def used_css_classes(root=None):
+    """Every token of the templates and scripts that could be a class name"""
+    root = root or app.root_path
+    tokens = set()
+    for pattern in ASSET_CONTENT:
+        for path in glob.glob(os.path.join(root, pattern)):
+            with open(path, encoding='utf-8') as f:
+                tokens.update(CONTENT_TOKEN_RE.findall(f.read()))
+    return tokens
+
+def fetch_vendor_file(url, vendor_dir):
+    """Contents of a pinned vendor file, downloaded once into vendor_dir"""
+    path = os.path.join(vendor_dir, os.path.basename(urllib.parse.urlparse(url).path))
+    if not os.path.exists(path):
+        response = httpx.get(url, follow_redirects=True, timeout=30)
+        response.raise_for_status()
+        os.makedirs(vendor_dir, exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(response.content)
+    with open(path, 'rb') as f:
+        return f.read()
+
+def optimize_image(data, max_width):
+    """Downscale a PNG to max_width and re-encode it; unchanged without Pillow"""
+    try:
+        from PIL import Image
+    except ImportError:
+        logger.warning("Pillow is not installed; images are copied without resizing (pip install Pillow)")
+        return data
+    image = Image.open(io.BytesIO(data))
+    if image.width > max_width:
+        image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+    out = io.BytesIO()
+    image.save(out, format='PNG', optimize=True)
+    return min(out.getvalue(), data, key=len)
+
+def write_fingerprinted(dist_dir, name, data):
+    """Write data as name.<hash>.ext (plus .gz and .br copies for text files); returns the file name"""
+    stem, ext = os.path.splitext(os.path.basename(name))
+    filename = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+    with open(os.path.join(dist_dir, filename), 'wb') as f:
+        f.write(data)
+    if ext in ASSET_COMPRESSIBLE:
+        with open(os.path.join(dist_dir, filename + '.gz'), 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli:
+            with open(os.path.join(dist_dir, filename + '.br'), 'wb') as f:
+                f.write(brotli.compress(data, quality=11))
+    return filename
+
+def build_assets(vendor_dir, dist_dir=ASSET_DIST_DIR):
+    """
+    Build static/dist/: the purged app.css bundle with its fonts, fingerprinted
+    scripts and resized images, and the manifest templates resolve names with
+    """
+    used = used_css_classes()
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest = {}
+
+    bundle = []
+    for url in ASSET_STYLESHEETS:
+        css = purge_css(fetch_vendor_file(url, vendor_dir).decode('utf-8'), used)
+        css, fonts = prune_at_rules(css)
+        for font in fonts:
+            font_url = urllib.parse.urljoin(url, font)
+            built = write_fingerprinted(dist_dir, font_url, fetch_vendor_file(font_url, vendor_dir))
+            css = css.replace(font, built)
+        bundle.append(css)
+    manifest['app.css'] = write_fingerprinted(dist_dir, 'app.css', '\n'.join(bundle).encode('utf-8'))
+
+    for name in ASSET_SCRIPTS:
+        with open(os.path.join(app.static_folder, name), 'rb') as f:
+            manifest[name] = write_fingerprinted(dist_dir, name, f.read())
+    for name, max_width in ASSET_IMAGES.items():
+        with open(os.path.join(app.static_folder, name), 'rb') as f:
+            manifest[name] = write_fingerprinted(dist_dir, name, optimize_image(f.read(), max_width))
+
+    # Files of earlier builds are left in place for pages still cached by browsers
+    manifest_path = os.path.join(dist_dir, 'manifest.json')
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+# Route reads. Views execute these builders and `flask db check-plans` EXPLAINs the SQL
+# PostgREST runs for them, so the checked queries are the ones the pages send.
+def account_query(account_id):
+    return supabase.table('accounts').select(columns('account')).eq('id', account_id)
+
+def recent_transactions_query(limit=5):
+    return supabase.table('transactions').select(columns('transaction')).order('created_at', desc=True).limit(limit)
+
+def open_month_query():
+    """Oldest unreconciled month, shown on the "Open Month Activity" card"""
+    return supabase.table('reconciled_months')\
+        .select(columns('reconciled_month'))\
+        .eq('is_reconciled', False)\
+        .order('month')\
+        .limit(1)
+
+def recent_reconciled_months_query(limit=RECENT_RECONCILED_MONTHS):
+    return supabase.table('reconciled_months')\
+        .select(columns('reconciled_month'))\
+        .eq('is_reconciled', True)\
+        .order('month', desc=True)\
+        .limit(limit)
+
+def month_row_query(month_start, select=None):
+    """Starting balances and reconciliation status of a month"""
+    return supabase.table('reconciled_months')\
+        .select(select or columns('reconciled_month'))\
+        .eq('month', month_start)
+
+def month_transactions_query(month_start):
+    return supabase.table('transactions')\
+        .select(columns('transaction'))\
+        .gte('transaction_date', month_start)\
+        .lt('transaction_date', month_bounds(month_start)[1])\
+        .order('transaction_date', desc=True)
+
+def month_rollups_query(month_start, account_id=None):
+    query = supabase.table('monthly_rollups')\
+        .select('type, payment_method, txn_count, total')\
+        .eq('month', month_start)
+    if account_id is not None:
+        query = query.eq('account_id', account_id)
+    return query
+
+def month_snapshot_query(month_start):
+    return supabase.table('month_snapshots').select('snapshot').eq('month', month_start)
+
+def get_account(account_id=1):
+    """
+    Return the accounts row (cached), or None if it does not exist
+    """
+    def load():
+        response = account_query(account_id).execute()
+        return response.data[0] if response.data else None
+    return query_cache.get_or_load(f'account:{account_id}', 'row', load)
+
+def get_recent_reconciled_months(limit=RECENT_RECONCILED_MONTHS):
+    """
+    Return the most recent reconciled months, newest first (cached)
+    """
+    def load():
+        response = recent_reconciled_months_query(limit).execute()
+        return response.data or []
+    return query_cache.get_or_load('reconciled_months', f'recent:{limit}', load)
+
+def invalidate_account_cache(account_id):
+    """Call after any write that changes an accounts row (balances, setup fields)"""
+    query_cache.bump(f'account:{account_id}', 'data_version')
+
+def invalidate_month_cache(*dates):
+    """Call after any write to transactions dated in these months (YYYY-MM or longer date strings)"""
+    query_cache.bump('data_version', *{f'month:{str(d)[:7]}' for d in dates if d})
+
+def invalidate_reconciled_months_cache():
+    """Call after any write to reconciled_months"""
+    query_cache.bump('reconciled_months', 'data_version')
+
+def month_bounds(month_start):
+    """
+    Return (first day, first day of next month) as YYYY-MM-DD strings for a YYYY-MM-DD month
+    """
+    start = datetime.strptime(month_start, '%Y-%m-%d').replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+
+@dataclass
+class MonthTotals:
+    """Transaction count and amount per (type, payment_method) for one month"""
+    totals: dict = field(default_factory=dict)
+    counts: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_groups(cls, groups):
+        """Build from month_totals() rows: type, payment_method, txn_count, total"""
+        month = cls()
+        for g in groups:
+            key = (g.get('type'), g.get('payment_method'))
+            month.totals[key] = month.totals.get(key, 0) + (g.get('total') or 0)
+            month.counts[key] = month.counts.get(key, 0) + (g.get('txn_count') or 0)
+        return month
+
+    @classmethod
+    def from_rows(cls, transactions):
+        """Build from raw transaction rows in a single pass"""
+        month = cls()
+        for t in transactions:
+            key = (t.get('type'), t.get('payment_method'))
+            month.totals[key] = month.totals.get(key, 0) + (t.get('amount') or 0)
+            month.counts[key] = month.counts.get(key, 0) + 1
+        return month
+
+    def groups(self):
+        """The month_totals() rows this was built from, e.g. to cache as JSON"""
+        return [{'type': t, 'payment_method': m, 'txn_count': self.counts.get((t, m), 0), 'total': total}
+                for (t, m), total in self.totals.items()]
+
+    def amount(self, transaction_type, payment_method=None):
+        return sum(v for (t, m), v in self.totals.items()
+                   if t == transaction_type and (payment_method is None or m == payment_method))
+
+    @property
+    def cash_in(self):
+        return self.amount('income', 'cash')
+
+    @property
+    def cash_out(self):
+        return self.amount('expense', 'cash')
+
+    @property
+    def bank_income(self):
+        return self.amount('income', 'bank')
+
+    @property
+    def bank_expenses(self):
+        return self.amount('expense', 'bank')
+
+    @property
+    def total_income(self):
+        return self.amount('income')
+
+    @property
+    def total_expenses(self):
+        return self.amount('expense')
+
+    @property
+    def transaction_count(self):
+        return sum(self.counts.values())
+
+    def to_dict(self):
+        return {
+            'cash_in': self.cash_in,
+            'cash_out': self.cash_out,
+            'bank_income': self.bank_income,
+            'bank_expenses': self.bank_expenses,
+            'total_income': self.total_income,
+            'total_expenses': self.total_expenses,
+            'transaction_count': self.transaction_count
+        }
+
+def fetch_month_totals(month_start, account_id=None):
+    """
+    Read a month's totals (cached per month and account)
+    """
+    groups = query_cache.get_or_load(f'month:{month_start[:7]}', f'totals:{account_id}',
+                                     lambda: _fetch_month_totals(month_start, account_id).groups())
+    return MonthTotals.from_groups(groups)
+
+def fetch_month_transactions(month_start):
+    """
+    Return the month's transactions for the month table (cached per month)
+    Writes to the month bump its cache version, so the next view fetches them again.
+    """
+    return query_cache.get_or_load(f'month:{month_start[:7]}', 'transactions',
+                                   lambda: month_transactions_query(month_start).execute().data or [])
+
+def _fetch_month_totals(month_start, account_id=None):
+    """
+    Read a month's totals from the monthly_rollups table (see migrations/003_monthly_rollups.sql)
+    The rollups are maintained by triggers, so this is a handful of rows regardless of volume
+    """
+    start, _ = month_bounds(month_start)
+    try:
+        return MonthTotals.from_groups(month_rollups_query(start, account_id).execute().data or [])
+    except Exception as e:
+        if account_id is not None:
+            raise
+        logger.warning(f"monthly_rollups unavailable, aggregating transactions instead: {e}")
+        return aggregate_month_totals(month_start)
+
+def aggregate_month_totals(month_start):
+    """
+    Aggregate a month's transactions in Postgres via the month_totals function
+    (see migrations/002_month_totals.sql)
+    Falls back to summing a narrow projection of the rows if the function is missing
+    """
+    start, end = month_bounds(month_start)
+    try:
+        response = supabase.rpc('month_totals', {'p_month_start': start, 'p_month_end': end}).execute()
+        return MonthTotals.from_groups(response.data or [])
+    except Exception as e:
+        logger.warning(f"month_totals RPC unavailable, summing rows instead: {e}")
+        response = supabase.table('transactions')\
+            .select('type, payment_method, amount')\
+            .gte('transaction_date', start)\
+            .lt('transaction_date', end)\
             .execute()
-        
-        if not recon_response.data:
-            # If no unreconciled months found, get the most recent reconciled month
-            recon_response = supabase.table('reconciled_months')\
-                .select('*')\
-                .eq('is_reconciled', True)\
-                .order('month', desc=True)\
-                .limit(1)\
-                .execute()
-        
-        reconciled_data = recon_response.data[0] if recon_response.data else None
-        
-        # Format the date after retrieving it
-        if reconciled_data and 'month' in reconciled_data:
-            date_obj = datetime.strptime(reconciled_data['month'], '%Y-%m-%d')
-            reconciled_data['formatted_month'] = date_obj.strftime('%B %Y')
-        
-        # Get current date for the template
-        today = datetime.today()
-        
-        # Ensure the accounts object has all required fields
-        if accounts:
-            accounts = {
-                'month': accounts.get('month', today.strftime('%B %Y')),
-                'cash_box': accounts.get('cash_box', 0),
-                'primary_account': accounts.get('primary_account', 0),
-                'balance': accounts.get('balance', 0)
-            }
+        return MonthTotals.from_rows(response.data or [])
+
+@dataclass
+class MonthSnapshot:
+    """Page data of a reconciled month, frozen at reconciliation (see migrations/009_month_snapshots.sql)"""
+    month_row: dict
+    totals: MonthTotals
+    transactions: list
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('month_row') or {}, MonthTotals.from_groups(data.get('totals') or []),
+                   data.get('transactions') or [])
+
+def fetch_month_snapshot(month_start):
+    """
+    Return the MonthSnapshot of a reconciled month, or None if the month has none
+    Read by primary key and cached with the month's other entries, so writes to the month evict it.
+    """
+    def load():
+        response = month_snapshot_query(month_start).execute()
+        return response.data[0]['snapshot'] if response.data else None
+
+    try:
+        data = query_cache.get_or_load(f'month:{month_start[:7]}', 'snapshot', load)
+    except Exception as e:
+        logger.warning(f"Month snapshot unavailable for {month_start}, computing the month instead: {e}")
+        return None
+    return MonthSnapshot.from_dict(data) if data else None
+
+def store_month_snapshot(month_start):
+    """
+    Freeze a reconciled month into month_snapshots via the snapshot_month function
+    Returns True if a snapshot was stored. Failures are logged: the month page then computes the month live.
+    """
+    try:
+        snapshot = call_function('snapshot_month', {'p_month': month_start})
+    except Exception as e:
+        if is_missing_function_error(e):
+            logger.warning(f"snapshot_month RPC unavailable, {month_start} will be computed on each view")
+        else:
+            logger.error(f"Failed to snapshot month {month_start}: {e}")
+        return False
+    invalidate_month_cache(month_start)
+    return bool(snapshot)
 
-        # Fetch a short list of recent reconciled months for the "Previous Month Activity" card
+def snapshot_reconciled_months(month_start=None):
+    """
+    Snapshot every reconciled month that has no snapshot, or month_start whether it has one or not
+    Edits to a closed month's transactions drop its snapshot; until this runs its page is computed live.
+    Returns the months snapshotted.
+    """
+    query = supabase.table('reconciled_months').select('month').eq('is_reconciled', True)
+    if month_start:
+        months = [row['month'] for row in query.eq('month', month_start).execute().data or []]
+    else:
+        snapshotted = {row['month'] for row in supabase.table('month_snapshots').select('month').execute().data or []}
+        months = [row['month'] for row in query.execute().data or [] if row['month'] not in snapshotted]
+    return [month for month in months if store_month_snapshot(month)]
+
+def format_reconciled_months(reconciled_months):
+    """
+    Format each reconciled month for display and provide a short month string YYYY-MM
+    """
+    for rm in reconciled_months:
         try:
-            reconciled_months_resp = supabase.table('reconciled_months')\
-                .select('*')\
-                .eq('is_reconciled', True)\
-                .order('month', desc=True)\
-                .limit(6)\
-                .execute()
-            reconciled_months = reconciled_months_resp.data or []
+            rm_date = datetime.strptime(rm.get('month', ''), '%Y-%m-%d')
+            rm['formatted_month'] = rm_date.strftime('%B %Y')
+            rm['month_short'] = rm.get('month', '')[:7]
         except Exception:
-            reconciled_months = []
+            rm['formatted_month'] = rm.get('month', '')
+            rm['month_short'] = rm.get('month', '')[:7]
+    return reconciled_months
+
+@dataclass
+class DashboardSnapshot:
+    """Everything the overview page renders, loaded in one go"""
+    accounts: Optional[dict] = None
+    transactions: list = field(default_factory=list)
+    reconciled_data: Optional[dict] = None
+    reconciled_months: list = field(default_factory=list)
+
+def _fetch_dashboard_rpc(account_id):
+    """
+    Fetch the overview data in a single round trip via the dashboard_snapshot function
+    (see migrations/001_dashboard_snapshot.sql)
+    """
+    data = call_function('dashboard_snapshot', {'p_account_id': account_id}) or {}
+    return (data.get('account'), data.get('transactions') or [],
+            data.get('reconciled_data'), data.get('reconciled_months') or [])
+
+def _fetch_dashboard_rest(account_id):
+    """
+    Fetch the overview data with one REST call per table
+    Used when the dashboard_snapshot function has not been deployed yet
+    """
+    batch = QueryBatch()
+    batch.add('account', lambda: get_account(account_id))
+    # Fetch recent transactions
+    batch.add('transactions', recent_transactions_query(), default=[])
+    # Oldest unreconciled month, shown on the "Open Month Activity" card
+    batch.add('open_month', open_month_query(), default=[])
+    # A short list of recent reconciled months for the "Previous Month Activity" card
+    batch.add('reconciled_months', get_recent_reconciled_months, default=[])
+    results = batch.run()
+
+    if not results.ok('account'):
+        raise RuntimeError(f"Failed to load account: {results.errors['account']}")
+
+    account = results['account']
+    reconciled_months = results['reconciled_months']
+
+    # If no unreconciled months found, use the most recent reconciled month
+    if results['open_month']:
+        reconciled_data = results['open_month'][0]
+    else:
+        reconciled_data = dict(reconciled_months[0]) if reconciled_months else None
+
+    return account, results['transactions'], reconciled_data, reconciled_months
+
+def load_dashboard_snapshot(account_id=1):
+    """
+    Load and format the overview page data
+    Prefers the single round trip RPC and falls back to per-table REST calls only while the
+    function is not deployed; other errors (timeouts, 5xx) are raised
+    """
+    try:
+        account, transactions, reconciled_data, reconciled_months = _fetch_dashboard_rpc(account_id)
+    except Exception as e:
+        if not is_missing_function_error(e):
+            raise
+        account, transactions, reconciled_data, reconciled_months = _fetch_dashboard_rest(account_id)
+
+    # Format the date after retrieving it
+    if reconciled_data and 'month' in reconciled_data:
+        date_obj = datetime.strptime(reconciled_data['month'], '%Y-%m-%d')
+        reconciled_data['formatted_month'] = date_obj.strftime('%B %Y')
+
+    # Ensure the accounts object has all required fields
+    accounts = None
+    if account:
+        accounts = {
+            'month': account.get('month', datetime.today().strftime('%B %Y')),
+            'cash_box': account.get('cash_box', 0),
+            'primary_account': account.get('primary_account', 0),
+            'balance': account.get('balance', 0)
+        }
+
+    return DashboardSnapshot(
+        accounts=accounts,
+        transactions=transactions,
+        reconciled_data=reconciled_data,
+        reconciled_months=format_reconciled_months(reconciled_months)
+    )
+
+def _compute_app_version():
+    """
+    Hash of the code and templates, so a deploy changes every ETag
+    Computed from file contents so all workers agree
+    """
+    digest = hashlib.sha1()
+    root = os.path.dirname(os.path.abspath(__file__))
+    paths = [os.path.join(root, 'app.py')]
+    templates_dir = os.path.join(root, 'templates')
+    if os.path.isdir(templates_dir):
+        paths += sorted(os.path.join(templates_dir, name) for name in os.listdir(templates_dir))
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            continue
+    return digest.hexdigest()[:12]
+
+APP_VERSION = os.environ.get('RENDER_GIT_COMMIT') or _compute_app_version()
+
+# Seconds a worker reuses a data version. Writes made through this app bump it at once (in every
+# worker with a shared CACHE_BACKEND); other changes show up on pages within this time.
+DATA_VERSION_TTL = float(os.environ.get('DATA_VERSION_TTL', 2))
+
+def fetch_data_version(account_id=1, month_start=None):
+    """
+    Latest change times of the data behind a page, via the data_version function
+    (see migrations/008_data_version.sql). One small query instead of the page's full query set,
+    and cached for DATA_VERSION_TTL so bursts of page views share it.
+    """
+    def load():
+        return call_function('data_version', {'p_account_id': account_id, 'p_month': month_start}) or {}
+    if DATA_VERSION_TTL <= 0:
+        return load()
+    return query_cache.get_or_load('data_version', f'{account_id}:{month_start}', load, ttl=DATA_VERSION_TTL)
+
+def _parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+
+def conditional_page(month_arg=None):
+    """
+    Decorator answering GET requests with 304 Not Modified when the page's data is unchanged
+    The ETag covers the URL, the data version, today's date (pages show it) and the app version.
+    month_arg names the query parameter (YYYY-MM) that scopes the page to one month.
+    Views set g.page_error when they render an error page, which is never given an ETag.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            # Flashed messages are one-shot, so that render must reach the browser
+            if request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            month_start = None
+            if month_arg:
+                try:
+                    month_start = datetime.strptime(
+                        request.args.get(month_arg, datetime.today().strftime('%Y-%m')), '%Y-%m').strftime('%Y-%m-01')
+                except ValueError:
+                    return view(*args, **kwargs)
 
-        # Format each reconciled month for display and provide a short month string YYYY-MM
-        for rm in reconciled_months:
             try:
-                rm_date = datetime.strptime(rm.get('month', ''), '%Y-%m-%d')
-                rm['formatted_month'] = rm_date.strftime('%B %Y')
-                rm['month_short'] = rm.get('month', '')[:7]
-            except Exception:
-                rm['formatted_month'] = rm.get('month', '')
-                rm['month_short'] = rm.get('month', '')[:7]
+                version = fetch_data_version(1, month_start)
+            except APIError as e:
+                # call_function has already warned about (and remembers) a missing data_version
+                if not is_missing_function_error(e):
+                    logger.error(f"data_version failed, serving {request.path} unconditionally: {e}")
+                return view(*args, **kwargs)
+            except httpx.HTTPError as e:
+                logger.error(f"data_version failed, serving {request.path} unconditionally: {e}")
+                return view(*args, **kwargs)
+            g.data_version = version
+
+            today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+            etag = hashlib.sha1(json.dumps(
+                [request.full_path, version, today.date().isoformat(), APP_VERSION],
+                sort_keys=True, default=str).encode()).hexdigest()
+            changed = [t for t in map(_parse_timestamp, version.values()) if t]
+            last_modified = max(changed + [today])
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = bool(request.if_modified_since) and \
+                    last_modified.replace(microsecond=0) <= request.if_modified_since
+
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or g.get('page_error'):
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            # Browsers must revalidate on every refresh, which is now a cheap 304
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+@app.route('/')
+@conditional_page()
+def index():
+    """
+    Main dashboard showing account overview, reconciliation state, and recent activity
+    """
+    try:
+        snapshot = load_dashboard_snapshot(account_id=1)
 
         return render_template('overview.html', 
-                            accounts=accounts,
-                            transactions=transactions,
-                            reconciled_data=reconciled_data,
-                            reconciled_months=reconciled_months,
-                            today=today)
+                            accounts=snapshot.accounts,
+                            transactions=snapshot.transactions,
+                            reconciled_data=snapshot.reconciled_data,
+                            reconciled_months=snapshot.reconciled_months,
+                            today=datetime.today())
 
     except Exception as e:
         logger.error(f"Error loading dashboard: {e}")
-        return render_template('overview.html', error="Failed to load dashboard data")
+        g.page_error = True
+        return render_template('overview.html', error="Failed to load dashboard data", today=datetime.today())
     
 @app.route('/monthly_activity')
+@conditional_page(month_arg='month')
 def monthly_activity():
     """
     Monthly activity page showing detailed financial breakdown and reconciliation status
     """
     try:
-        # Fetch account data for user_id = 1
-        account_response = supabase.table('accounts').select('*').eq('id', 1).execute()
-        accounts = account_response.data[0] if account_response.data else None
-        
         # Get the month we're looking at (either from request or default to current)
         selected_month = request.args.get('month', datetime.today().strftime('%Y-%m'))
         
         # Convert selected_month to datetime for comparison
         month_date = datetime.strptime(selected_month, '%Y-%m')
+        month_start = f"{selected_month}-01"  # Convert YYYY-MM to YYYY-MM-DD
+
+        # Only past months can have been closed, and a closed month is served from its
+        # snapshot, a single row lookup; the current month goes straight to the live reads
+        past_month = month_date < datetime.today().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+        # All reads for this page are independent, so run them concurrently
+        batch = QueryBatch()
+        # Fetch account data for user_id = 1
+        batch.add('account', lambda: get_account(1))
+        # Starting balances and reconciliation status for the month
+        batch.add('month_row', month_row_query(month_start), default=[])
+        # A short list of recent reconciled months for the "Previous Month Activity" card
+        batch.add('reconciled_months', get_recent_reconciled_months, default=[])
+
+        def add_month_reads(month_batch):
+            # Fetch monthly transactions for the transaction table
+            month_batch.add('transactions', lambda: fetch_month_transactions(month_start), default=[])
+            # Monthly totals are aggregated by Postgres
+            month_batch.add('totals', lambda: fetch_month_totals(month_start))
+            return month_batch
+
+        if past_month:
+            batch.add('snapshot', lambda: fetch_month_snapshot(month_start))
+        else:
+            add_month_reads(batch)
+        results = batch.run()
+
+        accounts = results['account']
+        snapshot = results.get('snapshot')
+        if snapshot is not None:
+            starting_balance = snapshot.month_row
+            transactions = snapshot.transactions
+            totals = snapshot.totals
+        else:
+            if past_month:
+                # A closed month whose snapshot was dropped by an edit (until `flask rollups
+                # snapshot` runs), or a month that was never closed
+                month_results = add_month_reads(QueryBatch()).run()
+                results.update(month_results)
+                results.errors.update(month_results.errors)
+            # The month totals are meaningless without the month's rows
+            for name in ('month_row', 'transactions'):
+                if not results.ok(name):
+                    raise RuntimeError(f"Failed to load {name}: {results.errors[name]}")
+
+            starting_balance = results['month_row'][0] if results['month_row'] else None
+            transactions = results['transactions']
+            # Monthly totals; the rows are already here if the aggregate query failed
+            totals = results['totals'] if results.ok('totals') else MonthTotals.from_rows(transactions)
 
-        # Fetch starting_balance and starting_cash from reconciled_months
-        starting_balance_response = supabase.table('reconciled_months')\
-            .select('*')\
-            .eq('month', month_date.strftime('%Y-%m-%d'))\
-            .execute()
-        
-        starting_balance = starting_balance_response.data[0] if starting_balance_response.data else None
-        
-        # Fetch monthly transactions and calculate summaries
-        transactions_response = supabase.table('transactions')\
-            .select('*')\
-            .gte('transaction_date', month_date.strftime('%Y-%m-01'))\
-            .lt('transaction_date', (month_date.replace(day=1) + timedelta(days=32)).replace(day=1).strftime('%Y-%m-%d'))\
-            .order('transaction_date', desc=True)\
-            .execute()
-        
-        transactions = transactions_response.data or []
-  
         # Defensive: ensure amounts are numeric (replace None with 0) to avoid template formatting errors
         for t in transactions:
             if t.get('amount') is None:
                 t['amount'] = 0
 
-        # Calculate monthly totals using safe lookups
-        cash_in = sum((t.get('amount') or 0) for t in transactions if t.get('type') == 'income' and t.get('payment_method') == 'cash')
-        cash_out = sum((t.get('amount') or 0) for t in transactions if t.get('type') == 'expense' and t.get('payment_method') == 'cash')
-        total_income = sum((t.get('amount') or 0) for t in transactions if t.get('type') == 'income' and t.get('payment_method') == 'bank')
-        total_expenses = sum((t.get('amount') or 0) for t in transactions if t.get('type') == 'expense' and t.get('payment_method') == 'bank')
+        cash_in = totals.cash_in
+        cash_out = totals.cash_out
+        total_income = totals.bank_income
+        total_expenses = totals.bank_expenses
 
         # Calculate current balances using starting balances
         # current cash box balance from starting balance plus cash_in minus cash_out
@@ -191,51 +2145,22 @@ def monthly_activity():
         current_account_balance = starting_balance.get('starting_balance', 0) + total_income - total_expenses
    
         # Debug logging
-        logger.info(f"Account data: {accounts}")
-        logger.info(f"Transactions found: {len(transactions)}")
-        logger.info(f"Expense transactions: {[t for t in transactions if t['type'] == 'expense']}")
-        logger.info(f"Total expenses calculated: {total_expenses}")
-        
-        # Get reconciliation status - ensure we use full date format for the query
-        month_start = f"{selected_month}-01"  # Convert YYYY-MM to YYYY-MM-DD
-        recon_response = supabase.table('reconciled_months')\
-            .select('*')\
-            .eq('month', month_start)\
-            .single()\
-            .execute()
-        
+        logger.debug(f"Account data: {accounts}")
+        logger.debug(f"Transactions found: {len(transactions)}")
+        logger.debug(f"Total expenses calculated: {total_expenses}")
         
         # Always ensure we have formatted_month, whether we found data or not
         formatted_month = month_date.strftime('%B %Y')
         
-        reconciled_data = recon_response.data if recon_response.data else {}
+        # Reconciliation status comes from the same reconciled_months row as the starting balances
+        reconciled_data = dict(starting_balance) if starting_balance else {}
         reconciled_data.update({
             'month': month_start,
             'is_reconciled': reconciled_data.get('is_reconciled', False),
             'formatted_month': formatted_month
         })
 
-        # Fetch a short list of recent reconciled months for the "Previous Month Activity" card
-        try:
-            reconciled_months_resp = supabase.table('reconciled_months')\
-                .select('*')\
-                .eq('is_reconciled', True)\
-                .order('month', desc=True)\
-                .limit(6)\
-                .execute()
-            reconciled_months = reconciled_months_resp.data or []
-        except Exception:
-            reconciled_months = []
-
-        # Format each reconciled month for display and provide a short month string YYYY-MM
-        for rm in reconciled_months:
-            try:
-                rm_date = datetime.strptime(rm.get('month', ''), '%Y-%m-%d')
-                rm['formatted_month'] = rm_date.strftime('%B %Y')
-                rm['month_short'] = rm.get('month', '')[:7]
-            except Exception:
-                rm['formatted_month'] = rm.get('month', '')
-                rm['month_short'] = rm.get('month', '')[:7]
+        reconciled_months = format_reconciled_months(results['reconciled_months'])
         # Helper to coerce None to 0 for numeric fields
         def _num(x):
             return x if x is not None else 0
@@ -262,7 +2187,7 @@ def monthly_activity():
                 accounts[k] = _num(accounts.get(k, 0))
 
 
-        return render_template('monthly_activity.html',
+        return render_page('monthly_activity.html',
                 accounts=accounts,
                 transactions=transactions,
                 reconciled_data=reconciled_data,
@@ -271,6 +2196,7 @@ def monthly_activity():
 
     except Exception as e:
         logger.error(f"Error loading monthly activity: {e}")
+        g.page_error = True
         # Provide default values for all required template variables
         return render_template('monthly_activity.html', 
                            error="Failed to load monthly data",
@@ -307,9 +2233,12 @@ def reconcile_month():
             })\
             .eq('month', month)\
             .execute()
+        invalidate_reconciled_months_cache()
         
         if not response.data:
             return jsonify({'success': False, 'error': 'Failed to update reconciliation status'}), 500
+
+        store_month_snapshot(month)
             
         logger.info(f"Successfully reconciled month: {month}")
         return jsonify({'success': True})
@@ -339,25 +2268,22 @@ def reconcile_month_close():
                 month = month_date.strftime('%Y-%m-01')
 
             month_start = month
-            month_end = (datetime.strptime(month_start, '%Y-%m-%d').replace(day=1) + timedelta(days=32)).replace(day=1).strftime('%Y-%m-%d')
-
-            transactions_response = supabase.table('transactions')\
-                .select('*')\
-                .gte('transaction_date', month_start)\
-                .lt('transaction_date', month_end)\
-                .execute()
-            transactions = transactions_response.data or []
-
-            reconciled_data = supabase.table('reconciled_months')\
-                .select('starting_balance, starting_cash')\
-                .eq('month', month_start)\
-                .execute()
-            starting_balance = reconciled_data.data[0]['starting_balance'] if reconciled_data.data else 0
-            starting_cash = reconciled_data.data[0]['starting_cash'] if reconciled_data.data else 0
+
+            # Only the month totals are shown here, so no transaction rows are fetched
+            batch = QueryBatch()
+            batch.add('totals', lambda: fetch_month_totals(month_start))
+            batch.add('month_row', month_row_query(month_start, 'starting_balance, starting_cash'), default=[])
+            results = batch.run()
+            if results.errors:
+                raise RuntimeError(f"Failed to load reconciliation data: {results.errors}")
+
+            month_row = results['month_row'][0] if results['month_row'] else {}
+            starting_balance = month_row.get('starting_balance') or 0
+            starting_cash = month_row.get('starting_cash') or 0
             starting_total_balance = starting_balance + starting_cash
 
-            total_income = sum(t['amount'] for t in transactions if t.get('type') == 'income')
-            total_expenses = sum(t['amount'] for t in transactions if t.get('type') == 'expense')
+            total_income = results['totals'].total_income
+            total_expenses = results['totals'].total_expenses
 
             formatted_month = datetime.strptime(month_start, '%Y-%m-%d').strftime('%B %Y')
 
@@ -411,6 +2337,9 @@ def reconcile_month_close():
             }, on_conflict='month')\
             .execute()
 
+        invalidate_reconciled_months_cache()
+        store_month_snapshot(month)
+
         if not update_resp.data:
             logger.warning(f"Upsert did not return data for month {next_month_str}")
         else:
@@ -423,18 +2352,23 @@ def reconcile_month_close():
         return render_template('reconcile_month.html', error='Failed to process reconciliation', month=request.form.get('month', datetime.today().strftime('%Y-%m-01')), total_income=0, total_expenses=0)
 
 @app.route('/account/dashboard')
+@conditional_page()
 def account_dashboard():
     """
     Main dashboard showing account overview, reconciliation state, and recent activity
     """
     try:
+        batch = QueryBatch()
         # Fetch account data for user_id = 1
-        account_response = supabase.table('accounts').select('*').eq('id', 1).execute()
-        accounts = account_response.data[0] if account_response.data else None
-        
+        batch.add('account', lambda: get_account(1))
         # Fetch recent transactions
-        transactions_response = supabase.table('transactions').select('*').order('created_at', desc=True).limit(5).execute()
-        transactions = transactions_response.data or []
+        batch.add('transactions', recent_transactions_query(), default=[])
+        results = batch.run()
+        if results.errors:
+            raise RuntimeError(f"Failed to load dashboard queries: {results.errors}")
+
+        accounts = results['account']
+        transactions = results['transactions']
         
         # Get current date for the template
         today = datetime.today()
@@ -455,8 +2389,353 @@ def account_dashboard():
 
     except Exception as e:
         logger.error(f"Error loading dashboard: {e}")
+        g.page_error = True
         return render_template('transactions_table.html', error="Failed to load dashboard data")
 
+def balance_deltas(transaction_type, amount, method):
+    """
+    Return (primary_account delta, cash_box delta) for a transaction
+    Only the balance corresponding to the payment method moves
+    """
+    signed = amount if transaction_type == 'income' else -amount if transaction_type == 'expense' else 0
+    if method == 'bank':
+        return signed, 0
+    if method == 'cash':
+        return 0, signed
+    return 0, 0
+
+def _record_transaction_rest(account_id, transaction_type, amount, description, method, transaction_date):
+    """
+    Non-atomic read-modify-write version of record_transaction()
+    Only used until migrations/004_record_transaction.sql has been applied
+    """
+    response = supabase.table('transactions').insert({
+        'account_id': account_id,
+        'type': transaction_type,
+        'amount': amount,
+        'description': description,
+        'payment_method': method,
+        'transaction_date': transaction_date
+    }).execute()
+
+    account = supabase.table('accounts').select('primary_account, cash_box').eq('id', account_id).single().execute()
+    primary_delta, cash_delta = balance_deltas(transaction_type, amount, method)
+    new_primary_bank = (account.data.get('primary_account') or 0) + primary_delta
+    new_cash_box = (account.data.get('cash_box') or 0) + cash_delta
+
+    supabase.table('accounts').update({
+        'primary_account': new_primary_bank,
+        'cash_box': new_cash_box
+    }).eq('id', account_id).execute()
+
+    return {
+        'transaction': response.data[0] if response.data else None,
+        'primary_account': new_primary_bank,
+        'cash_box': new_cash_box
+    }
+
+def record_transaction(account_id, transaction_type, amount, description, method, transaction_date):
+    """
+    Insert a transaction and apply its balance delta to the account atomically
+    via the record_transaction function (see migrations/004_record_transaction.sql)
+    Returns {'transaction': row, 'primary_account': new balance, 'cash_box': new balance}
+    """
+    try:
+        return call_function('record_transaction', {
+            'p_account_id': account_id,
+            'p_type': transaction_type,
+            'p_amount': amount,
+            'p_description': description,
+            'p_payment_method': method,
+            'p_transaction_date': transaction_date
+        })
+    except Exception as e:
+        # Any other failure may have happened after the commit, so retrying could double-post
+        if not is_missing_function_error(e):
+            raise
+        logger.warning("record_transaction function not deployed, using read-modify-write fallback")
+        return _record_transaction_rest(account_id, transaction_type, amount, description, method, transaction_date)
+
+# Bulk import of bank exports (CSV, OFX, QIF)
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 500))
+IMPORT_FORMATS = ('csv', 'ofx', 'qif')
+# Tried in order; day-first formats come before month-first ones to match local bank exports
+IMPORT_DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%Y%m%d', '%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y',
+                       '%m/%d/%Y', '%m/%d/%y', '%d %b %Y', '%d %B %Y')
+# QIF comes from US software, so month-first wins there
+QIF_DATE_FORMATS = ('%m/%d/%Y', '%m/%d/%y') + IMPORT_DATE_FORMATS
+
+class ImportRowError(ValueError):
+    """A row of a bank export that cannot be imported"""
+
+class ImportBatchError(Exception):
+    """
+    A batch failed to insert; the batches before it are committed
+    summary counts what was imported and line is the first line of the failed batch,
+    so the rest of the file can be imported again from there.
+    """
+    def __init__(self, summary, line, error):
+        super().__init__(f"Batch starting at line {line} failed after {summary['batches']} batches: {error}")
+        self.summary = summary
+        self.line = line
+        self.error = error
+
+def _parse_import_date(raw, date_formats=IMPORT_DATE_FORMATS):
+    value = (raw or '').strip().replace("'", '/')
+    value = re.sub(r'\s*/\s*', '/', value)
+    for fmt in date_formats:
+        try:
+            return datetime.strptime(value, fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    raise ImportRowError(f"Unrecognised date '{raw}'")
+
+def _normalise_decimal_separator(value, raw):
+    """
+    Rewrite an amount's digits with '.' as the decimal point and no thousands separators
+    The last ',' or '.' is the decimal point when both appear (1,234.56 and 1.234,56); a
+    single separator followed by exactly three digits (1,234) could be either and is rejected.
+    """
+    separators = [c for c in value if c in ',.']
+    if not separators:
+        return value
+    if len(set(separators)) == 2:
+        decimal = separators[-1]
+    elif len(separators) > 1:
+        decimal = None  # 1,234,567: only thousands separators
+    elif re.search(r'\d[,.]\d{3}$', value):
+        raise ImportRowError(f"Ambiguous amount '{raw}': write it with two decimals, e.g. 1234.00")
+    else:
+        decimal = separators[0]
+    whole, _, fraction = value.rpartition(decimal) if decimal else (value, None, None)
+    groups = re.split(r'[,.]', whole)
+    if (decimal and decimal in whole) or any(len(group) != 3 for group in groups[1:]):
+        raise ImportRowError(f"Unrecognised amount '{raw}'")
+    return ''.join(groups) + ('.' + fraction if decimal else '')
+
+def _parse_import_amount(raw):
+    # Spaces (including non-breaking ones) and apostrophes only ever group thousands
+    value = re.sub(r"[\s']", '', raw or '')
+    negative = value.startswith('(') and value.endswith(')')
+    if negative:
+        value = value[1:-1]
+    # Currency symbols such as R or $, before or after the sign (-R45.00, R-45.00)
+    value = re.sub(r'^([+-]?)[^\d+\-.,]+', r'\1', value)
+    value = _normalise_decimal_separator(value, raw)
+    try:
+        amount = float(value)
+    except ValueError:
+        raise ImportRowError(f"Unrecognised amount '{raw}'")
+    return -amount if negative else amount
+
+def build_import_row(raw_date, raw_amount, description='', transaction_type=None, method='bank',
+                     date_formats=IMPORT_DATE_FORMATS):
+    """
+    Validate one imported line and return a transactions row
+    Without an explicit type the sign of the amount decides income (+) or expense (-)
+    """
+    amount = _parse_import_amount(raw_amount)
+    transaction_type = (transaction_type or '').strip().lower()
+    if transaction_type in ('credit', 'cr', 'deposit'):
+        transaction_type = 'income'
+    elif transaction_type in ('debit', 'dr', 'withdrawal'):
+        transaction_type = 'expense'
+    elif not transaction_type:
+        transaction_type = 'income' if amount > 0 else 'expense'
+    if transaction_type not in ('income', 'expense', 'transfer'):
+        raise ImportRowError(f"Unknown transaction type '{transaction_type}'")
+    if amount == 0:
+        raise ImportRowError('Amount must not be zero')
+
+    return {
+        'type': transaction_type,
+        'amount': abs(amount),
+        'description': (description or '').strip(),
+        'payment_method': (method or 'bank').strip().lower(),
+        'transaction_date': _parse_import_date(raw_date, date_formats)
+    }
+
+def _first(row, *keys):
+    for key in keys:
+        if row.get(key) not in (None, ''):
+            return row[key]
+    return None
+
+def parse_csv_export(lines, method='bank'):
+    """
+    Yield (line number, row or None, error or None) for a CSV bank export
+    Accepts either a signed amount column or separate debit/credit columns
+    """
+    reader = csv.reader(lines)
+    header = None
+    for values in reader:
+        if not any(v.strip() for v in values):
+            continue
+        if header is None:
+            header = [h.strip().lower().replace(' ', '_') for h in values]
+            continue
+        row = dict(zip(header, values))
+        try:
+            amount = _first(row, 'amount', 'value')
+            if amount is None:
+                credit = _first(row, 'credit', 'money_in')
+                debit = _first(row, 'debit', 'money_out')
+                if credit is None and debit is None:
+                    raise ImportRowError('Missing amount')
+                credit = abs(_parse_import_amount(credit)) if credit is not None else 0
+                debit = abs(_parse_import_amount(debit)) if debit is not None else 0
+                amount = str(credit - debit)
+            yield reader.line_num, build_import_row(
+                _first(row, 'transaction_date', 'date', 'posting_date', 'posted'),
+                amount,
+                _first(row, 'description', 'memo', 'payee', 'narrative', 'reference') or '',
+                _first(row, 'type'),
+                _first(row, 'payment_method', 'method') or method
+            ), None
+        except ImportRowError as e:
+            yield reader.line_num, None, str(e)
+
+def parse_ofx_export(lines, method='bank'):
+    """
+    Yield (line number, row or None, error or None) for each <STMTTRN> of an OFX/QFX export
+    Handles both SGML (unclosed tags) and XML flavoured files
+    """
+    txn = None
+    start_line = 0
+    for line_no, line in enumerate(lines, start=1):
+        for closing, tag, value in re.findall(r'<(/?)([A-Za-z0-9.]+)>([^<]*)', line):
+            tag = tag.upper()
+            if tag == 'STMTTRN' and not closing:
+                txn, start_line = {}, line_no
+            elif tag == 'STMTTRN' and closing and txn is not None:
+                try:
+                    posted = (txn.get('DTPOSTED') or '')[:8]
+                    yield start_line, build_import_row(
+                        posted,
+                        txn.get('TRNAMT'),
+                        ' '.join(v for v in (txn.get('NAME'), txn.get('MEMO')) if v),
+                        None,
+                        method
+                    ), None
+                except ImportRowError as e:
+                    yield start_line, None, str(e)
+                txn = None
+            elif txn is not None and not closing and value.strip():
+                txn[tag] = value.strip()
+
+def parse_qif_export(lines, method='bank'):
+    """
+    Yield (line number, row or None, error or None) for each record of a QIF export
+    """
+    record = {}
+    start_line = None
+    for line_no, line in enumerate(lines, start=1):
+        line = line.rstrip('\r\n')
+        if not line or line.startswith('!'):
+            continue
+        code, value = line[0], line[1:].strip()
+        if code == '^':
+            if record:
+                try:
+                    yield start_line, build_import_row(
+                        record.get('D'),
+                        record.get('T') or record.get('U'),
+                        ' '.join(v for v in (record.get('P'), record.get('M')) if v),
+                        None,
+                        method,
+                        QIF_DATE_FORMATS
+                    ), None
+                except ImportRowError as e:
+                    yield start_line, None, str(e)
+            record, start_line = {}, None
+            continue
+        if start_line is None:
+            start_line = line_no
+        record[code] = value
+
+IMPORT_PARSERS = {'csv': parse_csv_export, 'ofx': parse_ofx_export, 'qif': parse_qif_export}
+
+def _import_batch_rest(account_id, rows):
+    """
+    Multi-row insert plus one read-modify-write of the balances
+    Only used until migrations/005_import_transactions.sql has been applied
+    """
+    supabase.table('transactions').insert([dict(r, account_id=account_id) for r in rows]).execute()
+    primary_delta = cash_delta = 0
+    for r in rows:
+        p, c = balance_deltas(r['type'], r['amount'], r['payment_method'])
+        primary_delta += p
+        cash_delta += c
+    account = supabase.table('accounts').select('primary_account, cash_box').eq('id', account_id).single().execute()
+    supabase.table('accounts').update({
+        'primary_account': (account.data.get('primary_account') or 0) + primary_delta,
+        'cash_box': (account.data.get('cash_box') or 0) + cash_delta
+    }).eq('id', account_id).execute()
+    return {'inserted': len(rows)}
+
+def import_batch(account_id, rows):
+    """
+    Insert a batch of validated rows and apply their combined balance delta once
+    via the import_transactions function (see migrations/005_import_transactions.sql)
+    """
+    try:
+        return call_function('import_transactions', {'p_account_id': account_id, 'p_rows': rows})
+    except Exception as e:
+        if not is_missing_function_error(e):
+            raise
+        logger.warning("import_transactions function not deployed, using multi-row insert fallback")
+        return _import_batch_rest(account_id, rows)
+    finally:
+        invalidate_account_cache(account_id)
+        invalidate_month_cache(*{r['transaction_date'] for r in rows})
+
+def import_transactions(lines, fmt, account_id=1, method='bank', batch_size=None):
+    """
+    Stream a bank export, validating rows as they are read and inserting them in batches
+    Invalid rows are skipped and reported; returns a summary dict
+    Raises ImportBatchError if a batch fails, after the batches before it were committed
+    """
+    if fmt not in IMPORT_PARSERS:
+        raise ValueError(f"Unsupported import format '{fmt}'. Expected one of {', '.join(IMPORT_FORMATS)}")
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+
+    summary = {'imported': 0, 'batches': 0, 'errors': []}
+    batch = []
+    batch_line = None
+
+    def flush():
+        try:
+            import_batch(account_id, batch)
+        except Exception as e:
+            logger.error(f"Import stopped at line {batch_line} after {summary['imported']} transactions: {e}")
+            raise ImportBatchError(summary, batch_line, e) from e
+        summary['imported'] += len(batch)
+        summary['batches'] += 1
+        batch.clear()
+
+    for line_no, row, error in IMPORT_PARSERS[fmt](lines, method=method):
+        if error:
+            summary['errors'].append({'line': line_no, 'error': error})
+            continue
+        if not batch:
+            batch_line = line_no
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    logger.info(f"Imported {summary['imported']} transactions in {summary['batches']} batches "
+                f"({len(summary['errors'])} rows skipped)")
+    return summary
+
+def detect_import_format(filename, fmt=None):
+    """Use the explicit format if given, otherwise the file extension (.qfx is OFX)"""
+    if fmt:
+        return fmt.lower()
+    ext = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    return 'ofx' if ext == 'qfx' else ext
+
 # This will allow us to use Supabase's built-in features like real-time updates and row-level security
 @app.route('/transactions/add', methods=['POST'])
 def add_transaction():
@@ -475,46 +2754,10 @@ def add_transaction():
         if account_id is None or transaction_type is None or amount is None:
             return jsonify({'error': 'Missing required fields'}), 400
         
-        # Start a transaction (will need to update both transactions and account balance)
-        response = supabase.table('transactions').insert({
-            'account_id': account_id,
-            'type': transaction_type,
-            'amount': amount,
-            'description': description,
-            'payment_method': method,
-            'transaction_date': transaction_date
-        }).execute()
-        
-        # Fetch the current primary balance
-        account = supabase.table('accounts').select('primary_account').eq('id', account_id).single().execute()
-        current_primary_bank = account.data['primary_account'] if account.data else 0
-
-        # Fetch the cash_box balance
-        cash_box = supabase.table('accounts').select('cash_box').eq('id', account_id).single().execute()
-        current_cash_box = cash_box.data['cash_box'] if cash_box.data else 0
-
-        # Initialize new balances with current values
-        new_primary_bank = current_primary_bank
-        new_cash_box = current_cash_box
-
-        # Update only the balance corresponding to the payment method
-        if method == 'bank':
-            if transaction_type == 'income':
-                new_primary_bank = current_primary_bank + amount
-            elif transaction_type == 'expense':
-                new_primary_bank = current_primary_bank - amount
-        elif method == 'cash':
-            if transaction_type == 'income':
-                new_cash_box = current_cash_box + amount
-            elif transaction_type == 'expense':
-                new_cash_box = current_cash_box - amount
-
-        # Update the account balance
-        supabase.table('accounts').update({
-            'primary_account': new_primary_bank,
-            'cash_box': new_cash_box
-        }).eq('id', account_id).execute()
-        
+        # Insert the transaction and move the account balance in one atomic call
+        record_transaction(account_id, transaction_type, amount, description, method, transaction_date)
+        invalidate_account_cache(account_id)
+        invalidate_month_cache(transaction_date)
         
         logger.info(f"Added {transaction_type} transaction: {amount}")
         
@@ -531,6 +2774,39 @@ def add_transaction():
         logger.error(f"Error adding transaction: {e}")
         return jsonify({'error': 'Failed to add transaction'}), 500
 
+@app.route('/transactions/import', methods=['POST'])
+def import_transactions_upload():
+    """
+    Bulk import a bank export (CSV, OFX or QIF) uploaded as the 'file' form field
+    The upload is parsed as a stream and inserted in batches
+    """
+    try:
+        upload = request.files.get('file')
+        if not upload:
+            return jsonify({'success': False, 'error': 'No file uploaded'}), 400
+
+        fmt = detect_import_format(upload.filename, request.form.get('format'))
+        if fmt not in IMPORT_FORMATS:
+            return jsonify({'success': False, 'error': f"Unsupported format '{fmt}'"}), 400
+
+        try:
+            account_id = int(request.form.get('account_id', 1))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'account_id must be an integer'}), 400
+        method = request.form.get('method', 'bank')
+        lines = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', errors='replace', newline='')
+
+        summary = import_transactions(lines, fmt, account_id=account_id, method=method)
+        return jsonify({'success': True, **summary})
+
+    except ImportBatchError as e:
+        # Earlier batches are committed: tell the user where to resume instead of re-uploading everything
+        return jsonify({'success': False, 'error': 'Failed to import transactions',
+                        'resume_from_line': e.line, **e.summary}), 500
+    except Exception as e:
+        logger.error(f"Error importing transactions: {e}")
+        return jsonify({'success': False, 'error': 'Failed to import transactions'}), 500
+
 # Account setup: edit opening balance
 @app.route('/account/setup', methods=['GET', 'POST'])
 def account_setup():
@@ -590,12 +2866,17 @@ def account_setup():
         except Exception as e:
             logger.error(f"Error updating account setup: {e}")
             error_message = 'Failed to update account setup.'
+        finally:
+            invalidate_account_cache(account_id)
 
     # Always fetch current account info for display
     accounts = None
     try:
-        resp = supabase.table('accounts').select('cash_box, primary_account, start_month').eq('id', account_id).single().execute()
-        accounts = resp.data if resp.data else None
+        account = get_account(account_id)
+        if account:
+            accounts = {k: account.get(k) for k in ('cash_box', 'primary_account', 'start_month')}
+        else:
+            error_message = 'Could not fetch account information.'
     except Exception as e:
         logger.error(f"Error fetching account for setup: {e}")
         error_message = 'Could not fetch account information.'
@@ -608,12 +2889,15 @@ def accounts_dashboard():
     Dashboard: Show all accounts, balances, and progress toward savings goals
     """
     try:
-        accounts_resp = supabase.table('accounts').select('*').execute()
-        goals_resp = supabase.table('savings_goals').select('*').execute()
-        transactions_resp = supabase.table('transactions').select('*').order('created_at', desc=True).limit(10).execute()
-        accounts = accounts_resp.data or []
-        goals = goals_resp.data or []
-        transactions = transactions_resp.data or []
+        batch = QueryBatch()
+        batch.add('accounts', supabase.table('accounts').select(columns('account')), default=[])
+        batch.add('goals', supabase.table('savings_goals').select(columns('savings_goal')), default=[])
+        batch.add('transactions', recent_transactions_query(10), default=[])
+        results = batch.run()
+        # Each card renders on its own, so a failed query only empties its card
+        accounts = results['accounts']
+        goals = results['goals']
+        transactions = results['transactions']
         return render_template('financefront.html', accounts=accounts, goals=goals, transactions=transactions)
     except Exception as e:
         logger.error(f"Error loading dashboard: {e}")
@@ -635,6 +2919,7 @@ def update_balance():
         response = supabase.table('accounts').update({
             'balance': title  # assuming 'title' contains the new balance value
         }).eq('id', 1).execute()
+        invalidate_account_cache(1)
         
         logger.info(f"Updated balance to: {title}")
         return redirect('/')
@@ -659,6 +2944,7 @@ def update_income():
         response = supabase.table('accounts').update({
             'monthly_income': title  # assuming 'title' contains the new balance value
         }).eq('id', 1).execute()
+        invalidate_account_cache(1)
         
         logger.info(f"Updated monthly income to: {title}")
         return redirect('/')
@@ -683,6 +2969,7 @@ def update_expense():
         response = supabase.table('accounts').update({
             'monthly_expense': title  # assuming 'title' contains the new balance value
         }).eq('id', 1).execute()
+        invalidate_account_cache(1)
         
         logger.info(f"Updated monthly expenses to: {title}")
         return redirect('/')
@@ -767,6 +3054,254 @@ def api_create_task():
         logger.error(f"API error creating task: {e}")
         return jsonify({'error': 'Failed to create task'}), 500
 
+# Keyset pagination for /api/transactions
+TRANSACTION_API_FIELDS = ('id', 'account_id', 'type', 'amount', 'description', 'payment_method',
+                          'transaction_date', 'created_at', 'updated_at', 'status', 'category_id')
+TRANSACTION_API_DEFAULT_FIELDS = ('id', 'type', 'amount', 'description', 'payment_method', 'transaction_date')
+TRANSACTION_API_DEFAULT_LIMIT = 50
+TRANSACTION_API_MAX_LIMIT = 200
+
+class InvalidCursor(ValueError):
+    """A pagination cursor that was not issued by this API"""
+
+def encode_cursor(row):
+    """Opaque token for the (transaction_date, id) position of the last row on a page"""
+    payload = json.dumps({'d': row['transaction_date'], 'i': row['id']}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        transaction_date, row_id = payload['d'], int(payload['i'])
+    except Exception:
+        raise InvalidCursor('Malformed cursor')
+    # The date is interpolated into a PostgREST filter, so only timestamp characters are allowed
+    if not isinstance(transaction_date, str) or not re.fullmatch(r'[0-9T:.+\- Z]{8,40}', transaction_date):
+        raise InvalidCursor('Malformed cursor')
+    return transaction_date, row_id
+
+def transactions_page_query(projection, limit, cursor=None, filters=None, date_from=None, date_to=None):
+    """
+    One page of transactions in (transaction_date DESC, id DESC) order, plus one row telling
+    whether another page exists. cursor is a decoded (transaction_date, id) position; filters
+    are equality filters by column; date_to is exclusive.
+    """
+    query = supabase.table('transactions').select(', '.join(projection))
+    for column, value in (filters or {}).items():
+        query = query.eq(column, value)
+    if date_from:
+        query = query.gte('transaction_date', date_from)
+    if date_to:
+        query = query.lt('transaction_date', date_to)
+
+    # transaction_date is NOT NULL since migrations/011; until then undated rows have no cursor position
+    query = query.not_.is_('transaction_date', 'null')
+    if cursor:
+        last_date, last_id = cursor
+        # Rows strictly after the cursor. Postgres cannot seek the index on the OR alone;
+        # the redundant bound makes the scan start at the cursor.
+        query = query.lte('transaction_date', last_date)
+        # postgrest-py 0.10 has no or_(), so the PostgREST or filter is added as a raw parameter
+        query.params = query.params.add('or', f'(transaction_date.lt."{last_date}",'
+                                              f'and(transaction_date.eq."{last_date}",id.lt.{last_id}))')
+    return query.order('transaction_date', desc=True).order('id', desc=True).limit(limit + 1)
+
+@app.route('/api/transactions', methods=['GET'])
+def api_get_transactions():
+    """
+    API endpoint listing transactions newest first with keyset pagination
+    Query parameters:
+      cursor          next_cursor from the previous page
+      limit           page size (default 50, max 200)
+      fields          comma separated columns to return
+      type, payment_method, account_id, date_from, date_to (YYYY-MM-DD, inclusive)
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', TRANSACTION_API_DEFAULT_LIMIT)), 1), TRANSACTION_API_MAX_LIMIT)
+
+        fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()] \
+            or list(TRANSACTION_API_DEFAULT_FIELDS)
+        unknown = [f for f in fields if f not in TRANSACTION_API_FIELDS]
+        if unknown:
+            return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+        # The cursor columns are always fetched, but only returned if requested
+        projection = list(dict.fromkeys(fields + ['transaction_date', 'id']))
+
+        filters = {column: request.args[column] for column in ('type', 'payment_method', 'account_id')
+                   if request.args.get(column)}
+        date_from = date_to = None
+        if request.args.get('date_from'):
+            date_from = datetime.strptime(request.args['date_from'], '%Y-%m-%d').strftime('%Y-%m-%d')
+        if request.args.get('date_to'):
+            date_to = (datetime.strptime(request.args['date_to'], '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        cursor = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+
+        rows = transactions_page_query(projection, limit, cursor, filters, date_from, date_to).execute().data or []
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]) if has_more and rows else None
+
+        return jsonify({
+            'data': [{f: r.get(f) for f in fields} for r in rows],
+            'next_cursor': next_cursor,
+            'has_more': has_more
+        })
+
+    except (InvalidCursor, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"API error fetching transactions: {e}")
+        return jsonify({'error': 'Failed to fetch transactions'}), 500
+
+@app.route('/api/monthly_totals', methods=['GET'])
+def api_monthly_totals():
+    """
+    API endpoint returning a month's totals aggregated by Postgres
+    Query parameter month is YYYY-MM (defaults to the current month)
+    """
+    try:
+        selected_month = request.args.get('month', datetime.today().strftime('%Y-%m'))
+        try:
+            month_start = datetime.strptime(selected_month, '%Y-%m').strftime('%Y-%m-01')
+        except ValueError:
+            return jsonify({'error': 'Invalid month format. Expected YYYY-MM'}), 400
+
+        totals = fetch_month_totals(month_start)
+        return jsonify({'month': month_start, **totals.to_dict()})
+    except Exception as e:
+        logger.error(f"API error fetching monthly totals: {e}")
+        return jsonify({'error': 'Failed to fetch monthly totals'}), 500
+
+# Live updates: Postgres NOTIFY events (see migrations/010_live_updates.sql) pushed to open
+# pages as server-sent events. Each open stream holds a gunicorn thread, hence the cap;
+# gunicorn.conf.py adds that many threads to each gthread worker so pages are not starved.
+LIVE_UPDATES_CHANNEL = 'finance_changes'
+LIVE_UPDATES_MAX_CLIENTS = int(os.environ.get('LIVE_UPDATES_MAX_CLIENTS', 8))  # Per worker process
+LIVE_UPDATES_HEARTBEAT = float(os.environ.get('LIVE_UPDATES_HEARTBEAT', 15))  # Seconds between keep-alives
+# LISTEN needs a session of its own, which Supabase's transaction pooler (port 6543) does not
+# keep: use the direct connection or the session-mode pooler (port 5432)
+LIVE_UPDATES_DATABASE_URL = os.environ.get('LIVE_UPDATES_DATABASE_URL', DATABASE_URL)
+
+def live_updates_problem(dsn):
+    """
+    Return why live updates cannot LISTEN through this connection string, or None
+    """
+    if not dsn:
+        return 'Live updates require DATABASE_URL'
+    try:
+        port = psycopg2.extensions.parse_dsn(dsn).get('port')
+    except psycopg2.ProgrammingError:
+        return 'LIVE_UPDATES_DATABASE_URL is not a valid connection string'
+    if port == '6543':
+        return ('Live updates need a direct or session-mode connection: LISTEN does not work through '
+                'the transaction pooler (port 6543). Set LIVE_UPDATES_DATABASE_URL')
+    return None
+
+LIVE_UPDATES_PROBLEM = live_updates_problem(LIVE_UPDATES_DATABASE_URL)
+if LIVE_UPDATES_PROBLEM and LIVE_UPDATES_DATABASE_URL:
+    logger.warning(f"Live updates disabled: {LIVE_UPDATES_PROBLEM}")
+
+class LiveUpdates:
+    """
+    Fan out change events to this worker's SSE streams
+    A daemon thread per worker process LISTENs on a dedicated connection (not the pool:
+    it is held forever) and reconnects with backoff if the connection drops.
+    """
+    def __init__(self, dsn, channel, max_clients):
+        self.dsn = dsn
+        self.channel = channel
+        self.max_clients = max_clients
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._listener_pid = None
+
+    def subscribe(self):
+        """Return a queue receiving every event, or None if this worker has no free slot"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                return None
+            # Threads do not survive fork, so each worker starts its own listener
+            if self._listener_pid != os.getpid():
+                threading.Thread(target=self._listen, name='live-updates', daemon=True).start()
+                self._listener_pid = os.getpid()
+            subscriber = queue.Queue(maxsize=100)
+            self._subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # A stalled client misses events rather than growing memory
+                logger.warning("Live update client is not reading; dropping an event")
+
+    def _listen(self):
+        backoff = 1
+        while True:
+            try:
+                conn = psycopg2.connect(self.dsn, sslmode=DB_SSLMODE)
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN {self.channel}')
+                logger.info(f"Listening for live updates on '{self.channel}'")
+                backoff = 1
+                while True:
+                    if select.select([conn], [], [], LIVE_UPDATES_HEARTBEAT) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            self.publish(json.loads(notify.payload))
+                        except ValueError:
+                            logger.warning(f"Ignoring malformed live update: {notify.payload[:200]}")
+            except Exception as e:
+                logger.error(f"Live update listener failed, retrying in {backoff}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+live_updates = LiveUpdates(LIVE_UPDATES_DATABASE_URL, LIVE_UPDATES_CHANNEL, LIVE_UPDATES_MAX_CLIENTS)
+
+@app.route('/events')
+def live_events():
+    """
+    Server-sent events stream of transaction changes ('transactions' events) and balance
+    changes ('accounts' events) for static/js/live_updates.js
+    """
+    if LIVE_UPDATES_PROBLEM:
+        return jsonify({'error': LIVE_UPDATES_PROBLEM}), 503
+    subscriber = live_updates.subscribe()
+    if subscriber is None:
+        return jsonify({'error': 'Too many live update clients'}), 503
+
+    def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = subscriber.get(timeout=LIVE_UPDATES_HEARTBEAT)
+                except queue.Empty:
+                    # Comment lines keep proxies from closing an idle stream
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f"event: {event.get('table', 'message')}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            live_updates.unsubscribe(subscriber)
+
+    response = app.response_class(stream(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/account/update', methods=['POST'])
 def update_account():
     """
@@ -784,6 +3319,7 @@ def update_account():
         response = supabase.table('accounts').update({
             field: value
         }).eq('id', account_id).execute()
+        invalidate_account_cache(account_id)
         
         if not response.data:
             return jsonify({'error': 'Account not found'}), 404
@@ -828,6 +3364,7 @@ def add_savings_goal():
 def update_transaction_date():
     """
     Update the date of a transaction
+    Returns the updated row so the page can patch it in place instead of reloading
     """
     try:
         transaction_id = request.form.get('transaction_id')
@@ -836,16 +3373,26 @@ def update_transaction_date():
         if not all([transaction_id, transaction_date]):
             return jsonify({'success': False, 'error': 'Missing required fields'}), 400
             
+        # The old month's cached totals go stale too. The edit form sends the date it showed;
+        # other clients cost a lookup of the current date first.
+        previous_date = request.form.get('previous_date')
+        if not previous_date:
+            previous = supabase.table('transactions').select('transaction_date').eq('id', transaction_id).execute()
+            previous_date = previous.data[0]['transaction_date'] if previous.data else None
+
         # Update the transaction date
         response = supabase.table('transactions').update({
             'transaction_date': transaction_date
         }).eq('id', transaction_id).execute()
+        invalidate_month_cache(previous_date, transaction_date)
         
         if not response.data:
             return jsonify({'success': False, 'error': 'Transaction not found'}), 404
             
         logger.info(f"Updated transaction {transaction_id} date to {transaction_date}")
-        return jsonify({'success': True})
+
+        transaction = {k: response.data[0].get(k) for k in PROJECTIONS['transaction']}
+        return jsonify({'success': True, 'transaction': transaction})
         
     except Exception as e:
         logger.error(f"Error updating transaction date: {e}")
@@ -874,12 +3421,79 @@ def update_savings_goal():
         logger.error(f"Error updating goal: {e}")
         return jsonify({'error': 'Failed to update goal'}), 500
 
+# Probes: /livez does no I/O, /readyz runs cheap checks cached per worker, and the
+# full /health diagnostics (row counts, env vars, pool and HTTP stats) need the admin token
+READINESS_CACHE_SECONDS = float(os.environ.get('READINESS_CACHE_SECONDS', 5))
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')  # Sent as the X-Admin-Token header
+
+_readiness = {'checked_at': 0.0, 'result': None}
+_readiness_lock = threading.Lock()
+
+def is_admin_request():
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+def check_readiness():
+    """
+    Return (ready, checks): a one-row Supabase read and a pooled SELECT 1
+    The result is reused for READINESS_CACHE_SECONDS, and concurrent probes wait for a
+    single check instead of each hitting the database.
+    """
+    with _readiness_lock:
+        if _readiness['result'] is not None and \
+                time.monotonic() - _readiness['checked_at'] < READINESS_CACHE_SECONDS:
+            return _readiness['result']
+
+        checks = {}
+        try:
+            supabase.table('accounts').select('id').limit(1).execute()
+            checks['supabase'] = 'ok'
+        except Exception as e:
+            logger.error(f"Readiness check: Supabase failed: {e}")
+            checks['supabase'] = 'failed'
+
+        if DATABASE_URL:
+            try:
+                with get_db_connection() as conn:
+                    if conn:
+                        with conn.cursor() as cur:
+                            cur.execute('SELECT 1')
+                        checks['database'] = 'ok'
+                    else:
+                        checks['database'] = 'failed'
+            except Exception as e:
+                logger.error(f"Readiness check: database failed: {e}")
+                checks['database'] = 'failed'
+
+        result = (all(v == 'ok' for v in checks.values()), checks)
+        _readiness.update(checked_at=time.monotonic(), result=result)
+        return result
+
+@app.route('/livez')
+def liveness_check():
+    """
+    Liveness probe: the worker is up and serving requests (no I/O)
+    """
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readiness_check():
+    """
+    Readiness probe: Supabase and the database answer (result cached for a few seconds)
+    """
+    ready, checks = check_readiness()
+    return jsonify({'status': 'ready' if ready else 'unavailable', 'checks': checks}), 200 if ready else 503
+
 @app.route('/health')
 def health_check():
     """
     Health check endpoint for monitoring
-    Tests database connectivity and provides debugging info
+    Without the admin token this is the readiness probe; with it, it tests database
+    connectivity and provides debugging info (row counts, so it is not cheap)
     """
+    if not is_admin_request():
+        return readiness_check()
+
     health_info = {
         'status': 'healthy',
         'environment_variables': {
@@ -902,24 +3516,37 @@ def health_check():
     
     try:
         # Test direct PostgreSQL connection
-        conn = get_db_connection()
-        if conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT COUNT(*) FROM tasks")
-                result = cur.fetchone()
-                health_info['direct_postgres'] = 'connected'
-                health_info['direct_count'] = result[0] if result else 0
-            conn.close()
-        else:
-            health_info['direct_postgres'] = 'connection failed'
+        with get_db_connection() as conn:
+            if conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT COUNT(*) FROM tasks")
+                    result = cur.fetchone()
+                    health_info['direct_postgres'] = 'connected'
+                    health_info['direct_count'] = result['count'] if result else 0
+                health_info['db_pool'] = get_db_pool().stats()
+            else:
+                health_info['direct_postgres'] = 'connection failed'
             
     except Exception as e:
         logger.error(f"Direct PostgreSQL test failed: {e}")
         health_info['direct_postgres'] = f'failed: {str(e)}'
     
+    health_info['supabase_http'] = supabase_http_metrics.stats()
+
     status_code = 200 if health_info['status'] == 'healthy' else 500
     return jsonify(health_info), status_code
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """
+    Prometheus scrape endpoint: route, Supabase and SQL latency histograms, Supabase
+    error counts, cache lookups and connection pool usage, summed over all workers
+    """
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics require the prometheus-client package'}), 501
+    body, content_type = metrics.render()
+    return app.response_class(body, mimetype=content_type)
+
 @app.route('/calculator', methods=['POST'])
 def calculate_savings():
     """
@@ -966,23 +3593,317 @@ def reset_transaction_id_seq():
         '''
     
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'error': 'Database connection failed'}), 500
-        with conn.cursor() as cur:
-            # Get the max id from transactions
-            cur.execute('SELECT MAX(id) FROM transactions')
-            max_id = cur.fetchone()[0] or 0
-            # Try to reset the sequence (Postgres default sequence name convention)
-            cur.execute("SELECT setval('transactions_id_seq', %s)", (max_id,))
-            conn.commit()
-        conn.close()
+        with get_db_connection() as conn:
+            if not conn:
+                return jsonify({'error': 'Database connection failed'}), 500
+            with conn.cursor() as cur:
+                # Get the max id from transactions
+                cur.execute('SELECT MAX(id) AS max_id FROM transactions')
+                max_id = cur.fetchone()['max_id'] or 0
+                # Try to reset the sequence (Postgres default sequence name convention)
+                cur.execute("SELECT setval('transactions_id_seq', %s)", (max_id,))
+                conn.commit()
         logger.info(f"Reset transactions_id_seq to {max_id}")
         return jsonify({'message': f'Successfully reset transactions_id_seq to {max_id}'})
     except Exception as e:
         logger.error(f"Error resetting transaction id sequence: {e}")
         return jsonify({'error': 'Failed to reset transaction id sequence'}), 500
 
+@app.cli.group('transactions')
+def transactions_cli():
+    """Bulk transaction operations"""
+
+@transactions_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS), default=None,
+              help='Export format (default: from the file extension)')
+@click.option('--account-id', default=1, show_default=True, type=int)
+@click.option('--method', default='bank', show_default=True, help='Payment method recorded on imported rows')
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True, type=int)
+def transactions_import(path, fmt, account_id, method, batch_size):
+    """Import a CSV, OFX or QIF bank export"""
+    fmt = detect_import_format(path, fmt)
+    if fmt not in IMPORT_FORMATS:
+        raise click.BadParameter(f"Cannot infer format from '{path}'; pass --format", param_hint='--format')
+    with open(path, encoding='utf-8-sig', errors='replace', newline='') as lines:
+        try:
+            summary = import_transactions(lines, fmt, account_id=account_id, method=method, batch_size=batch_size)
+        except ImportBatchError as e:
+            raise click.ClickException(f"{e}. {e.summary['imported']} transactions were imported; "
+                                       f"import the file again from line {e.line}")
+    for error in summary['errors']:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+    click.echo(f"Imported {summary['imported']} transactions in {summary['batches']} batches, "
+               f"skipped {len(summary['errors'])} rows")
+
+# Route reads checked by `flask db check-plans`: (name, table that must be read through an index,
+# query). A query is a route's own Supabase builder, translated to the SQL PostgREST runs for
+# it, or SQL calling a database function; the planner inlines SQL functions, so their scans show.
+QUERY_PLAN_CHECKS = [
+    ('overview: recent transactions', 'transactions', lambda: recent_transactions_query()),
+    ('overview: oldest open month', 'reconciled_months', lambda: open_month_query()),
+    ('overview: recent reconciled months', 'reconciled_months', lambda: recent_reconciled_months_query()),
+    ('monthly_activity: month row', 'reconciled_months', lambda: month_row_query('2025-01-01')),
+    ('monthly_activity: month transactions', 'transactions', lambda: month_transactions_query('2025-01-01')),
+    ('monthly_activity: rollups', 'monthly_rollups', lambda: month_rollups_query('2025-01-01')),
+    ('monthly_activity: snapshot', 'month_snapshots', lambda: month_snapshot_query('2025-01-01')),
+    ('monthly_activity: month totals', 'transactions',
+     lambda: ('SELECT * FROM month_totals(%s, %s)', ['2025-01-01', '2025-02-01'])),
+    ('accounts: account row', 'accounts', lambda: account_query(1)),
+    ('api/transactions: first page', 'transactions',
+     lambda: transactions_page_query(TRANSACTION_API_DEFAULT_FIELDS, TRANSACTION_API_DEFAULT_LIMIT)),
+    ('api/transactions: keyset page', 'transactions',
+     lambda: transactions_page_query(TRANSACTION_API_DEFAULT_FIELDS, TRANSACTION_API_DEFAULT_LIMIT,
+                                     ('2025-01-15T00:00:00+00:00', 1000))),
+    ('api/transactions: account keyset page', 'transactions',
+     lambda: transactions_page_query(TRANSACTION_API_DEFAULT_FIELDS, TRANSACTION_API_DEFAULT_LIMIT,
+                                     ('2025-01-15T00:00:00+00:00', 1000), {'account_id': '1'})),
+]
+
+POSTGREST_OPERATORS = {'eq': '=', 'neq': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<=',
+                       'like': 'LIKE', 'ilike': 'ILIKE'}
+IDENTIFIER_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+def _identifier(name):
+    if not IDENTIFIER_RE.fullmatch(name):
+        raise ValueError(f"Unsupported column '{name}'")
+    return f'"{name}"'
+
+def _split_logic(text):
+    """Split the body of a PostgREST or=(...)/and(...) filter on its top-level commas"""
+    parts, current, depth, quoted = [], '', 0, False
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char in '()':
+            depth += 1 if char == '(' else -1
+        elif not quoted and char == ',' and depth == 0:
+            parts.append(current)
+            current = ''
+            continue
+        current += char
+    return parts + [current]
+
+def _condition_sql(column, expression, params):
+    negate = expression.startswith('not.')
+    if negate:
+        expression = expression[4:]
+    operator, _, value = expression.partition('.')
+    if operator == 'is':
+        if value.lower() not in ('null', 'true', 'false'):
+            raise ValueError(f"Unsupported is value '{value}'")
+        sql = f'{_identifier(column)} IS {value.upper()}'
+    elif operator == 'in':
+        values = [v.strip('"') for v in _split_logic(value.strip('()'))]
+        params.extend(values)
+        sql = f"{_identifier(column)} IN ({', '.join(['%s'] * len(values))})"
+    elif operator in POSTGREST_OPERATORS:
+        params.append(value.strip('"'))
+        sql = f'{_identifier(column)} {POSTGREST_OPERATORS[operator]} %s'
+    else:
+        raise ValueError(f"Unsupported operator '{operator}'")
+    return f'NOT ({sql})' if negate else sql
+
+def _logic_sql(joiner, body, params):
+    terms = []
+    for part in _split_logic(body):
+        if part.startswith(('and(', 'or(')):
+            name, _, inner = part.partition('(')
+            terms.append(_logic_sql(name.upper(), inner[:-1], params))
+        else:
+            column, _, expression = part.partition('.')
+            terms.append(_condition_sql(column, expression, params))
+    return '(' + f' {joiner} '.join(terms) + ')'
+
+def postgrest_sql(builder):
+    """
+    Translate an unexecuted Supabase select builder into the SQL PostgREST runs for it
+    Covers what the routes use: select lists, the comparison, is and in filters (negated
+    with not.), or/and groups, order, limit and offset. Returns (sql, params).
+    """
+    table = _identifier(builder.path.strip('/'))
+    select, where, order, params = '*', [], [], []
+    limit = offset = None
+    for key, value in builder.params.multi_items():
+        if key == 'select':
+            if value.strip() != '*':
+                select = ', '.join(_identifier(c.strip()) for c in value.split(','))
+        elif key == 'order':
+            for term in value.split(','):
+                column, *modifiers = term.split('.')
+                order.append(' '.join([_identifier(column)] + [m.upper().replace('NULLS', 'NULLS ')
+                                                                for m in modifiers]))
+        elif key == 'limit':
+            limit = int(value)
+        elif key == 'offset':
+            offset = int(value)
+        elif key in ('or', 'and'):
+            where.append(_logic_sql(key.upper(), value[1:-1], params))
+        else:
+            where.append(_condition_sql(key, value, params))
+    sql = f'SELECT {select} FROM {table}'
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    if order:
+        sql += ' ORDER BY ' + ', '.join(order)
+    if limit is not None:
+        sql += f' LIMIT {limit}'
+    if offset is not None:
+        sql += f' OFFSET {offset}'
+    return sql, params
+
+def _plan_nodes(plan, nodes=None):
+    """Flatten an EXPLAIN (FORMAT JSON) plan into its nodes"""
+    nodes = [] if nodes is None else nodes
+    nodes.append(plan)
+    for child in plan.get('Plans', []):
+        _plan_nodes(child, nodes)
+    return nodes
+
+def plan_problems(plan, table, leading_columns, filtered, allowed_removed):
+    """
+    Reasons the plan does not serve its query from an index, or an empty list
+    The table must be read by index scans. A scan that applies a Filter must also seek: its
+    Index Cond has to compare the index's leading column (IS NOT NULL does not count), or the
+    scan starts at one end of the index and discards rows until it has enough. A Filter may
+    discard at most allowed_removed rows (the page size) per scan.
+    """
+    problems, scanned = [], False
+    for node in _plan_nodes(plan):
+        index = node.get('Index Name')
+        if node.get('Relation Name') != table and not (index and node['Node Type'] == 'Bitmap Index Scan'):
+            continue
+        scanned = True
+        kind = node['Node Type']
+        if kind == 'Seq Scan':
+            problems.append('sequential scan')
+        if index and filtered and node.get('Filter'):
+            leading = leading_columns.get(index, '')
+            if not re.search(rf'\b{re.escape(leading)}\)? (=|<>|<|<=|>|>=) ', node.get('Index Cond', '')):
+                problems.append(f'{kind} on {index} filters without seeking on its leading column {leading}')
+        removed = node.get('Rows Removed by Filter', 0)
+        if node.get('Filter') and removed > allowed_removed:
+            problems.append(f'{kind} filters out {removed} rows ({node["Filter"]})')
+    if not scanned:
+        problems.append(f'no scan of {table}')
+    return problems
+
+@app.cli.group('db')
+def db_cli():
+    """Direct PostgreSQL maintenance (uses DATABASE_URL)"""
+
+@db_cli.command('check-plans')
+def db_check_plans():
+    """
+    EXPLAIN ANALYZE every route query and fail if its table is not read through an index seek
+    Sequential scans are disabled for the check, so a seq scan means no index can serve the query.
+    Run it against a database with realistic data: filtered-out rows only show up with rows to filter.
+    """
+    with get_db_connection() as conn:
+        if not conn:
+            raise click.ClickException('Database connection failed; check DATABASE_URL and DB_SSLMODE')
+        failures = []
+        with conn.cursor() as cur:
+            cur.execute('SET LOCAL enable_seqscan = off')
+            cur.execute("SELECT c.relname, pg_get_indexdef(i.indexrelid, 1, true) AS leading "
+                        "FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid")
+            leading_columns = {row['relname']: row['leading'] for row in cur.fetchall()}
+            for name, table, query in QUERY_PLAN_CHECKS:
+                query = query()
+                if isinstance(query, tuple):
+                    (sql, params), filtered, allowed = query, True, 0
+                else:
+                    sql, params = postgrest_sql(query)
+                    filtered = ' WHERE ' in sql
+                    allowed = int(query.params.get('limit', 0))
+                cur.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}', params)
+                plan = cur.fetchone()['QUERY PLAN'][0]['Plan']
+                problems = plan_problems(plan, table, leading_columns, filtered, allowed)
+                scans = ', '.join(f"{node['Node Type']} {node.get('Index Name', '')}".strip()
+                                  for node in _plan_nodes(plan) if node.get('Relation Name') == table)
+                click.echo(f"{'FAIL' if problems else 'ok  '} {name}: {'; '.join(problems) or scans}")
+                if problems:
+                    failures.append(name)
+        conn.rollback()
+    if failures:
+        raise click.ClickException(f"{len(failures)} queries are not served by an index: {', '.join(failures)}")
+
+@app.cli.group('templates')
+def templates_cli():
+    """Template consistency checks"""
+
+@templates_cli.command('check-fields')
+def templates_check_fields():
+    """Fail if a template reads a field its view does not select (see PROJECTIONS)"""
+    failures = 0
+    for template_name, variables in TEMPLATE_FIELDS.items():
+        errors = template_field_errors(template_name, variables)
+        for line, variable, field_name in errors:
+            click.echo(f"FAIL {template_name}:{line}: {variable}.{field_name} is not in the "
+                       f"'{variables[variable][0]}' projection")
+        if not errors:
+            click.echo(f"ok   {template_name}")
+        failures += len(errors)
+    if failures:
+        raise click.ClickException(f"{failures} template fields are not selected; add them to PROJECTIONS")
+
+@app.cli.group('assets')
+def assets_cli():
+    """Static asset pipeline"""
+
+@assets_cli.command('build')
+@click.option('--vendor-dir', default=os.path.join(app.root_path, '.asset-cache'), show_default=True,
+              help='Where the pinned CDN files are downloaded to; pre-fill it to build offline')
+def assets_build(vendor_dir):
+    """Purge, bundle, fingerprint and pre-compress the static assets into static/dist/"""
+    manifest = build_assets(vendor_dir)
+    for name, built in sorted(manifest.items()):
+        path = os.path.join(ASSET_DIST_DIR, built)
+        sizes = [f"{os.path.getsize(path)} bytes"]
+        sizes += [f"{os.path.getsize(path + suffix)} {suffix[1:]}" for suffix in ('.gz', '.br')
+                  if os.path.exists(path + suffix)]
+        click.echo(f"{name} -> dist/{built} ({', '.join(sizes)})")
+
+@app.cli.group('rollups')
+def rollups_cli():
+    """Maintain the monthly_rollups table"""
+
+@rollups_cli.command('rebuild')
+@click.option('--month', default=None, help='Month to rebuild as YYYY-MM (default: all months)')
+def rollups_rebuild(month):
+    """Recompute monthly rollups from raw transactions"""
+    p_month = datetime.strptime(month, '%Y-%m').strftime('%Y-%m-01') if month else None
+    rebuilt = call_function('rebuild_monthly_rollups', {'p_month': p_month})
+    click.echo(f"Rebuilt {rebuilt} rollup rows for {month or 'all months'}")
+    # Rewriting a month's rollups drops its snapshot
+    snapshotted = snapshot_reconciled_months(p_month)
+    click.echo(f"Snapshotted {len(snapshotted)} reconciled months")
+
+@rollups_cli.command('snapshot')
+@click.option('--month', default=None, help='Month to snapshot as YYYY-MM (default: reconciled months without one)')
+def rollups_snapshot(month):
+    """Freeze reconciled months whose snapshot was dropped by a later edit"""
+    p_month = datetime.strptime(month, '%Y-%m').strftime('%Y-%m-01') if month else None
+    snapshotted = snapshot_reconciled_months(p_month)
+    for snapshot_month in snapshotted:
+        click.echo(f"Snapshotted {snapshot_month[:7]}")
+    click.echo(f"Snapshotted {len(snapshotted)} reconciled months")
+
+@rollups_cli.command('check')
+@click.option('--month', default=None, help='Month to check as YYYY-MM (default: all months)')
+def rollups_check(month):
+    """Compare monthly rollups against raw transactions; exits non-zero on mismatch"""
+    p_month = datetime.strptime(month, '%Y-%m').strftime('%Y-%m-01') if month else None
+    response = supabase.rpc('check_monthly_rollups', {'p_month': p_month}).execute()
+    mismatches = response.data or []
+    for m in mismatches:
+        click.echo(f"{m['month']} account={m['account_id']} {m['type']}/{m['payment_method']}: "
+                   f"expected {m['expected_count']} rows totalling {m['expected_total']}, "
+                   f"rollup has {m['actual_count']} totalling {m['actual_total']}")
+    if mismatches:
+        raise click.ClickException(f"{len(mismatches)} inconsistent rollup rows; run 'flask rollups rebuild'")
+    click.echo('Monthly rollups are consistent')
+
 # Data models (for reference, not used directly with Supabase)
 class User:
     def __init__(self, id, email, created_at):
@@ -0,0 +1,317 @@
+# Minimal PostgREST stand-in used by the benchmarks (see benchmarks/run.py)
+"""
+Serves the part of the PostgREST API that app.py calls - table reads with filters,
+ordering and limits, insert, upsert, update, delete and rpc calls - straight from a
+Postgres database, so the app runs unchanged against a local database:
+
+    BENCH_DATABASE_URL=postgresql://postgres@localhost/finance_bench \
+        gunicorn --chdir benchmarks --workers 2 --threads 8 postgrest_stub:app
+
+It is not a general PostgREST replacement: embedded resources, column renames and
+JWT roles are not supported, and every request runs as the connecting user.
+"""
+import json
+import os
+import re
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import Json, RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+from werkzeug.wrappers import Request, Response
+
+DATABASE_URL = os.environ.get('BENCH_DATABASE_URL', 'postgresql://postgres@localhost/finance_bench')
+POOL_SIZE = int(os.environ.get('BENCH_STUB_POOL_SIZE', 16))  # Per stub worker process
+
+OPERATORS = {'eq': '=', 'neq': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<=',
+             'like': 'LIKE', 'ilike': 'ILIKE'}
+RESERVED_PARAMS = {'select', 'order', 'limit', 'offset', 'on_conflict', 'columns'}
+OBJECT_MEDIA_TYPE = 'application/vnd.pgrst.object+json'
+
+class StubError(Exception):
+    """An error answered with PostgREST's JSON error body"""
+    def __init__(self, status, code, message, details=None, hint=None):
+        super().__init__(message)
+        self.status = status
+        self.body = {'code': code, 'message': message, 'details': details, 'hint': hint}
+
+_pool = None
+_pool_lock = threading.Lock()
+_functions = {}
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(1, POOL_SIZE, DATABASE_URL)
+        return _pool
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _split_top_level(text):
+    """Split at the commas outside parentheses and double quotes"""
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+def _unquote(value):
+    # postgrest-py quotes values containing , : ( or )
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+def parse_filter(column, expression):
+    """(SQL, params) for one PostgREST filter, e.g. ('month', 'eq.2025-06-01')"""
+    negate = expression.startswith('not.')
+    if negate:
+        expression = expression[4:]
+    op, _, value = expression.partition('.')
+    target = sql.Identifier(column)
+    if op == 'is':
+        if value.lower() not in ('null', 'true', 'false'):
+            raise StubError(400, 'PGRST100', f"Unsupported is value: {value}")
+        clause, params = sql.SQL('{} IS {}').format(target, sql.SQL(value.upper())), []
+    elif op == 'in':
+        values = tuple(_unquote(v) for v in _split_top_level(value.strip()[1:-1]))
+        if not values:
+            clause, params = sql.SQL('FALSE'), []
+        else:
+            clause, params = sql.SQL('{} IN %s').format(target), [values]
+    elif op in OPERATORS:
+        clause, params = sql.SQL('{} {} %s').format(target, sql.SQL(OPERATORS[op])), [_unquote(value)]
+    else:
+        raise StubError(400, 'PGRST100', f"Unsupported operator: {op}")
+    if negate:
+        clause = sql.SQL('NOT ({})').format(clause)
+    return clause, params
+
+def parse_logic(operator, expression):
+    """(SQL, params) for or=(...) / and=(...), e.g. ('or', '(id.lt.5,and(id.eq.5,type.eq.income))')"""
+    clauses, params = [], []
+    for condition in _split_top_level(expression.strip()[1:-1]):
+        nested = re.match(r'(not\.)?(and|or)(\(.*\))$', condition)
+        if nested:
+            clause, condition_params = parse_logic(nested.group(2), nested.group(3))
+            if nested.group(1):
+                clause = sql.SQL('NOT ({})').format(clause)
+        else:
+            column, _, filter_expression = condition.partition('.')
+            clause, condition_params = parse_filter(column, filter_expression)
+        clauses.append(clause)
+        params.extend(condition_params)
+    joined = sql.SQL(f' {operator.upper()} ').join(sql.SQL('({})').format(c) for c in clauses)
+    return sql.SQL('({})').format(joined), params
+
+def parse_where(args):
+    """WHERE clause (or empty SQL) and its params from the request's filter parameters"""
+    clauses, params = [], []
+    for key, value in args.items(multi=True):
+        if key in RESERVED_PARAMS:
+            continue
+        if key in ('or', 'and'):
+            clause, clause_params = parse_logic(key, value)
+        else:
+            clause, clause_params = parse_filter(key, value)
+        clauses.append(clause)
+        params.extend(clause_params)
+    if not clauses:
+        return sql.SQL(''), []
+    return sql.SQL(' WHERE ') + sql.SQL(' AND ').join(clauses), params
+
+def parse_select(value):
+    columns = [c.strip() for c in (value or '*').split(',') if c.strip()]
+    if columns == ['*']:
+        return sql.SQL('*')
+    for column in columns:
+        if not re.fullmatch(r'\w+', column):
+            raise StubError(400, 'PGRST100', f"Unsupported select item: {column}")
+    return sql.SQL(', ').join(sql.Identifier(c) for c in columns)
+
+def parse_order(value):
+    terms = []
+    for term in _split_top_level(value or ''):
+        column, *modifiers = term.split('.')
+        direction = sql.SQL(' DESC' if 'desc' in modifiers else ' ASC')
+        nulls = sql.SQL(' NULLS FIRST' if 'nullsfirst' in modifiers else
+                        ' NULLS LAST' if 'nullslast' in modifiers else '')
+        terms.append(sql.Identifier(column) + direction + nulls)
+    if not terms:
+        return sql.SQL('')
+    return sql.SQL(' ORDER BY ') + sql.SQL(', ').join(terms)
+
+def _prefer(request):
+    return {item.strip() for item in request.headers.get('Prefer', '').split(',') if item.strip()}
+
+def _adapt(value):
+    return Json(value) if isinstance(value, (dict, list)) else value
+
+def handle_read(cur, request, table):
+    where, params = parse_where(request.args)
+    query = sql.SQL('SELECT {} FROM {}').format(parse_select(request.args.get('select')),
+                                                sql.Identifier(table))
+    query += where + parse_order(request.args.get('order'))
+
+    offset = int(request.args.get('offset', 0))
+    limit = request.args.get('limit')
+    range_header = re.fullmatch(r'(\d+)-(\d*)', request.headers.get('Range', ''))
+    if range_header:
+        offset = int(range_header.group(1))
+        if range_header.group(2):
+            limit = int(range_header.group(2)) - offset + 1
+    if limit is not None:
+        query += sql.SQL(' LIMIT {}').format(sql.Literal(int(limit)))
+    if offset:
+        query += sql.SQL(' OFFSET {}').format(sql.Literal(offset))
+    cur.execute(query, params)
+    rows = cur.fetchall()
+
+    total = '*'
+    if 'count=exact' in _prefer(request):
+        cur.execute(sql.SQL('SELECT COUNT(*) AS count FROM {}').format(sql.Identifier(table)) + where, params)
+        total = cur.fetchone()['count']
+    return rows, offset, total
+
+def handle_insert(cur, request, table):
+    body = request.get_json()
+    rows = body if isinstance(body, list) else [body]
+    if not rows:
+        return []
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    values = sql.SQL(', ').join(sql.SQL('({})').format(sql.SQL(', ').join(sql.Placeholder() * len(columns)))
+                                for _ in rows)
+    query = sql.SQL('INSERT INTO {} ({}) VALUES ').format(
+        sql.Identifier(table), sql.SQL(', ').join(sql.Identifier(c) for c in columns)) + values
+    params = [_adapt(row.get(column)) for row in rows for column in columns]
+
+    prefer = _prefer(request)
+    if 'resolution=merge-duplicates' in prefer or 'resolution=ignore-duplicates' in prefer:
+        conflict = [c.strip() for c in request.args.get('on_conflict', '').split(',') if c.strip()]
+        conflict = conflict or _primary_key(cur, table)
+        query += sql.SQL(' ON CONFLICT ({})').format(sql.SQL(', ').join(sql.Identifier(c) for c in conflict))
+        updates = [c for c in columns if c not in conflict]
+        if 'resolution=ignore-duplicates' in prefer or not updates:
+            query += sql.SQL(' DO NOTHING')
+        else:
+            query += sql.SQL(' DO UPDATE SET ') + sql.SQL(', ').join(
+                sql.SQL('{0} = EXCLUDED.{0}').format(sql.Identifier(c)) for c in updates)
+    cur.execute(query + sql.SQL(' RETURNING *'), params)
+    return cur.fetchall()
+
+def handle_update(cur, request, table):
+    changes = request.get_json() or {}
+    if not changes:
+        return []
+    where, params = parse_where(request.args)
+    assignments = sql.SQL(', ').join(sql.SQL('{} = %s').format(sql.Identifier(c)) for c in changes)
+    cur.execute(sql.SQL('UPDATE {} SET ').format(sql.Identifier(table)) + assignments + where +
+                sql.SQL(' RETURNING *'), [_adapt(v) for v in changes.values()] + params)
+    return cur.fetchall()
+
+def handle_delete(cur, request, table):
+    where, params = parse_where(request.args)
+    cur.execute(sql.SQL('DELETE FROM {}').format(sql.Identifier(table)) + where + sql.SQL(' RETURNING *'), params)
+    return cur.fetchall()
+
+def _primary_key(cur, table):
+    cur.execute("""
+        SELECT a.attname
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        WHERE i.indrelid = %s::regclass AND i.indisprimary
+    """, [table])
+    return [row['attname'] for row in cur.fetchall()]
+
+def _returns_set(cur, function):
+    if function not in _functions:
+        cur.execute("""
+            SELECT p.proretset
+            FROM pg_proc p
+            JOIN pg_namespace n ON n.oid = p.pronamespace
+            WHERE n.nspname = 'public' AND p.proname = %s
+        """, [function])
+        row = cur.fetchone()
+        if row is None:
+            raise StubError(404, 'PGRST202', f"Could not find the function public.{function} in the schema cache")
+        _functions[function] = row['proretset']
+    return _functions[function]
+
+def handle_rpc(cur, request, function):
+    args = request.get_json(silent=True) or {}
+    call = sql.SQL('{}({})').format(sql.Identifier(function), sql.SQL(', ').join(
+        sql.SQL('{} => %s').format(sql.Identifier(name)) for name in args))
+    params = [_adapt(value) for value in args.values()]
+    if _returns_set(cur, function):
+        cur.execute(sql.SQL('SELECT * FROM ') + call, params)
+        return cur.fetchall()
+    # Scalars (including JSONB) are returned as the bare JSON value, like PostgREST does
+    cur.execute(sql.SQL('SELECT to_jsonb(') + call + sql.SQL(') AS result'), params)
+    return cur.fetchone()['result']
+
+def _json_response(payload, status=200, headers=None):
+    return Response(json.dumps(payload, default=_json_default), status=status, headers=headers,
+                    content_type='application/json; charset=utf-8')
+
+def _error_response(e):
+    if isinstance(e, StubError):
+        return _json_response(e.body, e.status)
+    message = (e.pgerror or str(e)).strip().splitlines()[0] if isinstance(e, psycopg2.Error) else str(e)
+    status = 404 if getattr(e, 'pgcode', None) == '42P01' else 400
+    return _json_response({'code': getattr(e, 'pgcode', None), 'message': message,
+                           'details': None, 'hint': None}, status)
+
+@Request.application
+def app(request):
+    match = re.fullmatch(r'/rest/v1/(rpc/)?(\w+)', request.path)
+    if match is None:
+        return _json_response({'code': 'PGRST125', 'message': f"Invalid path {request.path}"}, 404)
+    is_rpc, name = bool(match.group(1)), match.group(2)
+
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        with conn, conn.cursor(cursor_factory=RealDictCursor) as cur:
+            if is_rpc:
+                return _json_response(handle_rpc(cur, request, name))
+            if request.method in ('GET', 'HEAD'):
+                rows, offset, total = handle_read(cur, request, name)
+                content_range = f"{offset}-{offset + len(rows) - 1}/{total}" if rows else f"*/{total}"
+                headers = {'Content-Range': content_range}
+                if OBJECT_MEDIA_TYPE in request.headers.get('Accept', ''):
+                    if len(rows) != 1:
+                        raise StubError(406, 'PGRST116', 'JSON object requested, multiple (or no) rows returned',
+                                        f"Results contain {len(rows)} rows")
+                    return _json_response(rows[0], headers=headers)
+                return _json_response(rows, headers=headers)
+            if request.method == 'POST':
+                rows, status = handle_insert(cur, request, name), 201
+            elif request.method == 'PATCH':
+                rows, status = handle_update(cur, request, name), 200
+            elif request.method == 'DELETE':
+                rows, status = handle_delete(cur, request, name), 200
+            else:
+                raise StubError(405, 'PGRST117', f"Unsupported HTTP method: {request.method}")
+            if 'return=minimal' in _prefer(request):
+                return Response(status=204 if status == 200 else status)
+            return _json_response(rows, status)
+    except (StubError, psycopg2.Error) as e:
+        return _error_response(e)
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
@@ -0,0 +1,352 @@
+# Load benchmark for the finance app
+"""
+Runs app.py under gunicorn (with gunicorn.conf.py) against a local Postgres seeded
+with synthetic transactions, with benchmarks/postgrest_stub.py - or a real PostgREST
+given with --postgrest-url - standing in for Supabase. Each route is driven for
+--duration seconds by --concurrency clients, and throughput and latency percentiles
+are reported per route and compared with benchmarks/baseline.json:
+
+    python benchmarks/run.py --scale 1k --scale 100k
+    python benchmarks/run.py --scale 100k --save      # record the run as the new baseline
+
+Record baselines from a committed tree: each run stores `git describe --dirty` of the
+code it ran, so a baseline taken with uncommitted changes is marked -dirty. --app-dir
+benchmarks another checkout, e.g. an older commit, against the same database:
+
+    git worktree add /tmp/finance-before 34e710b
+    python benchmarks/run.py --app-dir /tmp/finance-before --baseline benchmarks/baseline-34e710b.json --save
+
+The database named in --database-url is dropped and recreated for every scale, always
+with this tree's schema.sql and migrations (older checkouts have no schema of their own
+for tables such as reconciled_months).
+"""
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timezone
+
+import click
+import httpx
+import psycopg2
+from psycopg2.extensions import make_dsn, parse_dsn
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+SERVER_LOG_PATH = os.path.join(tempfile.gettempdir(), 'finance-bench-server.log')
+
+# The stub ignores it, but the supabase client only accepts a JWT-shaped key
+BENCH_SUPABASE_KEY = 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.benchmark'
+
+SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+SEED_MONTHS = 24  # Transactions are spread over this many months, ending with the current one
+
+# Transactions for the account of every route (id 1), deterministic for a given count.
+# Every month but the current one is reconciled and snapshotted, as in production.
+SEED_SQL = """
+-- schema.sql inserts a few sample rows
+TRUNCATE transactions, monthly_rollups, month_snapshots, reconciled_months, budgets, accounts
+    RESTART IDENTITY CASCADE;
+
+INSERT INTO accounts (id, name, account_type, balance, cash_box, primary_account, start_month)
+VALUES (1, 'Benchmark', 'checking', 250000, 15000, 235000, to_char(%(first_month)s::DATE, 'YYYY-MM'));
+SELECT setval(pg_get_serial_sequence('accounts', 'id'), 1);
+
+INSERT INTO transactions (account_id, transaction_date, type, amount, description, payment_method)
+SELECT 1,
+       %(first_month)s::DATE + make_interval(months => i %% %(months)s)
+           + make_interval(secs => (i::BIGINT * 7919) %% (28 * 86400)),
+       CASE WHEN i %% 3 = 0 THEN 'income' ELSE 'expense' END,
+       ((i::BIGINT * 37) %% 50000) / 100.0 + 1,
+       'Benchmark transaction ' || i,
+       CASE WHEN i %% 4 = 0 THEN 'cash' ELSE 'bank' END
+FROM generate_series(1, %(transactions)s) AS i;
+
+INSERT INTO reconciled_months (month, is_reconciled, starting_balance, starting_cash,
+                               closing_balance, closing_cash, reconciled_at)
+SELECT m::DATE, m < date_trunc('month', CURRENT_DATE), 200000, 10000,
+       CASE WHEN m < date_trunc('month', CURRENT_DATE) THEN 200000 END,
+       CASE WHEN m < date_trunc('month', CURRENT_DATE) THEN 10000 END,
+       CASE WHEN m < date_trunc('month', CURRENT_DATE) THEN m + INTERVAL '1 month' END
+FROM generate_series(%(first_month)s::DATE, date_trunc('month', CURRENT_DATE), INTERVAL '1 month') AS m;
+
+SELECT COUNT(snapshot_month(month)) FROM reconciled_months WHERE is_reconciled;
+ANALYZE;
+"""
+
+def _months_back(day, months):
+    month_index = day.year * 12 + day.month - 1 - months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def routes():
+    """(name, method, path, form, expected status) of every benchmarked route"""
+    today = date.today()
+    previous_month = _months_back(today, 1)
+    return [
+        ('overview', 'GET', '/', None, 200),
+        ('monthly_activity', 'GET', '/monthly_activity', None, 200),
+        ('monthly_activity_reconciled', 'GET', f"/monthly_activity?month={previous_month:%Y-%m}", None, 200),
+        ('add_transaction', 'POST', '/transactions/add', {
+            'type': 'expense', 'amount': '12.50', 'description': 'Benchmark purchase',
+            'method': 'cash', 'transaction_date': today.isoformat()}, 302),
+        ('reconcile_close', 'POST', '/reconcile_month/close', {
+            'month': previous_month.isoformat(), 'closing_balance': '210000',
+            'cash_balance': '10000', 'bank_balance': '200000'}, 302),
+    ]
+
+def reset_database(database_url):
+    """Drop and recreate the benchmark database and load the Supabase stub, schema.sql and migrations"""
+    dbname = parse_dsn(database_url)['dbname']
+    admin = psycopg2.connect(make_dsn(database_url, dbname='postgres'))
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f'DROP DATABASE IF EXISTS "{dbname}" WITH (FORCE)')
+        cur.execute(f'CREATE DATABASE "{dbname}"')
+    admin.close()
+
+    scripts = [os.path.join(BENCH_DIR, 'supabase_stub.sql'), os.path.join(ROOT_DIR, 'schema.sql')]
+    migrations_dir = os.path.join(ROOT_DIR, 'migrations')
+    scripts += [os.path.join(migrations_dir, name) for name in sorted(os.listdir(migrations_dir))
+                if name.endswith('.sql')]
+    conn = psycopg2.connect(database_url)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        for path in scripts:
+            with open(path) as f:
+                cur.execute(f.read())
+    conn.close()
+
+def seed_database(database_url, transactions):
+    first_month = _months_back(date.today(), SEED_MONTHS - 1)
+    conn = psycopg2.connect(database_url)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(SEED_SQL, {'first_month': first_month, 'months': SEED_MONTHS,
+                               'transactions': transactions})
+    conn.close()
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _wait_until_up(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise click.ClickException(f"{url} exited with status {process.returncode} before answering; see --server-log")
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise click.ClickException(f"{url} did not answer within {timeout}s")
+
+def start_stub(database_url, workers, threads, log):
+    port = _free_port()
+    env = dict(os.environ, BENCH_DATABASE_URL=database_url, BENCH_STUB_POOL_SIZE=str(threads))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--chdir', BENCH_DIR, '--bind', f'127.0.0.1:{port}',
+         '--workers', str(workers), '--threads', str(threads), '--log-level', 'warning', 'postgrest_stub:app'],
+        env=env, stdout=log, stderr=subprocess.STDOUT)
+    url = f'http://127.0.0.1:{port}'
+    _wait_until_up(f'{url}/rest/v1/accounts?select=id&limit=1', process)
+    return process, url
+
+def start_app(database_url, supabase_url, log, app_dir=ROOT_DIR):
+    port = _free_port()
+    env = dict(os.environ, PORT=str(port), SUPABASE_URL=supabase_url, DATABASE_URL=database_url,
+               SUPABASE_KEY=BENCH_SUPABASE_KEY,
+               REQUEST_TRACING='off')
+    env.setdefault('DB_SSLMODE', 'disable')
+    # gunicorn reads gunicorn.conf.py from the project directory, as in production
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '--log-level', 'warning', 'app:app'],
+                               cwd=app_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    url = f'http://127.0.0.1:{port}'
+    # Older checkouts have no /readyz, and their /health fails on tables the benchmark does not create
+    _wait_until_up(f'{url}/', process)
+    return process, url
+
+def stop(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)]
+
+def drive(base_url, route, concurrency, seconds):
+    """Send the route's request from `concurrency` clients in a closed loop for `seconds`"""
+    name, method, path, form, expected = route
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client_loop():
+        with httpx.Client(base_url=base_url, timeout=60, follow_redirects=False) as client:
+            while time.perf_counter() < deadline:
+                # Each request is a fresh visitor: a flashed message would skip the 304 path
+                client.cookies.clear()
+                started = time.perf_counter()
+                try:
+                    ok = client.request(method, path, data=form).status_code == expected
+                except httpx.HTTPError:
+                    ok = False
+                elapsed = time.perf_counter() - started
+                with lock:
+                    if ok:
+                        latencies.append(elapsed)
+                    else:
+                        errors[0] += 1
+
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client_loop) for _ in range(concurrency)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': round(len(latencies) / wall, 2),
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p90_ms': ms(percentile(latencies, 90)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+    }
+
+def _git_commit(path):
+    """Short commit of the checkout at path, with a -dirty suffix if tracked files have uncommitted changes"""
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty', '--abbrev=7'], cwd=path,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _change(new, old):
+    if not new or not old:
+        return '     -'
+    return f"{(new - old) / old * 100:+5.0f}%"
+
+def report(scale, results, baseline):
+    click.echo(f"\n{scale} transactions")
+    click.echo(f"{'route':<30}{'req/s':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'errors':>8}"
+               + ('   vs baseline: req/s   p50    p99' if baseline else ''))
+    for name, stats in results['routes'].items():
+        line = (f"{name:<30}{stats['rps']:>9.1f}{stats['p50_ms'] or 0:>10.1f}{stats['p90_ms'] or 0:>10.1f}"
+                f"{stats['p99_ms'] or 0:>10.1f}{stats['errors']:>8}")
+        previous = (baseline or {}).get('routes', {}).get(name)
+        if previous:
+            line += (f"{'':17}{_change(stats['rps'], previous['rps'])} {_change(stats['p50_ms'], previous['p50_ms'])}"
+                     f" {_change(stats['p99_ms'], previous['p99_ms'])}")
+        click.echo(line)
+
+@click.command()
+@click.option('--database-url', envvar='BENCH_DATABASE_URL', show_default=True,
+              default='postgresql://postgres@localhost/finance_bench',
+              help='Database to (re)create and seed; the server also needs a "postgres" database')
+@click.option('--scale', 'scales', multiple=True, type=click.Choice(list(SCALES)), default=['1k'],
+              show_default=True, help='Transactions to seed; repeat to run several sizes')
+@click.option('--concurrency', default=8, show_default=True, help='Concurrent clients per route')
+@click.option('--duration', default=10.0, show_default=True, help='Seconds each route is measured')
+@click.option('--warmup', default=2.0, show_default=True, help='Seconds each route runs before measuring')
+@click.option('--route', 'only', multiple=True, help='Run only these routes (by name)')
+@click.option('--postgrest-url', default=None, help='Use this PostgREST instead of the stub (it must serve --database-url)')
+@click.option('--stub-workers', default=2, show_default=True)
+@click.option('--stub-threads', default=16, show_default=True)
+@click.option('--app-dir', default=ROOT_DIR, type=click.Path(exists=True, file_okay=False),
+              help='Checkout whose app.py and gunicorn.conf.py are benchmarked (default: this tree)')
+@click.option('--baseline', 'baseline_path', default=BASELINE_PATH, show_default=True)
+@click.option('--save', is_flag=True, help='Store the results in the baseline file')
+@click.option('--output', default=None, help='Also write the results to this JSON file')
+@click.option('--server-log', default=SERVER_LOG_PATH, show_default=True, help='Where the app and stub output goes')
+def main(database_url, scales, concurrency, duration, warmup, only, postgrest_url, stub_workers, stub_threads,
+         app_dir, baseline_path, save, output, server_log):
+    """Benchmark the main routes at each --scale and compare with the baseline"""
+    baselines = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baselines = json.load(f)
+    selected = [r for r in routes() if not only or r[0] in only]
+
+    app_commit = _git_commit(app_dir)
+    if save and (app_commit or '').endswith('-dirty'):
+        click.echo(f"Warning: {app_dir} has uncommitted changes; the baseline will be marked {app_commit}", err=True)
+
+    all_results = {}
+    log = open(server_log, 'w')
+    for scale in scales:
+        click.echo(f"Seeding {SCALES[scale]} transactions...", err=True)
+        reset_database(database_url)
+        seed_database(database_url, SCALES[scale])
+
+        stub = None
+        if postgrest_url:
+            supabase_url = postgrest_url
+        else:
+            stub, supabase_url = start_stub(database_url, stub_workers, stub_threads, log)
+        app_process = None
+        try:
+            app_process, app_url = start_app(database_url, supabase_url, log, app_dir)
+            results = {
+                'meta': {
+                    'commit': app_commit,
+                    'schema_commit': _git_commit(ROOT_DIR),
+                    'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                    'transactions': SCALES[scale],
+                    'concurrency': concurrency,
+                    'duration': duration,
+                    'supabase': 'postgrest' if postgrest_url else 'stub',
+                    'web_concurrency': os.environ.get('WEB_CONCURRENCY', 'default'),
+                    'gunicorn_threads': os.environ.get('GUNICORN_THREADS', 'default'),
+                    'cpus': os.cpu_count(),
+                    'python': platform.python_version(),
+                },
+                'routes': {},
+            }
+            for route in selected:
+                click.echo(f"  {route[0]}...", err=True)
+                if warmup:
+                    drive(app_url, route, concurrency, warmup)
+                results['routes'][route[0]] = drive(app_url, route, concurrency, duration)
+        finally:
+            if app_process:
+                stop(app_process)
+            if stub:
+                stop(stub)
+
+        report(scale, results, baselines.get(scale))
+        if any(stats['errors'] for stats in results['routes'].values()):
+            click.echo(f"Some requests failed; the app's log is in {server_log}", err=True)
+        all_results[scale] = results
+    log.close()
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(all_results, f, indent=2)
+    if save:
+        baselines.update(all_results)
+        with open(baseline_path, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        click.echo(f"Saved {', '.join(all_results)} to {baseline_path}", err=True)
+
+if __name__ == '__main__':
+    main()
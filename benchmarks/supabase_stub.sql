@@ -0,0 +1,15 @@
+-- benchmarks/supabase_stub.sql
+-- Applied by benchmarks/run.py before schema.sql: the parts of the Supabase
+-- platform schema.sql refers to (auth.users and the auth helper functions),
+-- so the schema loads into a plain local Postgres.
+
+CREATE SCHEMA IF NOT EXISTS auth;
+
+CREATE TABLE IF NOT EXISTS auth.users (
+    id UUID PRIMARY KEY,
+    email TEXT,
+    raw_user_meta_data JSONB
+);
+
+CREATE OR REPLACE FUNCTION auth.uid() RETURNS UUID LANGUAGE sql AS $$ SELECT NULL::UUID $$;
+CREATE OR REPLACE FUNCTION auth.role() RETURNS TEXT LANGUAGE sql AS $$ SELECT 'service_role'::TEXT $$;
@@ -0,0 +1,78 @@
+# Gunicorn settings, picked up automatically by `gunicorn app:app` from the project directory
+# Each request spends most of its time waiting on Supabase round trips, so every worker
+# serves many requests at once instead of one: threads by default, or gevent greenlets.
+import os
+import shutil
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# gthread: a thread per in-flight request (no extra dependencies)
+# gevent: a greenlet per in-flight request (pip install gevent psycogreen)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+# Each open /events stream holds a gthread thread for as long as the page is open, so add
+# a thread per allowed stream: GUNICORN_THREADS stays the number of requests served at once
+if os.environ.get('DATABASE_URL') or os.environ.get('LIVE_UPDATES_DATABASE_URL'):
+    threads += int(os.environ.get('LIVE_UPDATES_MAX_CLIENTS', 8))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+
+# Each worker keeps its own Prometheus samples, so with several workers /metrics would report
+# only the one that answers the scrape. Without a configured directory use a fresh temporary
+# one; it is set before the workers fork and import the app, and removed on exit.
+_own_multiproc_dir = None
+if workers > 1 and not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    _own_multiproc_dir = tempfile.mkdtemp(prefix='finance-app-metrics-')
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = _own_multiproc_dir
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+def post_fork(server, worker):
+    """
+    Under gevent, psycopg2 would block the whole worker on a query; make it cooperative
+    """
+    if worker_class != 'gevent':
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        server.log.warning("psycogreen is not installed: direct database queries will block the gevent worker")
+        return
+    patch_psycopg()
+
+def on_starting(server):
+    """
+    Metrics samples of a previous run would be summed into the new one's, so start empty
+    """
+    # A local cache is invalidated only in the worker that made the write: the other workers
+    # keep serving the old rows to every read that is not a versioned (ETag) page view
+    if workers > 1 and os.environ.get('CACHE_BACKEND', 'local').lower() == 'local':
+        server.log.warning("=" * 72)
+        server.log.warning(f"CACHE_BACKEND=local with {workers} workers: each worker caches on its own and "
+                           f"misses the other workers' writes for up to CACHE_TTL seconds. "
+                           f"Set CACHE_BACKEND=redis or filesystem, or WEB_CONCURRENCY=1.")
+        server.log.warning("=" * 72)
+    multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        for name in os.listdir(multiproc_dir):
+            if name.endswith('.db'):
+                os.remove(os.path.join(multiproc_dir, name))
+
+def child_exit(server, worker):
+    """
+    Drop an exited worker's live gauges (pool usage) from the aggregated metrics
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    """
+    Remove the temporary metrics directory created above
+    """
+    if _own_multiproc_dir:
+        shutil.rmtree(_own_multiproc_dir, ignore_errors=True)
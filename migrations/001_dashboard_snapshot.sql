@@ -0,0 +1,55 @@
+-- migrations/001_dashboard_snapshot.sql
+-- Run this SQL in your Supabase SQL Editor after schema.sql
+
+-- Everything the overview page (/) needs in a single round trip:
+-- the account row, the most recent transactions, the month to show on the
+-- "Open Month Activity" card and the last few reconciled months.
+CREATE OR REPLACE FUNCTION public.dashboard_snapshot(
+    p_account_id BIGINT DEFAULT 1,
+    p_recent_limit INT DEFAULT 5,
+    p_months_limit INT DEFAULT 6
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH account AS (
+        SELECT a.*
+        FROM accounts a
+        WHERE a.id = p_account_id
+    ),
+    recent AS (
+        SELECT t.*
+        FROM transactions t
+        ORDER BY t.created_at DESC
+        LIMIT p_recent_limit
+    ),
+    -- Oldest month still open for reconciliation
+    open_month AS (
+        SELECT r.*
+        FROM reconciled_months r
+        WHERE r.is_reconciled = false
+        ORDER BY r.month
+        LIMIT 1
+    ),
+    closed_months AS (
+        SELECT r.*
+        FROM reconciled_months r
+        WHERE r.is_reconciled = true
+        ORDER BY r.month DESC
+        LIMIT p_months_limit
+    )
+    SELECT jsonb_build_object(
+        'account', (SELECT to_jsonb(account) FROM account),
+        'transactions', COALESCE(
+            (SELECT jsonb_agg(to_jsonb(recent) ORDER BY recent.created_at DESC) FROM recent),
+            '[]'::jsonb),
+        -- Fall back to the latest reconciled month when every month is closed
+        'reconciled_data', COALESCE(
+            (SELECT to_jsonb(open_month) FROM open_month),
+            (SELECT to_jsonb(closed_months) FROM closed_months ORDER BY closed_months.month DESC LIMIT 1)),
+        'reconciled_months', COALESCE(
+            (SELECT jsonb_agg(to_jsonb(closed_months) ORDER BY closed_months.month DESC) FROM closed_months),
+            '[]'::jsonb)
+    );
+$$;
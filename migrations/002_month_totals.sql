@@ -0,0 +1,20 @@
+-- migrations/002_month_totals.sql
+-- Run this SQL in your Supabase SQL Editor after 001_dashboard_snapshot.sql
+
+-- Month totals grouped by type and payment method, so the app no longer
+-- downloads every transaction of the month just to add the amounts up.
+-- p_month_end is exclusive (first day of the following month).
+CREATE OR REPLACE FUNCTION public.month_totals(p_month_start DATE, p_month_end DATE)
+RETURNS TABLE (type TEXT, payment_method TEXT, txn_count BIGINT, total NUMERIC)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT t.type::TEXT,
+           t.payment_method::TEXT,
+           COUNT(*),
+           COALESCE(SUM(t.amount), 0)
+    FROM transactions t
+    WHERE t.transaction_date >= p_month_start
+      AND t.transaction_date < p_month_end
+    GROUP BY t.type, t.payment_method;
+$$;
@@ -0,0 +1,172 @@
+-- migrations/003_monthly_rollups.sql
+-- Run this SQL in your Supabase SQL Editor after 002_month_totals.sql
+
+-- Per account, month, type and payment method transaction counts and sums.
+-- Kept up to date by statement-level triggers on transactions, so month
+-- pages read a handful of rows no matter how many transactions a month has.
+-- NULL account_id / payment_method are stored as 0 / '' to fit the primary key;
+-- transactions without a date belong to no month and are left out.
+CREATE TABLE IF NOT EXISTS monthly_rollups (
+    account_id BIGINT NOT NULL DEFAULT 0,
+    month DATE NOT NULL,
+    type TEXT NOT NULL DEFAULT '',
+    payment_method TEXT NOT NULL DEFAULT '',
+    txn_count BIGINT NOT NULL DEFAULT 0,
+    total DECIMAL(19,4) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (account_id, month, type, payment_method)
+);
+
+CREATE INDEX IF NOT EXISTS idx_monthly_rollups_month ON monthly_rollups(month);
+
+-- Apply the rows touched by one statement as signed deltas
+CREATE OR REPLACE FUNCTION public.maintain_monthly_rollups()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO monthly_rollups AS r (account_id, month, type, payment_method, txn_count, total)
+        SELECT COALESCE(o.account_id, 0),
+               date_trunc('month', o.transaction_date)::DATE,
+               COALESCE(o.type, ''),
+               COALESCE(o.payment_method, ''),
+               -COUNT(*),
+               -COALESCE(SUM(o.amount), 0)
+        FROM old_rows o
+        WHERE o.transaction_date IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT (account_id, month, type, payment_method) DO UPDATE
+            SET txn_count = r.txn_count + EXCLUDED.txn_count,
+                total = r.total + EXCLUDED.total,
+                updated_at = NOW();
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO monthly_rollups AS r (account_id, month, type, payment_method, txn_count, total)
+        SELECT COALESCE(n.account_id, 0),
+               date_trunc('month', n.transaction_date)::DATE,
+               COALESCE(n.type, ''),
+               COALESCE(n.payment_method, ''),
+               COUNT(*),
+               COALESCE(SUM(n.amount), 0)
+        FROM new_rows n
+        WHERE n.transaction_date IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+        ON CONFLICT (account_id, month, type, payment_method) DO UPDATE
+            SET txn_count = r.txn_count + EXCLUDED.txn_count,
+                total = r.total + EXCLUDED.total,
+                updated_at = NOW();
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS monthly_rollups_insert ON transactions;
+CREATE TRIGGER monthly_rollups_insert
+    AFTER INSERT ON transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION maintain_monthly_rollups();
+
+DROP TRIGGER IF EXISTS monthly_rollups_update ON transactions;
+CREATE TRIGGER monthly_rollups_update
+    AFTER UPDATE ON transactions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION maintain_monthly_rollups();
+
+DROP TRIGGER IF EXISTS monthly_rollups_delete ON transactions;
+CREATE TRIGGER monthly_rollups_delete
+    AFTER DELETE ON transactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION maintain_monthly_rollups();
+
+-- Recompute rollups from raw transactions, for one month or (p_month NULL) all of them.
+-- The lock makes concurrent writers wait, so their trigger deltas land on top of the rebuilt rows.
+CREATE OR REPLACE FUNCTION public.rebuild_monthly_rollups(p_month DATE DEFAULT NULL)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    rebuilt INTEGER;
+BEGIN
+    LOCK TABLE monthly_rollups IN SHARE ROW EXCLUSIVE MODE;
+
+    DELETE FROM monthly_rollups r
+    WHERE p_month IS NULL OR r.month = date_trunc('month', p_month)::DATE;
+
+    INSERT INTO monthly_rollups (account_id, month, type, payment_method, txn_count, total)
+    SELECT COALESCE(t.account_id, 0),
+           date_trunc('month', t.transaction_date)::DATE,
+           COALESCE(t.type, ''),
+           COALESCE(t.payment_method, ''),
+           COUNT(*),
+           COALESCE(SUM(t.amount), 0)
+    FROM transactions t
+    WHERE t.transaction_date IS NOT NULL
+      AND (p_month IS NULL
+           OR date_trunc('month', t.transaction_date)::DATE = date_trunc('month', p_month)::DATE)
+    GROUP BY 1, 2, 3, 4;
+
+    GET DIAGNOSTICS rebuilt = ROW_COUNT;
+    RETURN rebuilt;
+END;
+$$;
+
+-- List rollup rows that disagree with the raw transactions (empty result = consistent)
+CREATE OR REPLACE FUNCTION public.check_monthly_rollups(p_month DATE DEFAULT NULL)
+RETURNS TABLE (
+    account_id BIGINT,
+    month DATE,
+    type TEXT,
+    payment_method TEXT,
+    expected_count BIGINT,
+    actual_count BIGINT,
+    expected_total NUMERIC,
+    actual_total NUMERIC
+)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH expected AS (
+        SELECT COALESCE(t.account_id, 0) AS account_id,
+               date_trunc('month', t.transaction_date)::DATE AS month,
+               COALESCE(t.type, '') AS type,
+               COALESCE(t.payment_method, '') AS payment_method,
+               COUNT(*) AS txn_count,
+               COALESCE(SUM(t.amount), 0) AS total
+        FROM transactions t
+        WHERE t.transaction_date IS NOT NULL
+          AND (p_month IS NULL
+               OR date_trunc('month', t.transaction_date)::DATE = date_trunc('month', p_month)::DATE)
+        GROUP BY 1, 2, 3, 4
+    ),
+    actual AS (
+        SELECT r.account_id, r.month, r.type, r.payment_method, r.txn_count, r.total
+        FROM monthly_rollups r
+        WHERE (p_month IS NULL OR r.month = date_trunc('month', p_month)::DATE)
+          AND (r.txn_count <> 0 OR r.total <> 0)
+    )
+    SELECT COALESCE(e.account_id, a.account_id),
+           COALESCE(e.month, a.month),
+           COALESCE(e.type, a.type),
+           COALESCE(e.payment_method, a.payment_method),
+           COALESCE(e.txn_count, 0),
+           COALESCE(a.txn_count, 0),
+           COALESCE(e.total, 0),
+           COALESCE(a.total, 0)
+    FROM expected e
+    FULL OUTER JOIN actual a
+        ON a.account_id = e.account_id
+       AND a.month = e.month
+       AND a.type = e.type
+       AND a.payment_method = e.payment_method
+    WHERE COALESCE(e.txn_count, 0) <> COALESCE(a.txn_count, 0)
+       OR COALESCE(e.total, 0) <> COALESCE(a.total, 0);
+$$;
+
+-- Backfill existing history
+SELECT rebuild_monthly_rollups();
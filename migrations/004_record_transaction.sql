@@ -0,0 +1,51 @@
+-- migrations/004_record_transaction.sql
+-- Run this SQL in your Supabase SQL Editor after 003_monthly_rollups.sql
+
+-- Insert a transaction and apply its balance delta to the account in one
+-- database transaction. The balance is updated in place (x = x + delta), so
+-- concurrent cash-register entries cannot overwrite each other.
+CREATE OR REPLACE FUNCTION public.record_transaction(
+    p_account_id BIGINT,
+    p_type TEXT,
+    p_amount NUMERIC,
+    p_description TEXT DEFAULT '',
+    p_payment_method TEXT DEFAULT '',
+    p_transaction_date TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    signed_amount NUMERIC := CASE p_type
+        WHEN 'income' THEN p_amount
+        WHEN 'expense' THEN -p_amount
+        ELSE 0
+    END;
+    txn transactions;
+    new_primary_account NUMERIC;
+    new_cash_box NUMERIC;
+BEGIN
+    INSERT INTO transactions (account_id, type, amount, description, payment_method, transaction_date)
+    VALUES (p_account_id, p_type, p_amount, p_description, p_payment_method, p_transaction_date)
+    RETURNING * INTO txn;
+
+    -- Only the balance matching the payment method moves
+    UPDATE accounts a
+    SET primary_account = COALESCE(a.primary_account, 0)
+            + CASE WHEN p_payment_method = 'bank' THEN signed_amount ELSE 0 END,
+        cash_box = COALESCE(a.cash_box, 0)
+            + CASE WHEN p_payment_method = 'cash' THEN signed_amount ELSE 0 END
+    WHERE a.id = p_account_id
+    RETURNING a.primary_account, a.cash_box INTO new_primary_account, new_cash_box;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Account % not found', p_account_id;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'transaction', to_jsonb(txn),
+        'primary_account', new_primary_account,
+        'cash_box', new_cash_box
+    );
+END;
+$$;
@@ -0,0 +1,61 @@
+-- migrations/005_import_transactions.sql
+-- Run this SQL in your Supabase SQL Editor after 004_record_transaction.sql
+
+-- Insert a batch of imported transactions with one multi-row INSERT and
+-- apply their combined balance delta to the account once, atomically.
+-- p_rows is a JSON array of {type, amount, description, payment_method, transaction_date}.
+CREATE OR REPLACE FUNCTION public.import_transactions(p_account_id BIGINT, p_rows JSONB)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    inserted_count BIGINT;
+    primary_delta NUMERIC;
+    cash_delta NUMERIC;
+    new_primary_account NUMERIC;
+    new_cash_box NUMERIC;
+BEGIN
+    WITH batch AS (
+        SELECT *
+        FROM jsonb_to_recordset(p_rows) AS r(
+            type TEXT,
+            amount NUMERIC,
+            description TEXT,
+            payment_method TEXT,
+            transaction_date TIMESTAMP WITH TIME ZONE
+        )
+    ),
+    inserted AS (
+        INSERT INTO transactions (account_id, type, amount, description, payment_method, transaction_date)
+        SELECT p_account_id, b.type, b.amount, b.description, b.payment_method, b.transaction_date
+        FROM batch b
+        RETURNING transactions.type, transactions.amount, transactions.payment_method
+    ),
+    signed AS (
+        SELECT i.payment_method,
+               CASE i.type WHEN 'income' THEN i.amount WHEN 'expense' THEN -i.amount ELSE 0 END AS delta
+        FROM inserted i
+    )
+    SELECT COUNT(*),
+           COALESCE(SUM(s.delta) FILTER (WHERE s.payment_method = 'bank'), 0),
+           COALESCE(SUM(s.delta) FILTER (WHERE s.payment_method = 'cash'), 0)
+    INTO inserted_count, primary_delta, cash_delta
+    FROM signed s;
+
+    UPDATE accounts a
+    SET primary_account = COALESCE(a.primary_account, 0) + primary_delta,
+        cash_box = COALESCE(a.cash_box, 0) + cash_delta
+    WHERE a.id = p_account_id
+    RETURNING a.primary_account, a.cash_box INTO new_primary_account, new_cash_box;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Account % not found', p_account_id;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'inserted', inserted_count,
+        'primary_account', new_primary_account,
+        'cash_box', new_cash_box
+    );
+END;
+$$;
@@ -0,0 +1,11 @@
+-- migrations/006_transactions_keyset_index.sql
+-- Run this SQL in your Supabase SQL Editor after 005_import_transactions.sql
+
+-- Backs keyset pagination in /api/transactions, which orders by
+-- (transaction_date DESC, id DESC) and seeks past the last row of the previous page.
+CREATE INDEX IF NOT EXISTS idx_transactions_date_id
+    ON transactions(transaction_date DESC, id DESC);
+
+-- Same ordering for listings filtered to one account
+CREATE INDEX IF NOT EXISTS idx_transactions_account_date_id
+    ON transactions(account_id, transaction_date DESC, id DESC);
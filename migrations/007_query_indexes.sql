@@ -0,0 +1,31 @@
+-- migrations/007_query_indexes.sql
+-- Run this SQL in your Supabase SQL Editor after 006_transactions_keyset_index.sql
+
+-- The original composite indexes led with the primary key, so they could
+-- never serve a date range, a user filter or an ORDER BY created_at.
+DROP INDEX IF EXISTS idx_transactions_user_date;
+DROP INDEX IF EXISTS idx_budgets_user_period;
+-- Superseded by idx_transactions_account_date_id (006)
+DROP INDEX IF EXISTS idx_transactions_account_date;
+
+CREATE INDEX IF NOT EXISTS idx_budgets_user_period
+    ON budgets(user_id, start_date, end_date);
+
+-- "Recent transactions" cards: ORDER BY created_at DESC LIMIT n
+CREATE INDEX IF NOT EXISTS idx_transactions_created_at
+    ON transactions(created_at DESC);
+
+-- Month aggregates (month_totals, rollup rebuilds) become index-only scans
+CREATE INDEX IF NOT EXISTS idx_transactions_date_totals
+    ON transactions(transaction_date) INCLUDE (type, payment_method, amount);
+
+-- Oldest open month for the overview card
+CREATE INDEX IF NOT EXISTS idx_reconciled_months_open
+    ON reconciled_months(month) WHERE is_reconciled = false;
+
+-- "Previous Month Activity": latest reconciled months first
+CREATE INDEX IF NOT EXISTS idx_reconciled_months_closed
+    ON reconciled_months(month DESC) WHERE is_reconciled = true;
+
+ANALYZE transactions;
+ANALYZE reconciled_months;
@@ -0,0 +1,46 @@
+-- migrations/008_data_version.sql
+-- Run this SQL in your Supabase SQL Editor after 007_query_indexes.sql
+
+-- Keep updated_at current on the tables the pages render, so their
+-- latest change time can serve as a cheap page version (ETag / Last-Modified).
+ALTER TABLE accounts ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+ALTER TABLE reconciled_months ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+DROP TRIGGER IF EXISTS update_accounts_updated_at ON accounts;
+CREATE TRIGGER update_accounts_updated_at
+    BEFORE UPDATE ON accounts
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+DROP TRIGGER IF EXISTS update_reconciled_months_updated_at ON reconciled_months;
+CREATE TRIGGER update_reconciled_months_updated_at
+    BEFORE UPDATE ON reconciled_months
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+CREATE INDEX IF NOT EXISTS idx_reconciled_months_updated_at ON reconciled_months(updated_at DESC);
+CREATE INDEX IF NOT EXISTS idx_monthly_rollups_updated_at ON monthly_rollups(updated_at DESC);
+
+-- Latest change times for one account and (optionally) one month.
+-- Transaction changes are read from monthly_rollups, whose rows the
+-- rollup triggers touch on every insert, update and delete, so deleted
+-- transactions move the version too.
+CREATE OR REPLACE FUNCTION public.data_version(p_account_id BIGINT DEFAULT 1, p_month DATE DEFAULT NULL)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT jsonb_build_object(
+        'transactions', (
+            SELECT MAX(r.updated_at)
+            FROM monthly_rollups r
+            WHERE p_month IS NULL OR r.month = date_trunc('month', p_month)::DATE),
+        'account', (
+            SELECT a.updated_at
+            FROM accounts a
+            WHERE a.id = p_account_id),
+        'reconciled_months', (
+            SELECT MAX(m.updated_at)
+            FROM reconciled_months m)
+    );
+$$;
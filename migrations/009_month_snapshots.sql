@@ -0,0 +1,86 @@
+-- migrations/009_month_snapshots.sql
+-- Run this SQL in your Supabase SQL Editor after 008_data_version.sql
+
+-- A reconciled month is closed, so its page data is frozen at reconciliation
+-- time into one JSONB row: the reconciled_months row (starting and closing
+-- balances), the month totals and the transaction list. The month page then
+-- reads a single row by primary key instead of recomputing from transactions.
+CREATE TABLE IF NOT EXISTS month_snapshots (
+    month DATE PRIMARY KEY,
+    snapshot JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Build and store the snapshot of one reconciled month; returns the snapshot,
+-- or NULL (and stores nothing) if the month is not reconciled.
+CREATE OR REPLACE FUNCTION public.snapshot_month(p_month DATE)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_month DATE := date_trunc('month', p_month)::DATE;
+    v_end DATE := (date_trunc('month', p_month) + INTERVAL '1 month')::DATE;
+    v_snapshot JSONB;
+BEGIN
+    SELECT jsonb_build_object(
+        'month_row', to_jsonb(m),
+        'totals', COALESCE((
+            SELECT jsonb_agg(to_jsonb(g))
+            FROM month_totals(v_month, v_end) g), '[]'::JSONB),
+        'transactions', COALESCE((
+            SELECT jsonb_agg(to_jsonb(t) ORDER BY t.transaction_date DESC, t.id DESC)
+            FROM transactions t
+            WHERE t.transaction_date >= v_month
+              AND t.transaction_date < v_end), '[]'::JSONB))
+    INTO v_snapshot
+    FROM reconciled_months m
+    WHERE m.month = v_month
+      AND m.is_reconciled;
+
+    IF v_snapshot IS NULL THEN
+        DELETE FROM month_snapshots WHERE month = v_month;
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO month_snapshots (month, snapshot)
+    VALUES (v_month, v_snapshot)
+    ON CONFLICT (month) DO UPDATE
+        SET snapshot = EXCLUDED.snapshot,
+            created_at = NOW();
+
+    RETURN v_snapshot;
+END;
+$$;
+
+-- Transactions can still be edited after reconciliation. Any change to a
+-- month's rollups (i.e. its transactions) or to its reconciled_months row
+-- drops the snapshot; the month page serves live data and re-snapshots.
+CREATE OR REPLACE FUNCTION public.drop_month_snapshot()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM month_snapshots WHERE month = OLD.month;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        DELETE FROM month_snapshots WHERE month = NEW.month;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS monthly_rollups_drop_snapshot ON monthly_rollups;
+CREATE TRIGGER monthly_rollups_drop_snapshot
+    AFTER INSERT OR UPDATE OR DELETE ON monthly_rollups
+    FOR EACH ROW
+    EXECUTE FUNCTION drop_month_snapshot();
+
+DROP TRIGGER IF EXISTS reconciled_months_drop_snapshot ON reconciled_months;
+CREATE TRIGGER reconciled_months_drop_snapshot
+    AFTER INSERT OR UPDATE OR DELETE ON reconciled_months
+    FOR EACH ROW
+    EXECUTE FUNCTION drop_month_snapshot();
+
+-- Snapshot the months reconciled before this migration
+SELECT COUNT(snapshot_month(month)) AS months_snapshotted FROM reconciled_months WHERE is_reconciled;
@@ -0,0 +1,122 @@
+-- migrations/010_live_updates.sql
+-- Run this SQL in your Supabase SQL Editor after 009_month_snapshots.sql
+
+-- Publish transaction and balance changes on the finance_changes channel.
+-- Each app worker LISTENs on it and pushes the events to open pages over
+-- server-sent events (/events), so pages update without reloading.
+-- Payloads carry only the columns the pages show (NOTIFY is limited to 8000 bytes).
+
+CREATE OR REPLACE FUNCTION public.finance_change_transaction(t transactions)
+RETURNS JSONB
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT jsonb_build_object(
+        'id', t.id,
+        'account_id', t.account_id,
+        'transaction_date', t.transaction_date,
+        'type', t.type,
+        'amount', t.amount,
+        'payment_method', t.payment_method,
+        'description', left(t.description, 200));
+$$;
+
+-- Statement-level, so a bulk import sends one 'BULK' event instead of one per row
+CREATE OR REPLACE FUNCTION public.notify_transaction_changes()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_count BIGINT;
+    v_event JSONB;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        SELECT COUNT(*) INTO v_count FROM old_rows;
+    ELSE
+        SELECT COUNT(*) INTO v_count FROM new_rows;
+    END IF;
+
+    IF v_count = 0 THEN
+        RETURN NULL;
+    ELSIF v_count > 20 THEN
+        PERFORM pg_notify('finance_changes', jsonb_build_object(
+            'table', 'transactions', 'op', 'BULK', 'count', v_count)::TEXT);
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        FOR v_event IN
+            SELECT jsonb_build_object('table', 'transactions', 'op', TG_OP,
+                                      'new', finance_change_transaction(n))
+            FROM new_rows n
+        LOOP
+            PERFORM pg_notify('finance_changes', v_event::TEXT);
+        END LOOP;
+    ELSIF TG_OP = 'UPDATE' THEN
+        FOR v_event IN
+            SELECT jsonb_build_object('table', 'transactions', 'op', TG_OP,
+                                      'old', finance_change_transaction(o),
+                                      'new', finance_change_transaction(n))
+            FROM new_rows n
+            JOIN old_rows o ON o.id = n.id
+        LOOP
+            PERFORM pg_notify('finance_changes', v_event::TEXT);
+        END LOOP;
+    ELSE
+        FOR v_event IN
+            SELECT jsonb_build_object('table', 'transactions', 'op', TG_OP,
+                                      'old', finance_change_transaction(o))
+            FROM old_rows o
+        LOOP
+            PERFORM pg_notify('finance_changes', v_event::TEXT);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS transactions_notify_insert ON transactions;
+CREATE TRIGGER transactions_notify_insert
+    AFTER INSERT ON transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_transaction_changes();
+
+DROP TRIGGER IF EXISTS transactions_notify_update ON transactions;
+CREATE TRIGGER transactions_notify_update
+    AFTER UPDATE ON transactions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_transaction_changes();
+
+DROP TRIGGER IF EXISTS transactions_notify_delete ON transactions;
+CREATE TRIGGER transactions_notify_delete
+    AFTER DELETE ON transactions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_transaction_changes();
+
+CREATE OR REPLACE FUNCTION public.notify_account_changes()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_notify('finance_changes', jsonb_build_object(
+        'table', 'accounts', 'op', TG_OP,
+        'new', jsonb_build_object(
+            'id', NEW.id,
+            'balance', NEW.balance,
+            'cash_box', NEW.cash_box,
+            'primary_account', NEW.primary_account))::TEXT);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS accounts_notify_update ON accounts;
+CREATE TRIGGER accounts_notify_update
+    AFTER UPDATE ON accounts
+    FOR EACH ROW
+    WHEN (OLD.balance IS DISTINCT FROM NEW.balance
+          OR OLD.cash_box IS DISTINCT FROM NEW.cash_box
+          OR OLD.primary_account IS DISTINCT FROM NEW.primary_account)
+    EXECUTE FUNCTION notify_account_changes();
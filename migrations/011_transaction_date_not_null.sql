@@ -0,0 +1,12 @@
+-- migrations/011_transaction_date_not_null.sql
+-- Run this SQL in your Supabase SQL Editor after 010_live_updates.sql
+
+-- Keyset pagination in /api/transactions seeks on (transaction_date, id); a NULL
+-- date sorts first in DESC order and cannot be compared with, so a page ending on
+-- one has no valid cursor. Undated rows take their creation time.
+UPDATE transactions
+SET transaction_date = COALESCE(created_at, NOW())
+WHERE transaction_date IS NULL;
+
+ALTER TABLE transactions ALTER COLUMN transaction_date SET DEFAULT NOW();
+ALTER TABLE transactions ALTER COLUMN transaction_date SET NOT NULL;
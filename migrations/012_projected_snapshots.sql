@@ -0,0 +1,143 @@
+-- migrations/012_projected_snapshots.sql
+-- Run this SQL in your Supabase SQL Editor after 011_transaction_date_not_null.sql
+
+-- dashboard_snapshot and snapshot_month returned whole rows (to_jsonb), so pages
+-- served from them saw columns the REST path never selects (e.g. created_by_ip)
+-- and `flask templates check-fields` only vouched for the REST path. Both now
+-- build their rows from the same column lists as PROJECTIONS in app.py; keep the
+-- *_json functions below in step with it (tests/test_migrations.py checks this).
+
+CREATE OR REPLACE FUNCTION public.account_json(a accounts)
+RETURNS JSONB
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT jsonb_build_object(
+        'id', a.id,
+        'balance', a.balance,
+        'cash_box', a.cash_box,
+        'primary_account', a.primary_account,
+        'start_month', a.start_month);
+$$;
+
+CREATE OR REPLACE FUNCTION public.transaction_json(t transactions)
+RETURNS JSONB
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT jsonb_build_object(
+        'id', t.id,
+        'transaction_date', t.transaction_date,
+        'type', t.type,
+        'amount', t.amount,
+        'description', t.description,
+        'payment_method', t.payment_method);
+$$;
+
+CREATE OR REPLACE FUNCTION public.reconciled_month_json(r reconciled_months)
+RETURNS JSONB
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT jsonb_build_object(
+        'month', r.month,
+        'is_reconciled', r.is_reconciled,
+        'reconciled_at', r.reconciled_at,
+        'starting_balance', r.starting_balance,
+        'starting_cash', r.starting_cash,
+        'closing_balance', r.closing_balance,
+        'closing_cash', r.closing_cash);
+$$;
+
+CREATE OR REPLACE FUNCTION public.dashboard_snapshot(
+    p_account_id BIGINT DEFAULT 1,
+    p_recent_limit INT DEFAULT 5,
+    p_months_limit INT DEFAULT 6
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH account AS (
+        SELECT a
+        FROM accounts a
+        WHERE a.id = p_account_id
+    ),
+    recent AS (
+        SELECT t, t.created_at
+        FROM transactions t
+        ORDER BY t.created_at DESC
+        LIMIT p_recent_limit
+    ),
+    -- Oldest month still open for reconciliation
+    open_month AS (
+        SELECT r
+        FROM reconciled_months r
+        WHERE r.is_reconciled = false
+        ORDER BY r.month
+        LIMIT 1
+    ),
+    closed_months AS (
+        SELECT r, r.month
+        FROM reconciled_months r
+        WHERE r.is_reconciled = true
+        ORDER BY r.month DESC
+        LIMIT p_months_limit
+    )
+    SELECT jsonb_build_object(
+        'account', (SELECT account_json(account.a) FROM account),
+        'transactions', COALESCE(
+            (SELECT jsonb_agg(transaction_json(recent.t) ORDER BY recent.created_at DESC) FROM recent),
+            '[]'::jsonb),
+        -- Fall back to the latest reconciled month when every month is closed
+        'reconciled_data', COALESCE(
+            (SELECT reconciled_month_json(open_month.r) FROM open_month),
+            (SELECT reconciled_month_json(closed_months.r) FROM closed_months ORDER BY closed_months.month DESC LIMIT 1)),
+        'reconciled_months', COALESCE(
+            (SELECT jsonb_agg(reconciled_month_json(closed_months.r) ORDER BY closed_months.month DESC)
+             FROM closed_months),
+            '[]'::jsonb)
+    );
+$$;
+
+CREATE OR REPLACE FUNCTION public.snapshot_month(p_month DATE)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_month DATE := date_trunc('month', p_month)::DATE;
+    v_end DATE := (date_trunc('month', p_month) + INTERVAL '1 month')::DATE;
+    v_snapshot JSONB;
+BEGIN
+    SELECT jsonb_build_object(
+        'month_row', reconciled_month_json(m),
+        'totals', COALESCE((
+            SELECT jsonb_agg(to_jsonb(g))
+            FROM month_totals(v_month, v_end) g), '[]'::JSONB),
+        'transactions', COALESCE((
+            SELECT jsonb_agg(transaction_json(t) ORDER BY t.transaction_date DESC, t.id DESC)
+            FROM transactions t
+            WHERE t.transaction_date >= v_month
+              AND t.transaction_date < v_end), '[]'::JSONB))
+    INTO v_snapshot
+    FROM reconciled_months m
+    WHERE m.month = v_month
+      AND m.is_reconciled;
+
+    IF v_snapshot IS NULL THEN
+        DELETE FROM month_snapshots WHERE month = v_month;
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO month_snapshots (month, snapshot)
+    VALUES (v_month, v_snapshot)
+    ON CONFLICT (month) DO UPDATE
+        SET snapshot = EXCLUDED.snapshot,
+            created_at = NOW();
+
+    RETURN v_snapshot;
+END;
+$$;
+
+-- Rebuild the stored snapshots, which still hold whole rows
+SELECT COUNT(snapshot_month(month)) AS months_snapshotted FROM reconciled_months WHERE is_reconciled;
@@ -61,7 +61,7 @@ CREATE TABLE IF NOT EXISTS transactions (
     user_id BIGINT REFERENCES users(id),
     account_id BIGINT REFERENCES accounts(id),
     category_id BIGINT REFERENCES categories(id),
-    transaction_date TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    transaction_date TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
     type VARCHAR(10) CHECK (type IN ('income', 'expense', 'transfer')),
     amount  DECIMAL(19,4) NOT NULL,
     currency VARCHAR(10) DEFAULT 'ZAR',
@@ -73,6 +73,26 @@ CREATE TABLE IF NOT EXISTS transactions (
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Columns used by app.py for the cash box / primary account split
+ALTER TABLE accounts ADD COLUMN IF NOT EXISTS cash_box DECIMAL(19,4) DEFAULT 0;
+ALTER TABLE accounts ADD COLUMN IF NOT EXISTS primary_account DECIMAL(19,4) DEFAULT 0;
+ALTER TABLE accounts ADD COLUMN IF NOT EXISTS start_month VARCHAR(7);
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS payment_method VARCHAR(10);
+
+-- Create the reconciled_months table (one row per month, opening and closing balances)
+CREATE TABLE IF NOT EXISTS reconciled_months (
+    id BIGSERIAL PRIMARY KEY,
+    month DATE UNIQUE NOT NULL,
+    is_reconciled BOOLEAN DEFAULT FALSE,
+    starting_balance DECIMAL(19,4) DEFAULT 0,
+    starting_cash DECIMAL(19,4) DEFAULT 0,
+    closing_balance DECIMAL(19,4),
+    closing_cash DECIMAL(19,4),
+    reconciled_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
 -- Create the budgets table
 CREATE TABLE IF NOT EXISTS budgets (
     id BIGSERIAL PRIMARY KEY,
@@ -111,10 +131,11 @@ CREATE TABLE recurring_transactions (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
--- Composite indexes for common queries
-CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions(id, transaction_date DESC);
-CREATE INDEX IF NOT EXISTS idx_transactions_account_date ON transactions(account_id, transaction_date DESC);
-CREATE INDEX IF NOT EXISTS idx_budgets_user_period ON budgets(id, start_date, end_date);
+-- Composite indexes for common queries (see migrations/ for the full set)
+CREATE INDEX IF NOT EXISTS idx_transactions_date_id ON transactions(transaction_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_transactions_account_date_id ON transactions(account_id, transaction_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_transactions_created_at ON transactions(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_budgets_user_period ON budgets(user_id, start_date, end_date);
 
 -- Partial indexes for active records
 CREATE INDEX IF NOT EXISTS idx_active_categories ON categories(id) WHERE is_active = true;
@@ -0,0 +1,111 @@
+// Live updates: applies the change events streamed by /events to the open page.
+// Elements opt in with data attributes:
+//   data-live="cash_box" | "primary_account" | "total_balance"   current balances
+//   data-live="cash_in" | "cash_out" | "income" | "expenses"      totals of the month shown
+//   data-live-month="YYYY-MM"                                     tbody listing that month's transactions
+//   data-live-notice                                              hidden element shown after bulk changes
+(function () {
+    if (!window.EventSource || !document.querySelector('[data-live], [data-live-month]')) {
+        return;
+    }
+
+    function formatAmount(value) {
+        return 'R' + Number(value || 0).toFixed(2);
+    }
+
+    function setAmount(name, value) {
+        document.querySelectorAll(`[data-live="${name}"]`).forEach(el => {
+            el.dataset.value = value;
+            el.textContent = formatAmount(value);
+        });
+    }
+
+    function addAmount(name, delta) {
+        document.querySelectorAll(`[data-live="${name}"]`).forEach(el => {
+            const value = Number(el.dataset.value || 0) + delta;
+            el.dataset.value = value;
+            el.textContent = formatAmount(value);
+        });
+    }
+
+    // Same buckets as MonthTotals in app.py; transfers do not count
+    function applyTotals(transaction, sign) {
+        const amount = sign * Number(transaction.amount || 0);
+        const buckets = {
+            'income:cash': 'cash_in', 'expense:cash': 'cash_out',
+            'income:bank': 'income', 'expense:bank': 'expenses'
+        };
+        const bucket = buckets[`${transaction.type}:${transaction.payment_method}`];
+        if (bucket) {
+            addAmount(bucket, amount);
+        }
+    }
+
+    const typeClasses = {
+        income: ['bg-green-100 text-green-800', 'text-green-600'],
+        expense: ['bg-red-100 text-red-800', 'text-red-600']
+    };
+
+    function buildRow(transaction) {
+        const [badgeClass, amountClass] = typeClasses[transaction.type] || ['bg-gray-100 text-gray-800', 'text-gray-900'];
+        const date = transaction.transaction_date ? transaction.transaction_date.slice(0, 10) : '';
+        const row = document.createElement('tr');
+        row.dataset.transactionId = transaction.id;
+        row.innerHTML = `
+            <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500"></td>
+            <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-900"></td>
+            <td class="px-6 py-4 whitespace-nowrap text-sm text-gray-500 type-col">
+                <span class="px-2 inline-flex text-xs leading-5 font-semibold rounded-full ${badgeClass}"></span>
+            </td>
+            <td class="px-6 py-4 whitespace-nowrap text-sm ${amountClass}"></td>`;
+        const cells = row.querySelectorAll('td');
+        cells[0].textContent = date;
+        cells[1].textContent = transaction.description || '';
+        cells[2].querySelector('span').textContent = transaction.type || '';
+        cells[3].textContent = formatAmount(transaction.amount);
+        return row;
+    }
+
+    function inMonth(transaction, month) {
+        return transaction && transaction.transaction_date && transaction.transaction_date.slice(0, 7) === month;
+    }
+
+    const source = new EventSource('/events');
+
+    source.addEventListener('accounts', e => {
+        const account = JSON.parse(e.data).new;
+        setAmount('cash_box', account.cash_box);
+        setAmount('primary_account', account.primary_account);
+        setAmount('total_balance', Number(account.cash_box || 0) + Number(account.primary_account || 0));
+    });
+
+    source.addEventListener('transactions', e => {
+        const event = JSON.parse(e.data);
+        if (event.op === 'BULK') {
+            document.querySelectorAll('[data-live-notice]').forEach(el => el.classList.remove('hidden'));
+            return;
+        }
+
+        const tbody = document.querySelector('[data-live-month]');
+        if (!tbody) {
+            return;
+        }
+        const month = tbody.dataset.liveMonth;
+        if (inMonth(event.old, month)) {
+            applyTotals(event.old, -1);
+            const row = tbody.querySelector(`tr[data-transaction-id="${event.old.id}"]`);
+            if (row) {
+                row.remove();
+            }
+        }
+        if (inMonth(event.new, month)) {
+            applyTotals(event.new, 1);
+            // Rows are listed newest first
+            const row = buildRow(event.new);
+            const next = Array.from(tbody.querySelectorAll('tr[data-transaction-date]'))
+                .find(r => r.dataset.transactionDate <= event.new.transaction_date.slice(0, 10));
+            row.dataset.transactionDate = event.new.transaction_date.slice(0, 10);
+            tbody.insertBefore(row, next || null);
+        }
+    });
+})();
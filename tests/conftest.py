@@ -0,0 +1,111 @@
+import os
+import sys
+
+import httpx
+import pytest
+from flask.testing import FlaskClient
+
+# app.py creates its Supabase client at import time; point it at an address that is never
+# reached (every test routes the client's session through FakePostgrest) and keep the
+# direct database, tracing and metrics switched off. DATABASE_URL is kept for the tests
+# that run against a real PostgreSQL (the database_url fixture).
+os.environ.setdefault('SUPABASE_URL', 'http://supabase.test')
+os.environ.setdefault('SUPABASE_KEY', 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.test')
+os.environ['SUPABASE_HTTP2'] = 'false'
+os.environ['CACHE_BACKEND'] = 'local'
+TEST_DATABASE_URL = os.environ.pop('DATABASE_URL', None)
+os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as finance_app  # noqa: E402
+
+
+class FakePostgrest:
+    """
+    Answers the Supabase client's requests with canned PostgREST responses
+    Responses are registered per (method, path below /rest/v1/), e.g.
+    fake.add('POST', 'rpc/data_version', {...}); a callable body is called with the request and
+    may return an httpx.Response. Every request is kept in .requests.
+    """
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+
+    def add(self, method, path, body=None, status=200, headers=None):
+        self.routes[(method, path)] = (status, body, headers or {})
+
+    def missing_function(self, name):
+        self.add('POST', f'rpc/{name}', {
+            'code': 'PGRST202', 'details': None, 'hint': None,
+            'message': f'Could not find the function public.{name} in the schema cache'}, status=404)
+
+    def paths(self):
+        return [request.url.path.rsplit('/rest/v1/', 1)[-1] for request in self.requests]
+
+    def handle(self, request):
+        self.requests.append(request)
+        path = request.url.path.rsplit('/rest/v1/', 1)[-1]
+        if (request.method, path) not in self.routes:
+            return httpx.Response(404, json={'code': '42P01', 'message': f'No fake response for {request.method} {path}'})
+        status, body, headers = self.routes[(request.method, path)]
+        if callable(body):
+            body = body(request)
+            if isinstance(body, httpx.Response):
+                return body
+        return httpx.Response(status, json=body, headers=headers)
+
+
+@pytest.fixture
+def app_module():
+    return finance_app
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    finance_app.query_cache.backend.clear()
+    finance_app._missing_functions.clear()
+    yield
+    finance_app.query_cache.backend.clear()
+    finance_app._missing_functions.clear()
+
+
+@pytest.fixture
+def database_url(monkeypatch):
+    """Point the app's direct connection pool at DATABASE_URL; skips the test when it is unset"""
+    if not TEST_DATABASE_URL:
+        pytest.skip('DATABASE_URL is not set')
+    monkeypatch.setattr(finance_app, 'DATABASE_URL', TEST_DATABASE_URL)
+    monkeypatch.setattr(finance_app, '_db_pool', None)
+    yield TEST_DATABASE_URL
+    if finance_app._db_pool is not None:
+        finance_app._db_pool.closeall()
+
+
+@pytest.fixture
+def postgrest(monkeypatch):
+    """Route every Supabase REST and RPC call made through the pinned client to a FakePostgrest"""
+    fake = FakePostgrest()
+    old_session = finance_app.supabase.postgrest.session
+    session = finance_app.TracedSyncClient(base_url=old_session.base_url, headers=old_session.headers,
+                                           transport=httpx.MockTransport(fake.handle))
+    monkeypatch.setattr(finance_app.supabase.postgrest, 'session', session)
+    yield fake
+    session.close()
+
+
+class BufferedClient(FlaskClient):
+    """
+    Test client that reads every response to the end and closes it
+    A streamed page left unread would be finalised during a later test, popping that test's
+    request context from under it.
+    """
+    def open(self, *args, **kwargs):
+        kwargs.setdefault('buffered', True)
+        return super().open(*args, **kwargs)
+
+
+@pytest.fixture
+def client():
+    finance_app.app.config['TESTING'] = True
+    return BufferedClient(finance_app.app, finance_app.app.response_class, use_cookies=True)
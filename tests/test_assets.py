@@ -0,0 +1,30 @@
+def test_parse_css_splits_top_level_rules(app_module):
+    css = ('@charset "UTF-8";/*! license */ /* dropped */ .a{color:red}'
+           '@media (min-width:640px){.b{content:"}"}} .c::before{content:"{"}')
+    assert app_module.parse_css(css) == [
+        ('@charset "UTF-8"', None),
+        ('/*! license */', None),
+        ('.a', 'color:red'),
+        ('@media (min-width:640px)', '.b{content:"}"}'),
+        ('.c::before', 'content:"{"'),
+    ]
+
+
+def test_purge_css_keeps_used_selectors_only(app_module):
+    css = ('body{margin:0}.used,.unused{color:red}.unused{color:blue}.btn:not(.disabled){opacity:1}'
+           '.sm\\:flex{display:flex}@media (min-width:640px){.used{padding:0}.gone{padding:1px}}'
+           '@media print{.gone{display:none}}@font-face{font-family:"X"}')
+    assert app_module.purge_css(css, {'used', 'btn', 'sm:flex'}) == (
+        'body{margin:0}.used{color:red}.btn:not(.disabled){opacity:1}.sm\\:flex{display:flex}'
+        '@media (min-width:640px){.used{padding:0}}@font-face{font-family:"X"}')
+
+
+def test_prune_at_rules_drops_unused_keyframes_and_fonts(app_module):
+    css = ('@keyframes spin{to{transform:rotate(1turn)}}@keyframes ping{to{opacity:0}}.animate-spin{animation:spin 1s}'
+           '.fa-solid{font-family:"Font Awesome 6 Free";font-weight:900}'
+           '@font-face{font-family:"Font Awesome 6 Free";font-weight:900;src:url(fa-solid.woff2) format("woff2"),url(fa-solid.ttf)}'
+           '@font-face{font-family:"Font Awesome 6 Free";font-weight:400;src:url(fa-regular.woff2)}')
+    pruned, fonts = app_module.prune_at_rules(css)
+    assert 'ping' not in pruned and '@keyframes spin' in pruned
+    assert 'fa-regular' not in pruned and 'fa-solid.ttf' not in pruned
+    assert fonts == ['fa-solid.woff2']
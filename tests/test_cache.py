@@ -0,0 +1,124 @@
+import json
+import os
+import time
+
+import pytest
+
+
+@pytest.fixture(params=['local', 'filesystem', 'redis'])
+def backend(request, app_module, tmp_path):
+    if request.param == 'local':
+        return app_module.LocalCacheBackend(max_entries=8)
+    if request.param == 'filesystem':
+        return app_module.FileCacheBackend(str(tmp_path))
+    fakeredis = pytest.importorskip('fakeredis')
+    return app_module.RedisCacheBackend(client=fakeredis.FakeRedis())
+
+
+def test_backend_get_set_incr(backend):
+    assert backend.get('finance:a') is None
+    backend.set('finance:a', b'value', ttl=60)
+    assert backend.get('finance:a') == b'value'
+    assert backend.incr('finance:ver:x') == 1
+    assert backend.incr('finance:ver:x') == 2
+    assert backend.get('finance:ver:x') == b'2'
+
+
+def test_backend_honours_sub_second_ttl(backend):
+    backend.set('finance:a', b'value', ttl=0.05)
+    assert backend.get('finance:a') == b'value'
+    time.sleep(0.1)
+    assert backend.get('finance:a') is None
+
+
+def test_versioned_cache_bump_invalidates(app_module, backend):
+    cache = app_module.VersionedCache(backend, ttl=60)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return {'id': 1, 'cash_box': 150}
+
+    assert cache.get_or_load('account:1', 'row', load) == {'id': 1, 'cash_box': 150}
+    assert cache.get_or_load('account:1', 'row', load) == {'id': 1, 'cash_box': 150}
+    assert len(loads) == 1
+    cache.bump('account:1')
+    cache.get_or_load('account:1', 'row', load)
+    assert len(loads) == 2
+
+
+def test_versioned_cache_stores_json(app_module):
+    backend = app_module.LocalCacheBackend()
+    cache = app_module.VersionedCache(backend, ttl=60)
+    cache.get_or_load('account:1', 'row', lambda: {'id': 1})
+    assert json.loads(backend.get('finance:account:1:v0:row')) == {'id': 1}
+
+
+def test_versioned_cache_ignores_unreadable_entries(app_module):
+    backend = app_module.LocalCacheBackend()
+    backend.set('finance:account:1:v0:row', b'\x80\x04not json')
+    cache = app_module.VersionedCache(backend, ttl=60)
+    assert cache.get_or_load('account:1', 'row', lambda: {'id': 1}) == {'id': 1}
+    assert cache.errors == 1
+
+
+def test_file_backend_sweeps_expired_and_stray_files(app_module, tmp_path):
+    backend = app_module.FileCacheBackend(str(tmp_path))
+    backend.set('finance:old', b'x', ttl=0.01)
+    backend.set('finance:live', b'y', ttl=60)
+    backend.incr('finance:ver:account:1')
+    stray = tmp_path / '.tmp-interrupted'
+    stray.write_bytes(b'partial')
+    os.utime(stray, (time.time() - 120, time.time() - 120))
+    time.sleep(0.02)
+
+    assert backend.sweep() == 2
+    assert backend.get('finance:live') == b'y'
+    assert backend.get('finance:ver:account:1') == b'1'
+    assert sorted(os.listdir(tmp_path)) == sorted(['.lock', os.path.basename(backend._path('finance:live')),
+                                                   os.path.basename(backend._path('finance:ver:account:1'))])
+
+
+def test_month_totals_round_trip_through_cache(app_module, monkeypatch):
+    groups = [{'type': 'income', 'payment_method': 'cash', 'txn_count': 2, 'total': 300},
+              {'type': 'expense', 'payment_method': 'bank', 'txn_count': 1, 'total': 45.5}]
+    monkeypatch.setattr(app_module, '_fetch_month_totals',
+                        lambda month_start, account_id=None: app_module.MonthTotals.from_groups(groups))
+    first = app_module.fetch_month_totals('2025-06-01')
+    cached = app_module.fetch_month_totals('2025-06-01')
+    assert cached == first
+    assert cached.cash_in == 300 and cached.bank_expenses == 45.5
+
+
+def test_fragment_keys_always_expire(app_module, monkeypatch):
+    ttls = []
+    backend = app_module.query_cache.backend
+    monkeypatch.setattr(backend, 'set', lambda key, value, ttl=None: ttls.append(ttl))
+    template = app_module.app.jinja_env.from_string("{% cache None, 'card', 1 %}x{% endcache %}"
+                                                    "{% cache 300, 'table', 1 %}y{% endcache %}")
+    assert template.render() == 'xy'
+    assert ttls == [app_module.FRAGMENT_CACHE_TTL, 300]
+
+
+def test_month_transactions_are_cached_until_the_month_changes(app_module, postgrest):
+    postgrest.add('GET', 'transactions', [{'id': 1, 'amount': 10}])
+    assert app_module.fetch_month_transactions('2025-06-01') == [{'id': 1, 'amount': 10}]
+    assert app_module.fetch_month_transactions('2025-06-01') == [{'id': 1, 'amount': 10}]
+    assert postgrest.paths() == ['transactions']
+    app_module.query_cache.bump('month:2025-06')
+    app_module.fetch_month_transactions('2025-06-01')
+    assert postgrest.paths() == ['transactions', 'transactions']
+
+
+def test_page_reads_are_keyed_on_the_page_data_version(app_module, postgrest):
+    # Another worker's write reaches this worker only as a new data version: the month
+    # namespace was never bumped here, yet the page must not render the old rows
+    postgrest.add('GET', 'transactions', [{'id': 1, 'amount': 10}])
+    with app_module.app.test_request_context('/monthly_activity'):
+        app_module.g.data_version = {'transactions': '2025-06-14T10:00:00+00:00'}
+        assert app_module.fetch_month_transactions('2025-06-01') == [{'id': 1, 'amount': 10}]
+        postgrest.add('GET', 'transactions', [{'id': 1, 'amount': 10}, {'id': 2, 'amount': 5}])
+        assert app_module.fetch_month_transactions('2025-06-01') == [{'id': 1, 'amount': 10}]
+        app_module.g.data_version = {'transactions': '2025-06-14T11:00:00+00:00'}
+        assert len(app_module.fetch_month_transactions('2025-06-01')) == 2
+    assert postgrest.paths() == ['transactions', 'transactions']
@@ -0,0 +1,129 @@
+import pytest
+
+VERSION = {'accounts': '2025-06-14T09:30:00+00:00', 'transactions': '2025-06-14T10:00:00+00:00'}
+
+
+@pytest.fixture
+def overview(postgrest):
+    postgrest.add('POST', 'rpc/data_version', dict(VERSION))
+    postgrest.add('POST', 'rpc/dashboard_snapshot', {
+        'account': {'id': 1, 'cash_box': 150, 'primary_account': 2000, 'balance': 2150},
+        'transactions': [], 'reconciled_data': None, 'reconciled_months': []})
+    return postgrest
+
+
+def test_unchanged_page_is_answered_with_304(overview, client):
+    first = client.get('/')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    overview.requests.clear()
+    second = client.get('/', headers={'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.data == b''
+    # No page queries, and the version itself is reused for DATA_VERSION_TTL
+    assert overview.paths() == []
+
+
+def test_weakened_etag_still_matches(overview, client):
+    # compress_response weakens the ETag of compressed pages, and browsers send it back as W/"..."
+    etag = client.get('/').headers['ETag'].removeprefix('W/')
+    assert client.get('/', headers={'If-None-Match': f'W/{etag}'}).status_code == 304
+
+
+def test_changed_data_renders_the_page(app_module, overview, client):
+    etag = client.get('/').headers['ETag']
+    overview.add('POST', 'rpc/data_version', dict(VERSION, transactions='2025-06-14T11:00:00+00:00'))
+    # Let the cached version expire, as a change made outside this worker does
+    app_module.query_cache.bump('data_version')
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_if_modified_since_uses_latest_change(overview, client):
+    last_modified = client.get('/').headers['Last-Modified']
+    assert client.get('/', headers={'If-Modified-Since': last_modified}).status_code == 304
+
+
+def test_missing_data_version_serves_page_unconditionally(postgrest, client):
+    postgrest.missing_function('data_version')
+    postgrest.add('POST', 'rpc/dashboard_snapshot', {'account': {'id': 1}, 'transactions': [],
+                                                      'reconciled_data': None, 'reconciled_months': []})
+    response = client.get('/', headers={'If-None-Match': '"anything"'})
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+
+
+def test_data_version_is_reused_until_a_write(app_module, overview, client):
+    client.get('/')
+    client.get('/')
+    assert overview.paths().count('rpc/data_version') == 1
+    app_module.invalidate_month_cache('2025-06-14')
+    client.get('/')
+    assert overview.paths().count('rpc/data_version') == 2
+
+
+def test_failing_data_version_is_logged_and_page_served(overview, client, caplog):
+    overview.add('POST', 'rpc/data_version', {'code': 'XX000', 'message': 'boom'}, status=500)
+    response = client.get('/', headers={'If-None-Match': '"anything"'})
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+    assert any(record.levelname == 'ERROR' and 'data_version failed' in record.message
+               for record in caplog.records)
+
+
+@pytest.fixture
+def month_page(postgrest):
+    postgrest.add('POST', 'rpc/data_version', dict(VERSION))
+    postgrest.add('GET', 'month_snapshots', [])
+    postgrest.add('GET', 'accounts', [{'id': 1, 'balance': 2150, 'cash_box': 150, 'primary_account': 2000,
+                                       'start_month': '2025-01'}])
+    postgrest.add('GET', 'reconciled_months', [{'month': '2025-06-01', 'is_reconciled': False,
+                                                'starting_balance': 1000, 'starting_cash': 100}])
+    postgrest.add('GET', 'monthly_rollups', [])
+    postgrest.add('GET', 'transactions', [
+        {'id': 1, 'transaction_date': '2025-06-02', 'type': 'expense', 'amount': 45,
+         'description': 'Groceries', 'payment_method': 'bank'}])
+    return postgrest
+
+
+def test_month_table_follows_the_data_version(app_module, month_page, client):
+    assert b'Groceries' in client.get('/monthly_activity?month=2025-06').data
+
+    # A write made by another worker: this worker's month cache is never bumped, only the
+    # data version moves on (once the cached version expires)
+    month_page.add('GET', 'transactions', [
+        {'id': 2, 'transaction_date': '2025-06-03', 'type': 'expense', 'amount': 30,
+         'description': 'Fuel', 'payment_method': 'bank'},
+        {'id': 1, 'transaction_date': '2025-06-02', 'type': 'expense', 'amount': 45,
+         'description': 'Groceries', 'payment_method': 'bank'}])
+    month_page.add('POST', 'rpc/data_version', dict(VERSION, transactions='2025-06-14T11:00:00+00:00'))
+    app_module.query_cache.bump('data_version')
+    response = client.get('/monthly_activity?month=2025-06')
+    assert response.status_code == 200
+    # Neither the cached rows nor the cached table fragment of the old version are used
+    assert b'Fuel' in response.data
+
+
+def test_month_pages_never_write_snapshots(month_page, client):
+    # A closed month whose snapshot was dropped is computed live, not frozen again by the GET
+    month_page.add('GET', 'reconciled_months', [{'month': '2025-06-01', 'is_reconciled': True,
+                                                 'reconciled_at': '2025-07-01T08:00:00+00:00',
+                                                 'starting_balance': 1000, 'starting_cash': 100,
+                                                 'closing_balance': 955, 'closing_cash': 100}])
+    response = client.get('/monthly_activity?month=2025-06')
+    assert response.status_code == 200
+    assert b'Groceries' in response.data
+    assert 'rpc/snapshot_month' not in month_page.paths()
+    # Past months read the snapshot together with the other page reads, then the live rows
+    paths = month_page.paths()
+    assert paths.index('month_snapshots') < paths.index('transactions')
+    assert {'accounts', 'reconciled_months'} <= set(paths[:paths.index('transactions')])
+
+
+def test_current_month_skips_the_snapshot(month_page, client):
+    response = client.get('/monthly_activity')
+    assert response.status_code == 200
+    assert 'month_snapshots' not in month_page.paths()
@@ -0,0 +1,129 @@
+import threading
+import time
+
+import psycopg2
+import pytest
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, vars=None):
+        if self.conn.broken:
+            raise psycopg2.OperationalError('server closed the connection unexpectedly')
+        self.conn.queries.append(query)
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = 0
+        self.broken = False
+        self.status = psycopg2.extensions.STATUS_READY
+        self.queries = []
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = psycopg2.extensions.STATUS_READY
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def connections(app_module, monkeypatch):
+    """Every connection the pool opens, in order; psycopg2.connect is replaced by a fake factory"""
+    opened = []
+
+    def connect(dsn, **kwargs):
+        opened.append(FakeConnection(len(opened)))
+        return opened[-1]
+
+    monkeypatch.setattr(app_module.psycopg2, 'connect', connect)
+    return opened
+
+
+def test_connections_are_reused(app_module, connections):
+    pool = app_module.PostgresConnectionPool('postgres://test', max_size=2)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+    assert len(connections) == 1
+    # Borrowing runs the health check
+    assert conn.queries == ['SELECT 1']
+
+
+def test_checkout_times_out_when_pool_is_exhausted(app_module, connections):
+    pool = app_module.PostgresConnectionPool('postgres://test', max_size=1, timeout=0.05)
+    pool.getconn()
+    started = time.monotonic()
+    with pytest.raises(app_module.PoolTimeout):
+        pool.getconn()
+    assert time.monotonic() - started >= 0.05
+    assert pool.stats() == {'size': 1, 'idle': 0, 'max_size': 1}
+
+
+def test_waiting_checkout_gets_the_returned_connection(app_module, connections):
+    pool = app_module.PostgresConnectionPool('postgres://test', max_size=1, timeout=2)
+    conn = pool.getconn()
+    threading.Timer(0.05, pool.putconn, [conn]).start()
+    assert pool.getconn() is conn
+
+
+def test_broken_connection_is_replaced_on_borrow(app_module, connections):
+    pool = app_module.PostgresConnectionPool('postgres://test', max_size=1)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.broken = True
+    replacement = pool.getconn()
+    assert replacement is connections[1]
+    assert conn.closed
+    assert pool.stats()['size'] == 1
+
+
+def test_connections_are_recycled_after_max_lifetime(app_module, connections):
+    pool = app_module.PostgresConnectionPool('postgres://test', max_size=1, max_lifetime=0.02, health_check=False)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+    time.sleep(0.03)
+    # Expired when returned: closed instead of going back to the idle list
+    pool.putconn(conn)
+    assert conn.closed
+    assert pool.getconn() is connections[1]
+
+
+def test_returned_connection_with_open_transaction_is_rolled_back(app_module, connections):
+    pool = app_module.PostgresConnectionPool('postgres://test', health_check=False)
+    conn = pool.getconn()
+    conn.status = psycopg2.extensions.STATUS_IN_TRANSACTION
+    pool.putconn(conn)
+    assert conn.rollbacks == 1
+    pool.putconn(pool.getconn(), discard=True)
+    assert conn.closed and pool.stats()['size'] == 0
+
+
+def test_each_process_gets_its_own_pool(app_module, connections, monkeypatch):
+    monkeypatch.setattr(app_module, 'DATABASE_URL', 'postgresql://postgres@localhost/finance')
+    monkeypatch.setattr(app_module, '_db_pool', None)
+    parent = app_module.get_db_pool()
+    assert app_module.get_db_pool() is parent
+    assert parent.dsn == 'postgres://postgres@localhost/finance'
+
+    # A forked worker sees a new pid: it opens its own connections and leaves the parent's open
+    monkeypatch.setattr(app_module.os, 'getpid', lambda: -1)
+    child = app_module.get_db_pool()
+    assert child is not parent
+    assert not any(conn.closed for conn in connections)
+    assert len(connections) == app_module.DB_POOL_MIN_SIZE * 2
@@ -0,0 +1,84 @@
+from contextlib import contextmanager
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def fresh_readiness(app_module, monkeypatch):
+    monkeypatch.setitem(app_module._readiness, 'result', None)
+    monkeypatch.setitem(app_module._readiness, 'checked_at', 0.0)
+
+
+class FakeCursor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query):
+        pass
+
+
+class FakeConnection:
+    def cursor(self):
+        return FakeCursor()
+
+
+def fake_db(app_module, monkeypatch, conn):
+    @contextmanager
+    def get_db_connection():
+        yield conn
+
+    monkeypatch.setattr(app_module, 'DATABASE_URL', 'postgresql://postgres@localhost/finance')
+    monkeypatch.setattr(app_module, 'get_db_connection', get_db_connection)
+
+
+def test_livez_does_no_io(postgrest, client):
+    response = client.get('/livez')
+    assert response.status_code == 200
+    assert response.get_json() == {'status': 'ok'}
+    assert postgrest.requests == []
+
+
+def test_readyz_ready(app_module, postgrest, client, monkeypatch):
+    postgrest.add('GET', 'accounts', [{'id': 1}])
+    fake_db(app_module, monkeypatch, FakeConnection())
+    response = client.get('/readyz')
+    assert response.status_code == 200
+    assert response.get_json() == {'status': 'ready', 'checks': {'supabase': 'ok', 'database': 'ok'}}
+
+
+def test_readyz_not_ready_when_supabase_fails(postgrest, client):
+    postgrest.add('GET', 'accounts', {'code': 'XX000', 'message': 'boom'}, status=500)
+    response = client.get('/readyz')
+    assert response.status_code == 503
+    assert response.get_json() == {'status': 'unavailable', 'checks': {'supabase': 'failed'}}
+
+
+def test_readyz_not_ready_without_a_database_connection(app_module, postgrest, client, monkeypatch):
+    postgrest.add('GET', 'accounts', [{'id': 1}])
+    fake_db(app_module, monkeypatch, None)
+    response = client.get('/readyz')
+    assert response.status_code == 503
+    assert response.get_json()['checks'] == {'supabase': 'ok', 'database': 'failed'}
+
+
+def test_readyz_reuses_its_result(app_module, postgrest, client, monkeypatch):
+    postgrest.add('GET', 'accounts', [{'id': 1}])
+    assert client.get('/readyz').status_code == 200
+    # Supabase goes down, but probes within READINESS_CACHE_SECONDS get the cached result
+    postgrest.add('GET', 'accounts', {'code': 'XX000', 'message': 'boom'}, status=500)
+    assert client.get('/readyz').status_code == 200
+    assert postgrest.paths() == ['accounts']
+
+    monkeypatch.setattr(app_module, 'READINESS_CACHE_SECONDS', 0)
+    assert client.get('/readyz').status_code == 503
+    assert postgrest.paths() == ['accounts', 'accounts']
+
+
+def test_health_without_admin_token_is_the_readiness_probe(postgrest, client):
+    postgrest.add('GET', 'accounts', [{'id': 1}])
+    response = client.get('/health')
+    assert response.status_code == 200
+    assert response.get_json() == {'status': 'ready', 'checks': {'supabase': 'ok'}}
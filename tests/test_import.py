@@ -0,0 +1,98 @@
+import io
+
+import httpx
+import pytest
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('45.00', 45.0),
+    ('-R45.00', -45.0),
+    ('R-45.00', -45.0),
+    ('(R1,200.50)', -1200.5),
+    ('$ 12', 12.0),
+    ('+3', 3.0),
+    ('45,50', 45.5),
+    ('1 234,56', 1234.56),
+    ('1.234,56', 1234.56),
+    ('1,234.56', 1234.56),
+    ('1,234,567', 1234567.0),
+    ('R\u00a01\u00a0234,56', 1234.56),
+    ('-45,5', -45.5),
+])
+def test_parse_import_amount(app_module, raw, expected):
+    assert app_module._parse_import_amount(raw) == expected
+
+
+@pytest.mark.parametrize('raw', ['', 'abc', 'R'])
+def test_parse_import_amount_rejects_non_numbers(app_module, raw):
+    with pytest.raises(app_module.ImportRowError):
+        app_module._parse_import_amount(raw)
+
+
+@pytest.mark.parametrize('raw', ['1,234', '1.500', '12,34.5', '1,2,3'])
+def test_parse_import_amount_rejects_ambiguous_separators(app_module, raw):
+    # 1,234 is a thousand in one locale and one-and-a-bit in another
+    with pytest.raises(app_module.ImportRowError):
+        app_module._parse_import_amount(raw)
+
+
+def test_parse_csv_signed_and_split_amounts(app_module):
+    signed = list(app_module.parse_csv_export([
+        'Date,Description,Amount\n', '14/06/2025,Groceries,-R45.00\n', '15/06/2025,Salary,1000\n', 'bad,row,1\n']))
+    assert [(line, row and (row['type'], row['amount'], row['transaction_date'])) for line, row, _ in signed] == [
+        (2, ('expense', 45.0, '2025-06-14')), (3, ('income', 1000.0, '2025-06-15')), (4, None)]
+    assert signed[2][2] == "Unrecognised date 'bad'"
+
+    split = list(app_module.parse_csv_export(['Date,Memo,Debit,Credit\n', '2025-06-14,Fuel,300,\n']))
+    assert split[0][1]['type'] == 'expense' and split[0][1]['amount'] == 300.0
+
+
+def test_parse_ofx_sgml_export(app_module):
+    ofx = """OFXHEADER:100
+<OFX><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20250614120000[+2:SAST]
+<TRNAMT>-45.00
+<FITID>1001
+<NAME>Groceries
+</STMTTRN>
+</BANKTRANLIST></OFX>
+""".splitlines(keepends=True)
+    [(line, row, error)] = list(app_module.parse_ofx_export(ofx))
+    assert (line, error) == (3, None)
+    assert row == {'type': 'expense', 'amount': 45.0, 'description': 'Groceries',
+                   'payment_method': 'bank', 'transaction_date': '2025-06-14'}
+
+
+def test_parse_qif_uses_month_first_dates(app_module):
+    qif = ['!Type:Bank\n', 'D06/14/2025\n', 'T-45.00\n', 'PGroceries\n', '^\n']
+    [(line, row, error)] = list(app_module.parse_qif_export(qif))
+    assert line == 2 and error is None
+    assert row['transaction_date'] == '2025-06-14' and row['description'] == 'Groceries'
+
+
+def test_failed_batch_reports_committed_batches(app_module, postgrest):
+    calls = []
+
+    def import_rows(request):
+        calls.append(request)
+        if len(calls) == 2:
+            return httpx.Response(400, json={'code': '23514', 'message': 'new row violates check constraint'})
+        return {'inserted': 2}
+
+    postgrest.add('POST', 'rpc/import_transactions', import_rows)
+    lines = ['Date,Description,Amount\n'] + [f'2025-06-{day:02d},Row {day},-10\n' for day in range(1, 6)]
+    with pytest.raises(app_module.ImportBatchError) as excinfo:
+        app_module.import_transactions(lines, 'csv', batch_size=2)
+    assert excinfo.value.summary['batches'] == 1
+    assert excinfo.value.summary['imported'] == 2
+    assert excinfo.value.line == 4
+    assert len(calls) == 2
+
+
+def test_import_upload_rejects_non_integer_account(client):
+    response = client.post('/transactions/import', data={
+        'account_id': 'one', 'file': (io.BytesIO(b'Date,Amount\n2025-06-14,-1\n'), 'export.csv')})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'account_id must be an integer'
@@ -0,0 +1,21 @@
+import pytest
+
+
+@pytest.mark.parametrize('dsn', ['postgresql://postgres.abc:pw@aws-0-eu-west-1.pooler.supabase.com:6543/postgres',
+                                 'host=aws-0-eu-west-1.pooler.supabase.com port=6543 dbname=postgres'])
+def test_transaction_pooler_cannot_listen(app_module, dsn):
+    assert 'transaction pooler' in app_module.live_updates_problem(dsn)
+
+
+@pytest.mark.parametrize('dsn', ['postgresql://postgres:pw@db.abc.supabase.co:5432/postgres',
+                                 'postgresql://postgres@localhost/finance'])
+def test_direct_and_session_connections_can_listen(app_module, dsn):
+    assert app_module.live_updates_problem(dsn) is None
+
+
+def test_events_explain_why_live_updates_are_off(app_module, monkeypatch, client):
+    monkeypatch.setattr(app_module, 'LIVE_UPDATES_PROBLEM', app_module.live_updates_problem(
+        'postgresql://postgres@pooler.supabase.com:6543/postgres'))
+    response = client.get('/events')
+    assert response.status_code == 503
+    assert 'LIVE_UPDATES_DATABASE_URL' in response.get_json()['error']
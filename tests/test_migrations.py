@@ -0,0 +1,22 @@
+import os
+import re
+
+MIGRATIONS = os.path.join(os.path.dirname(__file__), os.pardir, 'migrations')
+
+
+def _json_functions():
+    """Keys each <projection>_json function in the migrations builds, by projection name"""
+    functions = {}
+    for name in sorted(os.listdir(MIGRATIONS)):
+        with open(os.path.join(MIGRATIONS, name)) as f:
+            sql = f.read()
+        for projection, body in re.findall(r'FUNCTION public\.(\w+)_json\(.*?\$\$(.*?)\$\$', sql, re.S):
+            functions[projection] = tuple(re.findall(r"'(\w+)', \w+\.\w+", body))
+    return functions
+
+
+def test_snapshot_functions_build_rows_from_projections(app_module):
+    # The RPC paths must return the same fields the REST paths select
+    functions = _json_functions()
+    for projection in ('account', 'transaction', 'reconciled_month'):
+        assert functions[projection] == app_module.PROJECTIONS[projection]
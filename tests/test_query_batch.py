@@ -0,0 +1,101 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+
+@pytest.fixture
+def executor(app_module, monkeypatch):
+    """A two-thread query pool, so tests can fill it and make later queries queue"""
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='test-query')
+    monkeypatch.setattr(app_module, 'get_query_executor', lambda: pool)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def sleeper(seconds, value=None, calls=None):
+    def query():
+        if calls is not None:
+            calls.append(value)
+        time.sleep(seconds)
+        return value
+    return query
+
+
+def test_results_and_defaults(app_module, executor):
+    batch = app_module.QueryBatch()
+    batch.add('accounts', lambda: [{'id': 1}])
+    batch.add('goals', lambda: None, default=[])
+    results = batch.run()
+    assert results == {'accounts': [{'id': 1}], 'goals': []}
+    assert results.errors == {}
+
+
+def test_partial_failure_keeps_the_other_results(app_module, executor):
+    def fail():
+        raise RuntimeError('connection reset')
+
+    batch = app_module.QueryBatch()
+    batch.add('accounts', lambda: [{'id': 1}])
+    batch.add('goals', fail, default=[])
+    results = batch.run()
+    assert results['accounts'] == [{'id': 1}]
+    assert results['goals'] == []
+    assert results.ok('accounts') and not results.ok('goals')
+    assert results.errors == {'goals': 'connection reset'}
+
+
+def test_slow_query_times_out_with_its_default(app_module, executor):
+    batch = app_module.QueryBatch(timeout=0.05)
+    batch.add('fast', lambda: 'done')
+    batch.add('slow', sleeper(0.5, 'late'), default='fallback')
+    started = time.monotonic()
+    results = batch.run()
+    assert time.monotonic() - started < 0.4
+    assert results == {'fast': 'done', 'slow': 'fallback'}
+    assert results.errors == {'slow': 'timed out after 0.05s'}
+    # The started query cannot be interrupted: it finishes in the background
+    assert app_module.QueryBatch.abandoned_running() == 1
+    executor.shutdown(wait=True)
+    assert app_module.QueryBatch.abandoned_running() == 0
+
+
+def test_timeout_starts_when_the_query_starts(app_module, executor):
+    # Both pool threads are busy for 0.15s, longer than the 0.1s timeout; the queued
+    # query still gets its full timeout once a thread picks it up
+    busy = [executor.submit(time.sleep, 0.15) for _ in range(2)]
+    batch = app_module.QueryBatch(timeout=0.3)
+    batch.add('queued', sleeper(0.2, 'rows'))
+    results = batch.run()
+    assert results == {'queued': 'rows'}
+    assert results.errors == {}
+    assert all(future.done() for future in busy)
+
+
+def test_query_still_queued_after_its_timeout_is_dropped(app_module, executor):
+    release = threading.Event()
+    busy = [executor.submit(release.wait) for _ in range(2)]
+    calls = []
+    batch = app_module.QueryBatch(timeout=0.05)
+    batch.add('queued', sleeper(0, 'rows', calls), default=[])
+    results = batch.run()
+    assert results == {'queued': []}
+    assert results.errors == {'queued': 'not started within 0.05s'}
+    release.set()
+    executor.shutdown(wait=True)
+    assert all(future.done() for future in busy)
+    # Cancelled before a thread was free, so it never ran
+    assert calls == []
+
+
+def test_abandoned_task_does_not_run_once_picked_up(app_module):
+    calls = []
+    task = app_module._BatchTask(sleeper(0, 'rows', calls))
+    assert task.abandon()
+    assert task() is None
+    assert calls == []
+
+    task = app_module._BatchTask(sleeper(0, 'rows', calls))
+    assert task() == 'rows'
+    assert not task.abandon()
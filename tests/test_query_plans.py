@@ -0,0 +1,64 @@
+LEADING = {'idx_transactions_date_id': 'transaction_date', 'idx_reconciled_months_open': 'month'}
+
+
+def test_postgrest_sql_translates_route_builders(app_module):
+    sql, params = app_module.postgrest_sql(app_module.open_month_query())
+    assert sql == ('SELECT "month", "is_reconciled", "reconciled_at", "starting_balance", "starting_cash", '
+                   '"closing_balance", "closing_cash" FROM "reconciled_months" '
+                   'WHERE "is_reconciled" = %s ORDER BY "month" LIMIT 1')
+    assert params == ['False']
+
+
+def test_postgrest_sql_translates_keyset_page(app_module):
+    builder = app_module.transactions_page_query(['id', 'transaction_date'], 50, ('2025-01-15T00:00:00+00:00', 1000),
+                                                 {'account_id': '1'})
+    sql, params = app_module.postgrest_sql(builder)
+    assert sql == ('SELECT "id", "transaction_date" FROM "transactions" WHERE "account_id" = %s '
+                   'AND NOT ("transaction_date" IS NULL) AND "transaction_date" <= %s '
+                   'AND ("transaction_date" < %s OR ("transaction_date" = %s AND "id" < %s)) '
+                   'ORDER BY "transaction_date" DESC, "id" DESC LIMIT 51')
+    assert params == ['1'] + ['2025-01-15T00:00:00+00:00'] * 3 + ['1000']
+
+
+def _scan(**node):
+    return dict({'Node Type': 'Index Scan', 'Relation Name': 'transactions',
+                 'Index Name': 'idx_transactions_date_id'}, **node)
+
+
+def test_plan_problems_accepts_seek_with_page_sized_filter(app_module):
+    plan = {'Node Type': 'Limit', 'Plans': [_scan(**{
+        'Index Cond': "(transaction_date <= '2025-01-15 00:00:00+00'::timestamp with time zone)",
+        'Filter': '(id < 1000)', 'Rows Removed by Filter': 3})]}
+    assert app_module.plan_problems(plan, 'transactions', LEADING, True, 51) == []
+
+
+def test_plan_problems_rejects_filtering_full_index_walk(app_module):
+    plan = {'Node Type': 'Limit', 'Plans': [_scan(**{
+        'Index Cond': '(transaction_date IS NOT NULL)',
+        'Filter': "((transaction_date < '2025-01-15') OR (id < 1000))", 'Rows Removed by Filter': 90331})]}
+    problems = app_module.plan_problems(plan, 'transactions', LEADING, True, 51)
+    assert len(problems) == 2
+    assert 'without seeking on its leading column transaction_date' in problems[0]
+    assert 'filters out 90331 rows' in problems[1]
+
+
+def test_plan_problems_accepts_partial_index_without_cond(app_module):
+    plan = {'Node Type': 'Limit', 'Plans': [{
+        'Node Type': 'Index Scan', 'Relation Name': 'reconciled_months', 'Index Name': 'idx_reconciled_months_open'}]}
+    assert app_module.plan_problems(plan, 'reconciled_months', LEADING, True, 1) == []
+
+
+def test_plan_problems_rejects_seq_scan(app_module):
+    plan = {'Node Type': 'Seq Scan', 'Relation Name': 'transactions', 'Filter': '(id = 1)', 'Rows Removed by Filter': 0}
+    assert app_module.plan_problems(plan, 'transactions', LEADING, True, 1) == ['sequential scan']
+
+
+def test_route_queries_use_indexes(app_module, database_url):
+    """
+    Run `flask db check-plans` against DATABASE_URL (schema.sql and every migration applied,
+    e.g. the benchmark database; set DB_SSLMODE=disable for a local server)
+    """
+    result = app_module.app.test_cli_runner().invoke(args=['db', 'check-plans'])
+    assert result.exit_code == 0, result.output
+    assert 'FAIL' not in result.output
+    assert result.output.count('ok  ') == len(app_module.QUERY_PLAN_CHECKS)
@@ -0,0 +1,126 @@
+import pytest
+from postgrest.exceptions import APIError
+
+
+def test_pinned_client_rejects_object_results(app_module, postgrest):
+    # Why call_function exists: postgrest-py 0.10 only accepts a list of rows
+    postgrest.add('POST', 'rpc/dashboard_snapshot', {'account': {'id': 1}})
+    with pytest.raises(APIError):
+        app_module.supabase.rpc('dashboard_snapshot', {'p_account_id': 1}).execute()
+
+
+def test_call_function_returns_object_and_scalar_results(app_module, postgrest):
+    postgrest.add('POST', 'rpc/dashboard_snapshot', {'account': {'id': 1}})
+    postgrest.add('POST', 'rpc/rebuild_monthly_rollups', 12)
+    assert app_module.call_function('dashboard_snapshot', {'p_account_id': 1}) == {'account': {'id': 1}}
+    assert app_module.call_function('rebuild_monthly_rollups', {'p_month': None}) == 12
+
+
+def test_call_function_raises_postgrest_errors(app_module, postgrest):
+    postgrest.missing_function('dashboard_snapshot')
+    with pytest.raises(APIError) as excinfo:
+        app_module.call_function('dashboard_snapshot', {'p_account_id': 1})
+    assert app_module.is_missing_function_error(excinfo.value)
+
+
+def test_dashboard_loads_in_one_round_trip(app_module, postgrest):
+    postgrest.add('POST', 'rpc/dashboard_snapshot', {
+        'account': {'id': 1, 'cash_box': 150, 'primary_account': 2000, 'balance': 2150},
+        'transactions': [{'id': 7, 'description': 'Groceries', 'amount': 45}],
+        'reconciled_data': {'month': '2025-06-01', 'is_reconciled': False},
+        'reconciled_months': [],
+    })
+    snapshot = app_module.load_dashboard_snapshot(1)
+    assert postgrest.paths() == ['rpc/dashboard_snapshot']
+    assert snapshot.accounts['balance'] == 2150
+    assert snapshot.transactions[0]['description'] == 'Groceries'
+    assert snapshot.reconciled_data['formatted_month'] == 'June 2025'
+
+
+def test_rollups_rebuild_reports_scalar_result(app_module, postgrest):
+    postgrest.add('POST', 'rpc/rebuild_monthly_rollups', 12)
+    postgrest.add('GET', 'reconciled_months', [{'month': '2025-06-01'}])
+    postgrest.add('POST', 'rpc/snapshot_month', {'month_row': {'month': '2025-06-01'}})
+    result = app_module.app.test_cli_runner().invoke(args=['rollups', 'rebuild', '--month', '2025-06'])
+    assert result.exit_code == 0, result.output
+    assert 'Rebuilt 12 rollup rows for 2025-06' in result.output
+    assert postgrest.requests[0].read() == b'{"p_month": "2025-06-01"}'
+    # The rebuild dropped the month's snapshot, so it is frozen again
+    assert 'Snapshotted 1 reconciled months' in result.output
+
+
+def test_rollups_snapshot_freezes_months_without_one(app_module, postgrest):
+    postgrest.add('GET', 'reconciled_months', [{'month': '2025-05-01'}, {'month': '2025-06-01'}])
+    postgrest.add('GET', 'month_snapshots', [{'month': '2025-05-01'}])
+    postgrest.add('POST', 'rpc/snapshot_month', {'month_row': {}})
+    result = app_module.app.test_cli_runner().invoke(args=['rollups', 'snapshot'])
+    assert result.exit_code == 0, result.output
+    assert 'Snapshotted 2025-06' in result.output and '2025-05' not in result.output
+    snapshots = [request.read() for request in postgrest.requests if request.url.path.endswith('rpc/snapshot_month')]
+    assert snapshots == [b'{"p_month": "2025-06-01"}']
+
+
+def test_add_transaction_records_through_one_rpc(app_module, postgrest, client):
+    postgrest.add('POST', 'rpc/record_transaction', {
+        'transaction': {'id': 41, 'amount': 12.5}, 'primary_account': 2000, 'cash_box': 137.5})
+    response = client.post('/transactions/add', data={
+        'type': 'expense', 'amount': '12.50', 'method': 'cash', 'transaction_date': '2025-06-14'})
+    assert response.status_code == 302
+    assert postgrest.paths() == ['rpc/record_transaction']
+
+
+def test_record_transaction_does_not_fall_back_after_other_errors(app_module, postgrest):
+    # The write may have committed, so only a missing function may use the REST fallback
+    postgrest.add('POST', 'rpc/record_transaction', {'code': '57014', 'message': 'canceling statement'}, status=500)
+    with pytest.raises(APIError):
+        app_module.record_transaction(1, 'expense', 12.5, '', 'cash', '2025-06-14')
+    assert postgrest.paths() == ['rpc/record_transaction']
+
+
+def test_store_month_snapshot_accepts_object_and_null_results(app_module, postgrest):
+    postgrest.add('POST', 'rpc/snapshot_month', {'month_row': {'month': '2025-06-01'}, 'totals': [], 'transactions': []})
+    assert app_module.store_month_snapshot('2025-06-01') is True
+    # snapshot_month returns NULL for a month that is not reconciled
+    postgrest.add('POST', 'rpc/snapshot_month', None)
+    assert app_module.store_month_snapshot('2025-06-01') is False
+    postgrest.missing_function('snapshot_month')
+    assert app_module.store_month_snapshot('2025-06-01') is False
+
+
+@pytest.fixture
+def dashboard_rest(postgrest):
+    postgrest.add('GET', 'accounts', [{'id': 1, 'balance': 2150, 'cash_box': 150, 'primary_account': 2000}])
+    postgrest.add('GET', 'transactions', [])
+    postgrest.add('GET', 'reconciled_months', [])
+    return postgrest
+
+
+def test_missing_dashboard_function_is_remembered(app_module, dashboard_rest):
+    dashboard_rest.missing_function('dashboard_snapshot')
+    assert app_module.load_dashboard_snapshot(1).accounts['balance'] == 2150
+    assert 'rpc/dashboard_snapshot' in dashboard_rest.paths()
+    dashboard_rest.requests.clear()
+    # The next page goes straight to the REST queries
+    assert app_module.load_dashboard_snapshot(1).accounts['balance'] == 2150
+    assert 'rpc/dashboard_snapshot' not in dashboard_rest.paths()
+
+
+def test_missing_function_is_checked_again_after_retry_period(app_module, postgrest, monkeypatch):
+    postgrest.add('POST', 'rpc/data_version', {'code': '42883', 'message': 'function data_version(bigint) does not exist'},
+                  status=404)
+    with pytest.raises(APIError):
+        app_module.call_function('data_version', {})
+    monkeypatch.setattr(app_module, 'MISSING_FUNCTION_RETRY', 0)
+    postgrest.add('POST', 'rpc/data_version', {'accounts': None})
+    assert app_module.call_function('data_version', {}) == {'accounts': None}
+    assert postgrest.paths() == ['rpc/data_version', 'rpc/data_version']
+
+
+def test_dashboard_errors_are_not_hidden_by_the_fallback(app_module, dashboard_rest, client):
+    dashboard_rest.add('POST', 'rpc/dashboard_snapshot', {'code': '57014', 'message': 'canceling statement'}, status=500)
+    with pytest.raises(APIError):
+        app_module.load_dashboard_snapshot(1)
+    assert dashboard_rest.paths() == ['rpc/dashboard_snapshot']
+    # The page renders its error state instead of quietly serving the REST fallback
+    assert client.get('/').status_code == 200
+    assert 'accounts' not in dashboard_rest.paths()
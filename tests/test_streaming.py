@@ -0,0 +1,76 @@
+import gzip
+import zlib
+
+import pytest
+from jinja2 import ChoiceLoader, DictLoader
+
+
+class Pieces:
+    def __init__(self, pieces):
+        self.pieces, self.closed = iter(pieces), False
+
+    def __iter__(self):
+        return self.pieces
+
+    def close(self):
+        self.closed = True
+
+
+def test_chunked_buffers_to_size_and_closes_source(app_module):
+    source = Pieces(['ab', 'cd', 'e', 'fgh', 'i'])
+    response = app_module.app.response_class()
+    assert list(app_module._chunked(source, 4, response)) == ['abcd', 'efgh', 'i']
+    assert source.closed
+
+    # A client leaving mid-page closes the generator, which ends the render
+    source = Pieces(['abcd', 'efgh', 'ijkl'])
+    chunks = app_module._chunked(source, 4, response)
+    assert next(chunks) == 'abcd'
+    chunks.close()
+    assert source.closed
+
+
+def test_gzip_chunks_are_decodable_as_they_arrive(app_module):
+    source = Pieces([])
+    chunks = [b'<html>' + b'a' * 5000, b'b' * 5000 + b'</html>']
+    compressed = list(app_module._compress_chunks(source, chunks, 'gzip'))
+    decoder = zlib.decompressobj(31)
+    # Each chunk is sync-flushed, so the browser can render it before the next one arrives
+    assert decoder.decompress(compressed[0]) == chunks[0]
+    assert gzip.decompress(b''.join(compressed)) == b''.join(chunks)
+    assert source.closed
+
+
+def test_brotli_chunks_round_trip(app_module):
+    brotli = pytest.importorskip('brotli')
+    chunks = [b'first chunk ' * 100, b'second chunk ' * 100]
+    assert brotli.decompress(b''.join(app_module._compress_chunks(Pieces([]), chunks, 'br'))) == b''.join(chunks)
+
+
+@pytest.fixture
+def templates(app_module, monkeypatch):
+    def fail():
+        raise RuntimeError('template failed')
+
+    monkeypatch.setattr(app_module, 'STREAM_CHUNK_SIZE', 10)
+    monkeypatch.setattr(app_module.app.jinja_env, 'loader', ChoiceLoader([DictLoader({
+        'fails_early.html': '{{ fail() }}<p>page</p>',
+        'fails_late.html': '<p>{{ "x" * 50 }}</p>{% for i in range(3) %}{{ i }}{% endfor %}{{ fail() }}',
+    }), app_module.app.jinja_env.loader]))
+    monkeypatch.setitem(app_module.app.jinja_env.globals, 'fail', fail)
+
+
+def test_error_before_first_chunk_reaches_the_view(app_module, templates):
+    with app_module.app.test_request_context('/'):
+        with pytest.raises(RuntimeError):
+            app_module.render_page('fails_early.html')
+
+
+def test_error_mid_stream_is_recorded_as_500(app_module, templates):
+    with app_module.app.test_request_context('/'):
+        response = app_module.render_page('fails_late.html')
+    assert response.status_code == 200
+    assert app_module.final_status(response) == 200
+    with pytest.raises(RuntimeError):
+        list(response.response)
+    assert app_module.final_status(response) == 500
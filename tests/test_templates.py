@@ -0,0 +1,22 @@
+import pytest
+
+import app as finance_app
+
+
+@pytest.mark.parametrize('template_name', sorted(finance_app.TEMPLATE_FIELDS))
+def test_templates_read_only_projected_fields(app_module, template_name):
+    # Same check as `flask templates check-fields`
+    assert app_module.template_field_errors(template_name, app_module.TEMPLATE_FIELDS[template_name]) == []
+
+
+def test_field_outside_the_projection_is_reported(app_module):
+    # accountsetup.html reads account fields; a goal row has none of them
+    errors = app_module.template_field_errors('accountsetup.html', {'accounts': ('savings_goal', ())})
+    assert errors
+    assert {variable for _, variable, _ in errors} == {'accounts'}
+    assert 'cash_box' in {field_name for _, _, field_name in errors}
+
+
+def test_check_fields_command_passes(app_module):
+    result = app_module.app.test_cli_runner().invoke(args=['templates', 'check-fields'])
+    assert result.exit_code == 0, result.output
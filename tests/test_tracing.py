@@ -0,0 +1,19 @@
+import pytest
+
+
+@pytest.fixture
+def header_tracing(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'REQUEST_TRACING', 'header')
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 'secret')
+
+
+def test_tracing_is_off_by_default(app_module, client):
+    assert app_module.REQUEST_TRACING == 'off'
+    assert 'Server-Timing' not in client.get('/livez', headers={'X-Trace': '1'}).headers
+
+
+def test_trace_header_needs_the_admin_token(header_tracing, client):
+    assert 'Server-Timing' not in client.get('/livez', headers={'X-Trace': '1'}).headers
+    assert 'Server-Timing' not in client.get('/livez', headers={'X-Trace': '1', 'X-Admin-Token': 'wrong'}).headers
+    response = client.get('/livez', headers={'X-Trace': '1', 'X-Admin-Token': 'secret'})
+    assert response.headers['Server-Timing'].startswith('total;dur=')
@@ -0,0 +1,51 @@
+import pytest
+
+
+def test_cursor_round_trip(app_module):
+    token = app_module.encode_cursor({'transaction_date': '2025-06-14T09:30:00+00:00', 'id': 41})
+    assert '=' not in token
+    assert app_module.decode_cursor(token) == ('2025-06-14T09:30:00+00:00', 41)
+
+
+@pytest.mark.parametrize('token', ['not-base64!', 'eyJkIjpudWxsLCJpIjoxfQ', 'eyJkIjoiMjAyNSkiLCJpIjoxfQ'])
+def test_decode_cursor_rejects_foreign_tokens(app_module, token):
+    # Garbage, a null date and a date with characters outside a timestamp
+    with pytest.raises(app_module.InvalidCursor):
+        app_module.decode_cursor(token)
+
+
+def test_next_page_seeks_from_the_cursor(app_module, postgrest, client):
+    rows = [{'id': 40 - i, 'type': 'expense', 'amount': 1, 'description': '', 'payment_method': 'bank',
+             'transaction_date': '2025-06-14T09:30:00+00:00'} for i in range(3)]
+    postgrest.add('GET', 'transactions', rows)
+    cursor = app_module.encode_cursor({'transaction_date': '2025-06-14T09:30:00+00:00', 'id': 41})
+
+    response = client.get(f'/api/transactions?limit=2&cursor={cursor}')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [r['id'] for r in body['data']] == [40, 39]
+    assert app_module.decode_cursor(body['next_cursor']) == ('2025-06-14T09:30:00+00:00', 39)
+
+    params = postgrest.requests[0].url.params
+    assert params.get_list('transaction_date') == ['not.is.null', 'lte.2025-06-14T09:30:00+00:00']
+    assert params['or'] == ('(transaction_date.lt."2025-06-14T09:30:00+00:00",'
+                            'and(transaction_date.eq."2025-06-14T09:30:00+00:00",id.lt.41))')
+    assert params['limit'] == '3'
+
+
+def test_malformed_cursor_is_a_client_error(client):
+    assert client.get('/api/transactions?cursor=bogus').status_code == 400
+
+
+def test_date_update_is_one_round_trip_from_the_edit_form(app_module, postgrest, client):
+    postgrest.add('PATCH', 'transactions', [{'id': 7, 'transaction_date': '2025-07-02T00:00:00+00:00',
+                                             'type': 'expense', 'amount': 5, 'created_by_ip': '10.0.0.1'}])
+    june = app_module.query_cache.version('month:2025-06')
+    response = client.post('/transactions/update_date', data={
+        'transaction_id': '7', 'transaction_date': '2025-07-02', 'previous_date': '2025-06-30'})
+    body = response.get_json()
+    assert body['success'] and set(body) == {'success', 'transaction'}
+    assert 'created_by_ip' not in body['transaction']
+    assert postgrest.paths() == ['transactions']
+    # The month the transaction left is invalidated too
+    assert app_module.query_cache.version('month:2025-06') != june